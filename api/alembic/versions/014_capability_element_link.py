@@ -0,0 +1,53 @@
+"""014 — capabilities.element_id FK (replaces meta->>'element_id' lookups)
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "capabilities",
+        sa.Column(
+            "element_id",
+            sa.Uuid(as_uuid=False),
+            sa.ForeignKey("elements.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+    )
+
+    # Backfill from the JSON link written by element_service. If an element somehow
+    # has several synced capabilities, the oldest one keeps the link.
+    op.execute(
+        """
+        UPDATE capabilities AS c
+        SET element_id = e.id
+        FROM elements AS e
+        WHERE c.meta->>'element_id' IS NOT NULL
+          AND e.id::text = c.meta->>'element_id'
+          AND c.id = (
+              SELECT c2.id FROM capabilities AS c2
+              WHERE c2.meta->>'element_id' = c.meta->>'element_id'
+              ORDER BY c2.created_at, c2.id
+              LIMIT 1
+          )
+        """
+    )
+
+    # Unique so the sync helpers can upsert with INSERT … ON CONFLICT (element_id).
+    op.create_index(
+        "ix_capabilities_element_id", "capabilities", ["element_id"], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_capabilities_element_id", "capabilities")
+    op.drop_column("capabilities", "element_id")
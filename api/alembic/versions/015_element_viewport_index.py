@@ -0,0 +1,24 @@
+"""015 — composite index for viewport-scoped element queries
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_elements_board_branch_lane_step",
+        "elements",
+        ["board_id", "branch_id", "swimlane_id", "step_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_elements_board_branch_lane_step", "elements")
@@ -0,0 +1,36 @@
+"""016 — delta-encoded change_event snapshots (entity_version + keyframes)
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows keep full snapshots: entity_version NULL, is_keyframe true.
+    op.add_column("change_events", sa.Column("entity_version", sa.Integer(), nullable=True))
+    op.add_column(
+        "change_events",
+        sa.Column("is_keyframe", sa.Boolean(), nullable=False, server_default=sa.text("true")),
+    )
+    # Unique: concurrent writers of one entity cannot both take the same version (the
+    # loser renumbers and retries, see history_service). Pre-delta rows are NULL.
+    op.create_index(
+        "ix_change_events_entity_version",
+        "change_events",
+        ["board_id", "entity_type", "entity_id", "entity_version"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_change_events_entity_version", table_name="change_events")
+    op.drop_column("change_events", "is_keyframe")
+    op.drop_column("change_events", "entity_version")
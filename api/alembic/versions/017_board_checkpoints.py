@@ -0,0 +1,47 @@
+"""017 — board_checkpoints (materialized board state for time travel)
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+revision = "017"
+down_revision = "016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "board_checkpoints",
+        sa.Column("id", UUID(as_uuid=False), primary_key=True),
+        sa.Column(
+            "board_id", UUID(as_uuid=False),
+            sa.ForeignKey("boards.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("as_of", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "commit_id", UUID(as_uuid=False),
+            sa.ForeignKey("commits.id", ondelete="SET NULL"), nullable=True,
+        ),
+        sa.Column("state", JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("elements", JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column("connectors", JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+        ),
+    )
+    op.create_index(
+        "ix_board_checkpoints_board_id_as_of",
+        "board_checkpoints",
+        ["board_id", "as_of"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_board_checkpoints_board_id_as_of", table_name="board_checkpoints")
+    op.drop_table("board_checkpoints")
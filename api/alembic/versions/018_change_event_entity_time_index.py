@@ -0,0 +1,24 @@
+"""018 — composite index for per-entity history timelines
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "018"
+down_revision = "017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_change_events_entity_time",
+        "change_events",
+        ["board_id", "entity_type", "entity_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_change_events_entity_time", "change_events")
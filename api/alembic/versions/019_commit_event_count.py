@@ -0,0 +1,36 @@
+"""019 — commits.event_count (denormalized) + (board_id, created_at) index
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "019"
+down_revision = "018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "commits",
+        sa.Column("event_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        UPDATE commits SET event_count = counts.n
+        FROM (
+            SELECT commit_id, COUNT(*) AS n FROM change_events
+            WHERE commit_id IS NOT NULL GROUP BY commit_id
+        ) AS counts
+        WHERE counts.commit_id = commits.id
+        """
+    )
+    op.create_index("ix_commits_board_created", "commits", ["board_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_commits_board_created", "commits")
+    op.drop_column("commits", "event_count")
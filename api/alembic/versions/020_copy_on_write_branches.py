@@ -0,0 +1,41 @@
+"""020 — copy-on-write branches (element overlay rows)
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "020"
+down_revision = "019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "elements",
+        sa.Column(
+            "base_element_id", UUID(as_uuid=False),
+            sa.ForeignKey("elements.id", ondelete="CASCADE"), nullable=True,
+        ),
+    )
+    op.add_column(
+        "elements",
+        sa.Column("is_tombstone", sa.Boolean(), nullable=False, server_default="false"),
+    )
+    op.create_index("ix_elements_branch_base", "elements", ["branch_id", "base_element_id"])
+    # Existing branches keep their full copies and are read the old way.
+    op.add_column(
+        "branches",
+        sa.Column("copy_on_write", sa.Boolean(), nullable=False, server_default="false"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("branches", "copy_on_write")
+    op.drop_index("ix_elements_branch_base", "elements")
+    op.drop_column("elements", "is_tombstone")
+    op.drop_column("elements", "base_element_id")
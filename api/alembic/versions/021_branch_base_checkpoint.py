@@ -0,0 +1,28 @@
+"""021 — branches.base_checkpoint_id (merge base)
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "021"
+down_revision = "020"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "branches",
+        sa.Column(
+            "base_checkpoint_id", UUID(as_uuid=False),
+            sa.ForeignKey("board_checkpoints.id", ondelete="SET NULL"), nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("branches", "base_checkpoint_id")
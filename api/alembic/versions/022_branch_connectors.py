@@ -0,0 +1,43 @@
+"""022 — copy-on-write connectors on branches
+
+Revision ID: 022
+Revises: 021
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "022"
+down_revision = "021"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "connectors",
+        sa.Column(
+            "branch_id", UUID(as_uuid=False),
+            sa.ForeignKey("branches.id", ondelete="CASCADE"), nullable=True,
+        ),
+    )
+    op.add_column(
+        "connectors",
+        sa.Column(
+            "base_connector_id", UUID(as_uuid=False),
+            sa.ForeignKey("connectors.id", ondelete="CASCADE"), nullable=True,
+        ),
+    )
+    op.add_column(
+        "connectors",
+        sa.Column("is_tombstone", sa.Boolean(), nullable=False, server_default="false"),
+    )
+    op.create_index("ix_connectors_branch_base", "connectors", ["branch_id", "base_connector_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_connectors_branch_base", "connectors")
+    op.drop_column("connectors", "is_tombstone")
+    op.drop_column("connectors", "base_connector_id")
+    op.drop_column("connectors", "branch_id")
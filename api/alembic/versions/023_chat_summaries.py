@@ -0,0 +1,34 @@
+"""023 — rolling summaries of board chat history
+
+Revision ID: 023
+Revises: 022
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "023"
+down_revision = "022"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_summaries",
+        sa.Column(
+            "board_id", UUID(as_uuid=False),
+            sa.ForeignKey("boards.id", ondelete="CASCADE"), primary_key=True,
+        ),
+        sa.Column("summary", sa.Text(), nullable=False, server_default=""),
+        sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    # Memory loads page the board's messages in (created_at, id) order.
+    op.create_index("ix_chat_messages_board_created", "chat_messages", ["board_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_messages_board_created", "chat_messages")
+    op.drop_table("chat_summaries")
@@ -0,0 +1,23 @@
+"""024 — provider file references on uploads
+
+Revision ID: 024
+Revises: 023
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "024"
+down_revision = "023"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("uploads", sa.Column("provider_file_uri", sa.Text(), nullable=True))
+    op.add_column("uploads", sa.Column("provider_file_expires_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("uploads", "provider_file_expires_at")
+    op.drop_column("uploads", "provider_file_uri")
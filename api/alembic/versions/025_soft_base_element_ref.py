@@ -0,0 +1,30 @@
+"""025 — elements.base_element_id becomes a soft reference
+
+Deleting a main element used to cascade to its branch overlay rows, losing branch edits
+and hiding the "changed on branch, deleted on main" merge conflict.
+
+Revision ID: 025
+Revises: 024
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "025"
+down_revision = "024"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint("elements_base_element_id_fkey", "elements", type_="foreignkey")
+
+
+def downgrade() -> None:
+    op.execute(
+        "DELETE FROM elements WHERE base_element_id IS NOT NULL "
+        "AND base_element_id NOT IN (SELECT id FROM elements)"
+    )
+    op.create_foreign_key(
+        "elements_base_element_id_fkey", "elements", "elements",
+        ["base_element_id"], ["id"], ondelete="CASCADE",
+    )
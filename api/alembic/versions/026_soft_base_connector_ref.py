@@ -0,0 +1,30 @@
+"""026 — connectors.base_connector_id becomes a soft reference
+
+Same as 025 for connectors: deleting a main connector no longer cascades to its
+branch overlay rows.
+
+Revision ID: 026
+Revises: 025
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "026"
+down_revision = "025"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_constraint("connectors_base_connector_id_fkey", "connectors", type_="foreignkey")
+
+
+def downgrade() -> None:
+    op.execute(
+        "DELETE FROM connectors WHERE base_connector_id IS NOT NULL "
+        "AND base_connector_id NOT IN (SELECT id FROM connectors)"
+    )
+    op.create_foreign_key(
+        "connectors_base_connector_id_fkey", "connectors", "connectors",
+        ["base_connector_id"], ["id"], ondelete="CASCADE",
+    )
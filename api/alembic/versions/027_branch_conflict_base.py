@@ -0,0 +1,21 @@
+"""027 — merge base of items still in conflict after a merge
+
+Revision ID: 027
+Revises: 026
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "027"
+down_revision = "026"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("branches", sa.Column("conflict_base", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("branches", "conflict_base")
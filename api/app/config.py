@@ -48,6 +48,22 @@ class Settings(BaseSettings):
     # ── Google Gemini (server-side only — never exposed to frontend)
     gemini_api_key: str = ""
     gemini_model: str = "gemini-2.5-flash"
+    # The agent's system prompt is registered as provider-side cached content for this
+    # long and reused across turns until the board changes (0 disables; see
+    # app/services/prompt_cache_service.py).
+    gemini_prompt_cache_ttl_seconds: int = 3600
+    # Estimated-token budget for the board context in the agent's system prompt; larger
+    # boards are compressed or summarised section by section to fit (see build_board_context).
+    agent_context_token_budget: int = 16000
+    # Chat attachments are uploaded to the Gemini Files API once and referenced by URI
+    # on later turns; when off (or unsupported) their bytes are sent inline each turn.
+    gemini_file_uploads: bool = True
+    # Bound on the per-process cache of attachment bytes fetched from storage.
+    attachment_cache_max_bytes: int = 64 * 1024 * 1024
+    # With pypdf installed, PDF attachments are sent as locally extracted text, trimmed to
+    # the most relevant pages beyond this many estimated tokens per document.
+    pdf_text_extraction: bool = True
+    pdf_text_token_budget: int = 6000
 
     # ── NVIDIA NIM (OpenAI-compatible free tier — for lightweight AI tasks)
     nim_api_key: str = ""
@@ -58,6 +74,21 @@ class Settings(BaseSettings):
     # Create credentials at console.cloud.google.com → APIs & Services → Credentials
     google_client_id: str = ""
 
+    # ── History (change_events delta encoding)
+    # Full before/after snapshots are stored every N versions of an entity; the events
+    # in between store diffs. Reads replay at most N-1 diffs.
+    history_keyframe_interval: int = 20
+    # The compaction job checkpoints a board once more than this many change events were
+    # recorded since its latest checkpoint, so time-travel reads replay less.
+    history_checkpoint_interval: int = 200
+    # Compaction (app/services/compaction_service.py): history older than the retention
+    # window keeps one event per entity and one commit per hour/day. The in-process job
+    # is off by default (0) — serverless deployments should run the CLI from a cron.
+    history_retention_days: int = 90
+    history_compaction_granularity: str = "day"   # hour | day
+    history_compaction_interval_hours: float = 0
+    audit_log_retention_days: int = 0             # 0 keeps audit logs forever
+
     # ── CORS
     allowed_origins: str = "http://localhost:3000,http://localhost:8000"
 
@@ -8,6 +8,7 @@ Key differences from a traditional deployment:
 - Lifespan only runs DB connectivity check — no pool warmup
 - Docs disabled in production (reduce attack surface)
 """
+import asyncio
 import logging
 import pydantic
 from contextlib import asynccontextmanager
@@ -57,8 +58,17 @@ async def lifespan(app: FastAPI):
             log.info("DB connection OK")
         except Exception as exc:
             log.warning(f"DB connection check failed: {exc}")
+
+    # Opt-in scheduled history compaction for long-running deployments. Serverless
+    # instances are frozen between requests; schedule the compaction CLI there instead.
+    compaction = None
+    if _db_ready and settings.history_compaction_interval_hours > 0:
+        from app.services.compaction_service import compaction_loop
+        compaction = asyncio.create_task(compaction_loop(settings.history_compaction_interval_hours))
     yield
-    # No teardown needed — Vercel recycles the process
+    if compaction is not None:
+        compaction.cancel()
+    # No other teardown needed — Vercel recycles the process
 
 
 app = FastAPI(
@@ -84,7 +94,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Next-Cursor"],
 )
 
 
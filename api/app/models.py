@@ -6,7 +6,7 @@ Single file for the MVP. Every table the application uses is defined here.
 import uuid
 from datetime import datetime
 from sqlalchemy import (
-    Boolean, Column, DateTime, ForeignKey,
+    Boolean, Column, DateTime, ForeignKey, Index,
     Integer, String, Text, LargeBinary, func, JSON, Uuid,
 )
 from sqlalchemy.orm import relationship
@@ -77,6 +77,7 @@ class Board(Base):
     capabilities  = relationship("Capability",        back_populates="board", cascade="all, delete-orphan")
     elements      = relationship("Element",           back_populates="board", cascade="all, delete-orphan")
     chat_messages = relationship("ChatMessage",       back_populates="board", cascade="all, delete-orphan")
+    chat_summary  = relationship("ChatSummary",       back_populates="board", cascade="all, delete-orphan", uselist=False)
     insights      = relationship("Insight",           back_populates="board", cascade="all, delete-orphan")
     governance    = relationship("GovernanceDecision",back_populates="board", cascade="all, delete-orphan")
     audit_logs    = relationship("AuditLog",          back_populates="board")
@@ -87,6 +88,7 @@ class Board(Base):
     commits       = relationship("Commit",            back_populates="board", cascade="all, delete-orphan")
     branches      = relationship("Branch",            back_populates="board", cascade="all, delete-orphan")
     connectors    = relationship("Connector",         back_populates="board", cascade="all, delete-orphan")
+    checkpoints   = relationship("BoardCheckpoint",   back_populates="board", cascade="all, delete-orphan")
 
 
 class BoardCollaborator(Base):
@@ -123,6 +125,7 @@ class Capability(Base):
     status       = Column(String(50), default="draft")
     notes        = Column(Text)
     meta         = Column(JSON, default=dict)
+    element_id   = Column(Uuid(as_uuid=False), ForeignKey("elements.id", ondelete="SET NULL"), nullable=True, unique=True, index=True)  # set for ai_capability elements
     created_at   = Column(DateTime(timezone=True), server_default=func.now())
     updated_at   = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -136,6 +139,15 @@ class Capability(Base):
 
 class Element(Base):
     __tablename__ = "elements"
+    # Fetch server-generated created_at/updated_at with INSERT/UPDATE … RETURNING,
+    # so writes never need a follow-up refresh() SELECT.
+    __mapper_args__ = {"eager_defaults": True}
+    # Viewport queries: one lane/step window of one branch (list_elements filters).
+    __table_args__ = (
+        Index("ix_elements_board_branch_lane_step", "board_id", "branch_id", "swimlane_id", "step_id"),
+        # Copy-on-write branches: "is this main element shadowed on branch B?"
+        Index("ix_elements_branch_base", "branch_id", "base_element_id"),
+    )
 
     id          = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
     board_id    = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -150,6 +162,11 @@ class Element(Base):
     meta        = Column(JSON, default=dict)
     created_at  = Column(DateTime(timezone=True), server_default=func.now())
     updated_at  = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Branch overlay rows: the main element this row replaces (or hides, if a tombstone).
+    # Soft ref, no FK: an overlay outlives its main element so branch edits are kept and
+    # merge can report "changed on branch, deleted on main".
+    base_element_id = Column(Uuid(as_uuid=False), nullable=True)
+    is_tombstone    = Column(Boolean, nullable=False, server_default="false", default=False)
 
     created_by_user_id = Column(Uuid(as_uuid=False), ForeignKey("users.id"), nullable=True)
     created_by_actor   = Column(String(30), nullable=False, server_default="user", default="user")
@@ -166,6 +183,9 @@ class Element(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_board_created", "board_id", "created_at", "id"),
+    )
 
     id          = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
     board_id    = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -180,6 +200,19 @@ class ChatMessage(Base):
     user  = relationship("User",  back_populates="chat_messages")
 
 
+class ChatSummary(Base):
+    """Rolling summary of a board conversation's older messages (see chat_memory_service)."""
+    __tablename__ = "chat_summaries"
+
+    board_id      = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), primary_key=True)
+    summary       = Column(Text, nullable=False, default="")
+    # How many of the board's oldest messages, in (created_at, id) order, the summary covers.
+    message_count = Column(Integer, nullable=False, default=0)
+    updated_at    = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    board = relationship("Board", back_populates="chat_summary")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # INSIGHTS
 # ─────────────────────────────────────────────────────────────────────────────
@@ -278,6 +311,9 @@ class Upload(Base):
     content_type = Column(Text, nullable=False)
     size_bytes   = Column(Integer, nullable=False)
     storage_path = Column(Text, nullable=False)    # boards/{board_id}/uploads/{uuid}-{name}
+    # Gemini Files API copy, reused by reference until it expires (about 48 h).
+    provider_file_uri        = Column(Text, nullable=True)
+    provider_file_expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at   = Column(DateTime(timezone=True), server_default=func.now())
 
     board = relationship("Board", back_populates="uploads")
@@ -315,12 +351,16 @@ class ImportJob(Base):
 
 class Commit(Base):
     __tablename__ = "commits"
+    __table_args__ = (
+        Index("ix_commits_board_created", "board_id", "created_at"),
+    )
 
     id             = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
     board_id       = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, index=True)
     author_user_id = Column(Uuid(as_uuid=False), ForeignKey("users.id"), nullable=True)
     actor_type     = Column(String(30), nullable=False, server_default="user", default="user")
     message        = Column(Text, nullable=False)
+    event_count    = Column(Integer, nullable=False, server_default="0", default=0)  # maintained by the event writer
     created_at     = Column(DateTime(timezone=True), server_default=func.now())
 
     board  = relationship("Board", back_populates="commits")
@@ -329,6 +369,11 @@ class Commit(Base):
 
 class ChangeEvent(Base):
     __tablename__ = "change_events"
+    __table_args__ = (
+        Index("ix_change_events_entity_version", "board_id", "entity_type", "entity_id", "entity_version",
+              unique=True),
+        Index("ix_change_events_entity_time", "board_id", "entity_type", "entity_id", "created_at"),
+    )
 
     id            = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
     board_id      = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -337,8 +382,10 @@ class ChangeEvent(Base):
     entity_type   = Column(String(50), nullable=False)
     entity_id     = Column(String(50), nullable=False)
     operation     = Column(String(20), nullable=False)  # create | update | delete | restore
-    before_snapshot = Column(JSON, nullable=True)
+    before_snapshot = Column(JSON, nullable=True)   # full dict, or {"__delta__": …} unless is_keyframe
     after_snapshot  = Column(JSON, nullable=True)
+    entity_version  = Column(Integer, nullable=True)  # per-entity sequence; NULL for pre-delta rows
+    is_keyframe     = Column(Boolean, nullable=False, server_default="true", default=True)
     commit_id     = Column(Uuid(as_uuid=False), ForeignKey("commits.id", ondelete="SET NULL"), nullable=True)
     created_at    = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -346,6 +393,28 @@ class ChangeEvent(Base):
     commit = relationship("Commit", back_populates="events")
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# BOARD CHECKPOINTS (materialized board state for time travel)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class BoardCheckpoint(Base):
+    __tablename__ = "board_checkpoints"
+    __table_args__ = (
+        Index("ix_board_checkpoints_board_id_as_of", "board_id", "as_of"),
+    )
+
+    id         = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
+    board_id   = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False)
+    as_of      = Column(DateTime(timezone=True), nullable=False)
+    commit_id  = Column(Uuid(as_uuid=False), ForeignKey("commits.id", ondelete="SET NULL"), nullable=True)
+    state      = Column(JSON, nullable=False, default=dict)
+    elements   = Column(JSON, nullable=False, default=list)   # main-branch element snapshots
+    connectors = Column(JSON, nullable=False, default=list)   # connector snapshots
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    board = relationship("Board", back_populates="checkpoints")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # BRANCHES (PRD-17d — branch switcher data model)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -357,7 +426,15 @@ class Branch(Base):
     board_id           = Column(Uuid(as_uuid=False), ForeignKey("boards.id", ondelete="CASCADE"), nullable=False, index=True)
     name               = Column(String(100), nullable=False)
     is_default         = Column(Boolean, server_default="false", default=False, nullable=False)
+    # Copy-on-write: elements = main + this branch's overlay rows. Older branches hold
+    # full element copies and are read as-is.
+    copy_on_write      = Column(Boolean, server_default="false", default=True, nullable=False)
     state_snapshot     = Column(JSON, nullable=True)
+    # Main as of the branch point — the merge base for three-way merges. A merge moves it
+    # to main as merged; items still in conflict keep their old base in conflict_base
+    # ({section: {id: base snapshot | None}}), laid over the checkpoint.
+    base_checkpoint_id = Column(Uuid(as_uuid=False), ForeignKey("board_checkpoints.id", ondelete="SET NULL"), nullable=True)
+    conflict_base      = Column(JSON, nullable=True)
     created_by_user_id = Column(Uuid(as_uuid=False), ForeignKey("users.id"), nullable=True)
     created_at         = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -370,9 +447,19 @@ class Branch(Base):
 
 class Connector(Base):
     __tablename__ = "connectors"
+    __table_args__ = (
+        # Copy-on-write branches: the branch row (if any) shadowing a main connector
+        Index("ix_connectors_branch_base", "branch_id", "base_connector_id"),
+    )
 
     id                 = Column(Uuid(as_uuid=False), primary_key=True, default=_uuid)
     board_id           = Column(Uuid(as_uuid=False), ForeignKey("boards.id",    ondelete="CASCADE"), nullable=False, index=True)
+    branch_id          = Column(Uuid(as_uuid=False), ForeignKey("branches.id",  ondelete="CASCADE"), nullable=True)
+    # Branch overlay row: the main connector it replaces (edit) or hides (is_tombstone).
+    # Element endpoints always hold main/branch-only element ids, never overlay ids.
+    # Soft ref, no FK, like Element.base_element_id: the overlay outlives a main delete.
+    base_connector_id  = Column(Uuid(as_uuid=False), nullable=True)
+    is_tombstone       = Column(Boolean, nullable=False, server_default="false", default=False)
     source_step_id     = Column(Uuid(as_uuid=False), nullable=True)
     source_element_id  = Column(Uuid(as_uuid=False), ForeignKey("elements.id",  ondelete="CASCADE"), nullable=True)
     target_step_id     = Column(Uuid(as_uuid=False), nullable=True)
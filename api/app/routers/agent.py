@@ -1,12 +1,15 @@
 """
 Agent router -- /api/agent/*
 POST /api/agent/chat              -> call Gemini, persist, return response
+POST /api/agent/chat/stream       -> same, streamed as Server-Sent Events
 GET  /api/agent/boards/{id}/history -> paginated chat history
 DELETE /api/agent/boards/{id}/history -> clear history
 """
+import json
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, delete as sql_delete
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -14,7 +17,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 log = logging.getLogger(__name__)
 
 from app.database import get_db
-from app.models import ChatMessage, User
+from app.models import ChatMessage, ChatSummary, User
 from app.schemas import ChatRequest, ChatResponse, ChatMessageOut, AgentCallError
 from app.services import agent_service
 from app.services.board_service import assert_board_access
@@ -29,18 +32,19 @@ router = APIRouter(prefix="/api/agent", tags=["agent"])
 async def chat(
     request: Request,
     body: ChatRequest,
+    background: BackgroundTasks,
     user: User = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     await assert_board_access(db, body.board_id, user.id)
 
-    history = [{"role": h.role, "content": h.content} for h in body.history]
-
     try:
         text, tokens, msg_id, actions = await agent_service.chat(
-            db, body.board_id, user.id, body.message, history,
+            db, body.board_id, user.id, body.message,
             role=body.role,
             attachment_ids=body.attachments,
+            branch_id=body.branch_id,
+            background=background,
         )
     except AgentCallError as exc:
         # Return a structured 200 so the client renders an inline error card
@@ -55,6 +59,50 @@ async def chat(
     return ChatResponse(response=text, token_count=tokens, message_id=msg_id, actions=actions)
 
 
+@router.post("/chat/stream")
+@limiter.limit("20/minute")
+async def chat_stream(
+    request: Request,
+    body: ChatRequest,
+    background: BackgroundTasks,
+    user: User = Depends(get_current_user),
+    db:   AsyncSession = Depends(get_db),
+):
+    """
+    Server-Sent Events: `delta` events carry the reply's message text as it is
+    generated, then one `done` event with the same body as POST /chat
+    (response, token_count, message_id, actions) — or an `error` event with the
+    AgentError card.
+    """
+    await assert_board_access(db, body.board_id, user.id)
+
+    try:
+        events = await agent_service.open_chat_stream(
+            db, body.board_id, user.id, body.message,
+            role=body.role,
+            attachment_ids=body.attachments,
+            branch_id=body.branch_id,
+            is_disconnected=request.is_disconnected,
+            background=background,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        log.error("Unexpected error in /api/agent/chat/stream: %s", exc, exc_info=True)
+        raise HTTPException(500, f"Chat failed unexpectedly: {type(exc).__name__}")
+
+    async def sse():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        # No proxy buffering — the first token should reach the browser immediately.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/boards/{board_id}/history", response_model=list[ChatMessageOut])
 async def get_history(
     board_id: str,
@@ -102,4 +150,7 @@ async def clear_history(
     await db.execute(
         sql_delete(ChatMessage).where(ChatMessage.board_id == board_id)
     )
+    await db.execute(
+        sql_delete(ChatSummary).where(ChatSummary.board_id == board_id)
+    )
     await db.commit()
@@ -1,14 +1,15 @@
 """
 Boards router — /api/boards/*
 """
-from fastapi import APIRouter, Depends, Request, status
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import User
 from app.schemas import (
-    BoardCreate, BoardPatch, BoardOut, BoardSummary, CollaboratorAdd, CollaboratorOut,
+    BoardCopy, BoardCreate, BoardPatch, BoardOut, BoardSummary, CollaboratorAdd, CollaboratorOut,
 )
 from app.services import board_service
 from app.middleware.auth_middleware import get_current_user
@@ -18,10 +19,20 @@ router = APIRouter(prefix="/api/boards", tags=["boards"])
 
 @router.get("", response_model=list[BoardSummary])
 async def list_boards(
+    response: Response,
+    limit:    Annotated[Optional[int], Query(ge=1, le=200)] = None,
+    cursor:   Optional[str] = None,
+    include:  Annotated[Optional[str], Query(pattern="^counts$")] = None,
     user: User = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
-    return await board_service.list_boards(db, user.id)
+    """Without ``limit`` every board is returned; otherwise the next page cursor is sent in X-Next-Cursor."""
+    boards, next_cursor = await board_service.list_boards(
+        db, user.id, limit=limit, cursor=cursor, include_counts=include == "counts",
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return boards
 
 
 @router.post("", response_model=BoardOut, status_code=201)
@@ -36,6 +47,19 @@ async def create_board(
     return board
 
 
+@router.post("/from-template/{name}", response_model=BoardOut, status_code=201)
+async def create_board_from_template(
+    name: str,
+    body: BoardCopy = BoardCopy(),
+    user: User = Depends(get_current_user),
+    db:   AsyncSession = Depends(get_db),
+):
+    board = await board_service.create_board_from_template(db, user.id, name, body)
+    await db.commit()
+    await db.refresh(board)
+    return board
+
+
 @router.get("/{board_id}", response_model=BoardOut)
 async def get_board(
     board_id: str,
@@ -68,6 +92,19 @@ async def patch_board(
     return board
 
 
+@router.post("/{board_id}/duplicate", response_model=BoardOut, status_code=201)
+async def duplicate_board(
+    board_id: str,
+    body: BoardCopy = BoardCopy(),
+    user: User = Depends(get_current_user),
+    db:   AsyncSession = Depends(get_db),
+):
+    board = await board_service.duplicate_board(db, board_id, user.id, body)
+    await db.commit()
+    await db.refresh(board)
+    return board
+
+
 @router.delete("/{board_id}", status_code=204)
 async def archive_board(
     board_id: str,
@@ -5,9 +5,11 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models import Board, Branch, Element, User
-from app.schemas import BranchCreate, BranchOut
+from app.models import Board, Branch, User
+from app.schemas import BranchCreate, BranchOut, MergeResult
 from app.services.board_service import assert_board_access
+from app.services.checkpoint_service import create_checkpoint
+from app.services.merge_service import merge_branch
 from app.middleware.auth_middleware import get_current_user
 
 router = APIRouter(prefix="/api/boards", tags=["branches"])
@@ -66,37 +68,17 @@ async def create_branch(
     )
     db.add(branch)
     try:
-        await db.flush()  # get branch.id before copying elements
+        await db.flush()
     except Exception:
         await db.rollback()
         raise HTTPException(409, f"A branch named '{body.name}' already exists on this board")
 
-    # Copy all main-branch elements (branch_id IS NULL) to the new branch
-    el_result = await db.execute(
-        select(Element).where(
-            Element.board_id == board_id,
-            Element.branch_id.is_(None),
-        )
-    )
-    for src in el_result.scalars().all():
-        copy = Element(
-            board_id=board_id,
-            branch_id=str(branch.id),
-            swimlane_id=src.swimlane_id,
-            step_id=src.step_id,
-            type=src.type,
-            name=src.name,
-            notes=src.notes,
-            owner=src.owner,
-            status=src.status,
-            meta=src.meta or {},
-            created_by_user_id=str(user.id),
-            created_by_actor="system",
-            updated_by_user_id=str(user.id),
-            updated_by_actor="system",
-        )
-        db.add(copy)
+    # Copy-on-write: no element rows are copied. The branch reads main's elements until
+    # one is edited or deleted on the branch (see element_service._overlay_row).
 
+    # Main as of the branch point is the merge base (merge_service).
+    if board:
+        branch.base_checkpoint_id = str((await create_checkpoint(db, board)).id)
     await db.commit()
     await db.refresh(branch)
     return branch
@@ -128,6 +110,23 @@ async def patch_branch_state(
     return {"state_snapshot": branch.state_snapshot}
 
 
+@router.post("/{board_id}/branches/{branch_id}/merge", response_model=MergeResult)
+async def merge_branch_into_main(
+    board_id:  str,
+    branch_id: str,
+    dry_run:   bool = False,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    """
+    Three-way merge of a branch into main against the branch point. Non-conflicting
+    changes land as one commit; conflicts are reported and stay on the branch.
+    dry_run=true returns the merge plan without writing anything.
+    """
+    board = await assert_board_access(db, board_id, user.id, require_role="editor")
+    return await merge_branch(db, board, branch_id, str(user.id), dry_run=dry_run)
+
+
 @router.delete("/{board_id}/branches/{branch_id}", status_code=204)
 async def delete_branch(
     board_id:  str,
@@ -1,13 +1,16 @@
 """Connectors router — PRD-18 (connector data model and CRUD API)."""
 from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import User
-from app.schemas import ConnectorCreate, ConnectorUpdate, ConnectorOut
+from app.schemas import (
+    ConnectorBatchRequest, ConnectorBatchResult, ConnectorCreate, ConnectorUpdate, ConnectorOut,
+)
 from app.services.board_service import assert_board_access
 from app.services import connector_service
+from app.services.element_service import resolve_step_window
 from app.middleware.auth_middleware import get_current_user
 
 router = APIRouter(prefix="/api/boards", tags=["connectors"])
@@ -15,25 +18,58 @@ router = APIRouter(prefix="/api/boards", tags=["connectors"])
 
 @router.get("/{board_id}/connectors", response_model=list[ConnectorOut])
 async def list_connectors(
-    board_id: str,
-    tier:     Annotated[Optional[str], Query()] = None,
-    type:     Annotated[Optional[str], Query()] = None,
+    board_id:    str,
+    response:    Response,
+    branch_id:   Annotated[Optional[str], Query()] = None,
+    tier:        Annotated[Optional[str], Query()] = None,
+    type:        Annotated[Optional[str], Query()] = None,
+    swimlane_id: Annotated[Optional[list[str]], Query()] = None,
+    step_from:   Annotated[Optional[str], Query()] = None,
+    step_to:     Annotated[Optional[str], Query()] = None,
+    limit:       Annotated[Optional[int], Query(ge=1, le=1000)] = None,
+    cursor:      Annotated[Optional[str], Query()] = None,
     user: User         = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
-    await assert_board_access(db, board_id, user.id)
-    return await connector_service.list_connectors(db, board_id, tier=tier, type_=type)
+    board = await assert_board_access(db, board_id, user.id)
+    step_ids = await resolve_step_window(db, board, branch_id, step_from, step_to)
+    connectors, next_cursor = await connector_service.list_connectors(
+        db, board_id, branch_id=branch_id, tier=tier, type_=type, swimlane_ids=swimlane_id,
+        step_ids=step_ids, limit=limit, cursor=cursor,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return await connector_service.as_branch_view(db, board_id, branch_id, connectors)
 
 
 @router.post("/{board_id}/connectors", response_model=ConnectorOut, status_code=201)
 async def create_connector(
     board_id: str,
     body: ConnectorCreate,
+    branch_id: Optional[str] = Query(None, description="create on this branch"),
     user: User         = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     board = await assert_board_access(db, board_id, user.id, require_role="editor")
-    return await connector_service.create_connector(db, board, body, user_id=str(user.id))
+    c = await connector_service.create_connector(db, board, body, user_id=str(user.id), branch_id=branch_id)
+    return (await connector_service.as_branch_view(db, board_id, branch_id, [c]))[0]
+
+
+@router.post("/{board_id}/connectors:batch", response_model=ConnectorBatchResult)
+async def batch_connectors(
+    board_id: str,
+    body: ConnectorBatchRequest,
+    branch_id: Optional[str] = Query(None, description="apply on this copy-on-write branch"),
+    user: User         = Depends(get_current_user),
+    db:   AsyncSession = Depends(get_db),
+):
+    board = await assert_board_access(db, board_id, user.id, require_role="editor")
+    result = await connector_service.apply_connector_batch(
+        db, board, body, user_id=str(user.id), branch_id=branch_id,
+    )
+    for key in ("created", "updated"):
+        result[key] = await connector_service.as_branch_view(db, board_id, branch_id, result[key])
+    return result
 
 
 @router.get("/{board_id}/connectors/{connector_id}", response_model=ConnectorOut)
@@ -52,23 +88,26 @@ async def update_connector(
     board_id:     str,
     connector_id: str,
     body: ConnectorUpdate,
+    branch_id: Optional[str] = Query(None, description="edit on this copy-on-write branch"),
     user: User         = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id, require_role="editor")
-    return await connector_service.update_connector(
-        db, board_id, connector_id, body, user_id=str(user.id)
+    c = await connector_service.update_connector(
+        db, board_id, connector_id, body, user_id=str(user.id), branch_id=branch_id
     )
+    return (await connector_service.as_branch_view(db, board_id, branch_id, [c]))[0]
 
 
 @router.delete("/{board_id}/connectors/{connector_id}", status_code=204)
 async def delete_connector(
     board_id:     str,
     connector_id: str,
+    branch_id: Optional[str] = Query(None, description="delete on this copy-on-write branch only"),
     user: User         = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id, require_role="editor")
     await connector_service.delete_connector(
-        db, board_id, connector_id, user_id=str(user.id)
+        db, board_id, connector_id, user_id=str(user.id), branch_id=branch_id
     )
@@ -1,16 +1,19 @@
 """
-Elements router — /api/boards/{board_id}/elements
+Elements router — /api/boards/{board_id}/elements (+ elements:batch)
 """
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import User
-from app.schemas import ElementCreate, ElementOut, ElementUpdate
+from app.schemas import (
+    ElementBatchRequest, ElementBatchResult, ElementCreate, ElementOut, ElementUpdate,
+)
 from app.services.board_service import assert_board_access
 from app.services.element_service import (
     list_elements, create_element, get_element, update_element, delete_element,
+    apply_element_batch, resolve_step_window,
 )
 from app.middleware.auth_middleware import get_current_user
 
@@ -19,13 +22,27 @@ router = APIRouter(prefix="/api/boards", tags=["elements"])
 
 @router.get("/{board_id}/elements", response_model=list[ElementOut])
 async def list_elements_route(
-    board_id:  str,
-    branch_id: Optional[str] = Query(None),
+    board_id:    str,
+    response:    Response,
+    branch_id:   Optional[str] = Query(None),
+    swimlane_id: Optional[list[str]] = Query(None),
+    step_from:   Optional[str] = Query(None),
+    step_to:     Optional[str] = Query(None),
+    limit:       Optional[int] = Query(None, ge=1, le=1000),
+    cursor:      Optional[str] = Query(None),
     user: User = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
-    await assert_board_access(db, board_id, user.id)
-    return await list_elements(db, board_id, branch_id=branch_id)
+    """Viewport filters: repeat swimlane_id per lane; step_from/step_to bound a step window."""
+    board = await assert_board_access(db, board_id, user.id)
+    step_ids = await resolve_step_window(db, board, branch_id, step_from, step_to)
+    elements, next_cursor = await list_elements(
+        db, board_id, branch_id=branch_id, swimlane_ids=swimlane_id, step_ids=step_ids,
+        limit=limit, cursor=cursor,
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return elements
 
 
 @router.post("/{board_id}/elements", response_model=ElementOut, status_code=201)
@@ -39,6 +56,18 @@ async def create_element_route(
     return await create_element(db, board_id, body, user_id=str(user.id))
 
 
+@router.post("/{board_id}/elements:batch", response_model=ElementBatchResult)
+async def batch_elements_route(
+    board_id: str,
+    body: ElementBatchRequest,
+    branch_id: Optional[str] = Query(None, description="apply on this copy-on-write branch"),
+    user: User = Depends(get_current_user),
+    db:   AsyncSession = Depends(get_db),
+):
+    await assert_board_access(db, board_id, user.id, require_role="editor")
+    return await apply_element_batch(db, board_id, body, user_id=str(user.id), branch_id=branch_id)
+
+
 @router.get("/{board_id}/elements/{element_id}", response_model=ElementOut)
 async def get_element_route(
     board_id:   str,
@@ -55,19 +84,21 @@ async def update_element_route(
     board_id:   str,
     element_id: str,
     body: ElementUpdate,
+    branch_id:  Optional[str] = Query(None, description="edit on this copy-on-write branch"),
     user: User = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id, require_role="editor")
-    return await update_element(db, board_id, element_id, body, user_id=str(user.id))
+    return await update_element(db, board_id, element_id, body, user_id=str(user.id), branch_id=branch_id)
 
 
 @router.delete("/{board_id}/elements/{element_id}", status_code=204)
 async def delete_element_route(
     board_id:   str,
     element_id: str,
+    branch_id:  Optional[str] = Query(None, description="delete on this copy-on-write branch only"),
     user: User = Depends(get_current_user),
     db:   AsyncSession = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id, require_role="editor")
-    await delete_element(db, board_id, element_id, user_id=str(user.id))
+    await delete_element(db, board_id, element_id, user_id=str(user.id), branch_id=branch_id)
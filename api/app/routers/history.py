@@ -1,17 +1,25 @@
-"""History router — /api/boards/{board_id}/history + /commits (PRD-17a/17c/17e)"""
-from typing import Annotated
+"""History router — /api/boards/{board_id}/history + per-entity history + /commits + /at + /diff (PRD-17a/17c/17e)"""
+import json
+from datetime import datetime
+from typing import Annotated, Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import Commit, User, ChangeEvent
-from app.schemas import ChangeEventOut, CommitOut, ElementOut, GroupCommitRequest
+from app.schemas import (
+    BoardAtOut, BoardDiffOut, ChangeEventOut, CommitOut, ElementOut, GroupCommitRequest, RevertResult,
+)
 from app.services.board_service import assert_board_access
 from app.services.history_service import (
     list_history, get_change_event, restore_element,
     list_commits, group_events_into_commit,
 )
+from app.services.checkpoint_service import board_at
+from app.services.diff_service import collect_diff, describe_side, iter_diff, resolve_side
+from app.services.revert_service import revert_commit, rollback_to_commit
 from app.middleware.auth_middleware import get_current_user
 
 router = APIRouter(prefix="/api/boards", tags=["history"])
@@ -22,12 +30,57 @@ async def get_board_history(
     board_id: str,
     limit:  Annotated[int, Query(ge=1, le=100)] = 50,
     offset: Annotated[int, Query(ge=0)]         = 0,
+    entity_type: Optional[str]                  = None,
+    operation:   Optional[str]                  = None,
+    actor:       Optional[str]                  = Query(None, description="actor user id"),
+    actor_type:  Optional[str]                  = None,
+    since:       Optional[datetime]             = None,
+    until:       Optional[datetime]             = None,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    await assert_board_access(db, board_id, user.id)
+    events = await list_history(
+        db, board_id, limit=limit, offset=offset, entity_type=entity_type, operation=operation,
+        actor_user_id=actor, actor_type=actor_type, since=since, until=until,
+    )
+    return await _history_out(db, events)
+
+
+@router.get("/{board_id}/elements/{element_id}/history", response_model=list[ChangeEventOut])
+async def get_element_history(
+    board_id: str,
+    element_id: str,
+    limit:  Annotated[int, Query(ge=1, le=100)] = 50,
+    offset: Annotated[int, Query(ge=0)]         = 0,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    await assert_board_access(db, board_id, user.id)
+    events = await list_history(
+        db, board_id, limit=limit, offset=offset, entity_type="element", entity_id=element_id,
+    )
+    return await _history_out(db, events)
+
+
+@router.get("/{board_id}/connectors/{connector_id}/history", response_model=list[ChangeEventOut])
+async def get_connector_history(
+    board_id: str,
+    connector_id: str,
+    limit:  Annotated[int, Query(ge=1, le=100)] = 50,
+    offset: Annotated[int, Query(ge=0)]         = 0,
     user: User          = Depends(get_current_user),
     db:   AsyncSession  = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id)
-    events = await list_history(db, board_id, limit=limit, offset=offset)
+    events = await list_history(
+        db, board_id, limit=limit, offset=offset, entity_type="connector", entity_id=connector_id,
+    )
+    return await _history_out(db, events)
+
 
+async def _history_out(db: AsyncSession, events: list[ChangeEvent]) -> list[ChangeEventOut]:
+    """Attach actor names and commit messages (one query each)."""
     user_ids = {str(e.actor_user_id) for e in events if e.actor_user_id}
     names: dict[str, str] = {}
     if user_ids:
@@ -83,9 +136,9 @@ async def list_board_commits(
     db:   AsyncSession  = Depends(get_db),
 ):
     await assert_board_access(db, board_id, user.id)
-    rows = await list_commits(db, board_id, limit=limit, offset=offset)
+    commits = await list_commits(db, board_id, limit=limit, offset=offset)
 
-    author_ids = {str(c.author_user_id) for c, _ in rows if c.author_user_id}
+    author_ids = {str(c.author_user_id) for c in commits if c.author_user_id}
     names: dict[str, str] = {}
     if author_ids:
         ur = await db.execute(select(User).where(User.id.in_(author_ids)))
@@ -93,10 +146,9 @@ async def list_board_commits(
             names[str(u.id)] = u.full_name or u.email
 
     out = []
-    for commit, event_count in rows:
+    for commit in commits:
         co = CommitOut.model_validate(commit)
         co.author_name = names.get(str(commit.author_user_id)) if commit.author_user_id else None
-        co.event_count = event_count
         out.append(co)
     return out
 
@@ -116,10 +168,33 @@ async def create_group_commit(
     await db.refresh(commit)
     co = CommitOut.model_validate(commit)
     co.author_name = user.full_name or user.email
-    co.event_count = len(body.event_ids)
     return co
 
 
+@router.post("/{board_id}/commits/{commit_id}/revert", response_model=RevertResult)
+async def revert_board_commit(
+    board_id:  str,
+    commit_id: str,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    """Undo one commit: every entity it touched goes back to its pre-commit snapshot."""
+    board = await assert_board_access(db, board_id, user.id, require_role="editor")
+    return await revert_commit(db, board, commit_id, user_id=str(user.id))
+
+
+@router.post("/{board_id}/commits/{commit_id}/rollback", response_model=RevertResult)
+async def rollback_board_to_commit(
+    board_id:  str,
+    commit_id: str,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    """Return the board to how it was right after this commit, undoing everything since."""
+    board = await assert_board_access(db, board_id, user.id, require_role="editor")
+    return await rollback_to_commit(db, board, commit_id, user_id=str(user.id))
+
+
 @router.post("/{board_id}/history/{event_id}/restore")
 async def restore_history_event(
     board_id: str,
@@ -138,3 +213,46 @@ async def restore_history_event(
     if warnings:
         result["warnings"] = warnings
     return result
+
+
+@router.get("/{board_id}/at", response_model=BoardAtOut)
+async def get_board_at(
+    board_id: str,
+    commit: Optional[str]      = None,
+    ts:     Optional[datetime] = None,
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    """Read-only view of the board (state, elements, connectors) at a commit or timestamp."""
+    if bool(commit) == bool(ts):
+        raise HTTPException(422, "Pass exactly one of commit or ts")
+    board = await assert_board_access(db, board_id, user.id)
+    return await board_at(db, board, ts=ts, commit_id=commit)
+
+
+@router.get("/{board_id}/diff", response_model=BoardDiffOut)
+async def get_board_diff(
+    board_id: str,
+    from_:  Annotated[str, Query(alias="from", description="commit id, branch id, ISO timestamp or 'main'")],
+    to:     Annotated[str, Query(description="commit id, branch id, ISO timestamp or 'main'")] = "main",
+    format: Literal["json", "ndjson"] = "json",
+    user: User          = Depends(get_current_user),
+    db:   AsyncSession  = Depends(get_db),
+):
+    """
+    Added/removed/changed swimlanes, steps, elements and connectors between two versions.
+    format=ndjson streams one record per change (header first, summary last).
+    """
+    board = await assert_board_access(db, board_id, user.id)
+    old = await resolve_side(db, board, from_)
+    new = await resolve_side(db, board, to)
+
+    if format == "json":
+        return collect_diff(old, new)
+
+    def lines():
+        yield json.dumps({"type": "header", "from": describe_side(old), "to": describe_side(new)}) + "\n"
+        for rec in iter_diff(old, new):
+            yield json.dumps(rec, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
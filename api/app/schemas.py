@@ -6,7 +6,7 @@ Covers auth, boards, capabilities, chat, insights, governance, audit, exports.
 from __future__ import annotations
 import re
 from datetime import datetime
-from typing import Any, Literal, Optional
+from typing import Annotated, Any, Literal, Optional, Union
 from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
@@ -92,6 +92,11 @@ class BoardCreate(BaseModel):
         return v
 
 
+class BoardCopy(BoardCreate):
+    """Overrides for duplicate / from-template; omitted fields come from the source."""
+    title: Optional[str] = Field(None, min_length=1, max_length=500)
+
+
 class BoardPatch(BaseModel):
     title:  Optional[str] = Field(None, max_length=500)
     domain: Optional[str] = None
@@ -122,6 +127,14 @@ class BoardOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BoardCounts(BaseModel):
+    """Dashboard aggregates — only present with GET /api/boards?include=counts."""
+    elements:         int
+    connectors:       int
+    open_insights:    int
+    last_activity_at: Optional[datetime] = None
+
+
 class BoardSummary(BaseModel):
     """Lightweight board for list views."""
     id:         str
@@ -131,6 +144,7 @@ class BoardSummary(BaseModel):
     version:    int
     owner_id:   str
     updated_at: datetime
+    counts:     Optional[BoardCounts] = None
 
     model_config = {"from_attributes": True}
 
@@ -205,6 +219,7 @@ class CapabilityOut(BaseModel):
     status:       str
     notes:        Optional[str] = None
     meta:         dict[str, Any] = {}
+    element_id:   Optional[str] = None
     created_at:   datetime
     updated_at:   datetime
 
@@ -228,9 +243,12 @@ class ProposedAction(BaseModel):
 class ChatRequest(BaseModel):
     board_id:    str
     message:     str = Field(min_length=1, max_length=4000)
+    # Ignored: the server loads the conversation itself (chat_memory_service). Still
+    # accepted so older clients keep validating.
     history:     list[ChatHistoryItem] = Field(default_factory=list, max_length=40)
     role:        Optional[str] = None
     attachments: list[str] = Field(default_factory=list, max_length=3)  # list of upload UUIDs
+    branch_id:   Optional[str] = None   # answer about this branch instead of main
 
 
 class AgentError(BaseModel):
@@ -415,6 +433,42 @@ class ChangeEventOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BoardAtOut(BaseModel):
+    """The board as it was at a commit or timestamp (GET /api/boards/{id}/at)."""
+    board_id:        str
+    as_of:           datetime
+    commit_id:       Optional[str] = None
+    checkpoint_id:   Optional[str] = None   # checkpoint the reconstruction started from
+    replayed_events: int
+    state:           dict[str, Any]
+    elements:        list[dict[str, Any]]
+    connectors:      list[dict[str, Any]]
+
+
+class DiffSide(BaseModel):
+    ref:         str
+    kind:        str                      # main | commit | timestamp | branch
+    as_of:       Optional[str] = None
+    branch_name: Optional[str] = None
+
+
+class DiffSection(BaseModel):
+    added:   list[dict[str, Any]]         # snapshots
+    removed: list[dict[str, Any]]
+    changed: list[dict[str, Any]]         # {id, from_id, name, fields: {field: {from, to}}}
+
+
+class BoardDiffOut(BaseModel):
+    """GET /api/boards/{id}/diff — what changed between two versions of a board."""
+    from_:      DiffSide = Field(alias="from")
+    to:         DiffSide
+    swimlanes:  DiffSection
+    steps:      DiffSection
+    elements:   DiffSection
+    connectors: DiffSection
+    summary:    dict[str, dict[str, int]]
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # COMMITS (PRD-17e)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -427,7 +481,7 @@ class CommitOut(BaseModel):
     message:        str
     created_at:     datetime
     author_name:    Optional[str] = None   # populated by API layer
-    event_count:    int = 0                # populated by API layer
+    event_count:    int = 0
 
     model_config = {"from_attributes": True}
 
@@ -437,6 +491,14 @@ class GroupCommitRequest(BaseModel):
     message:   str       = Field(min_length=1, max_length=500)
 
 
+class RevertResult(BaseModel):
+    """Outcome of /commits/{id}/revert and /commits/{id}/rollback."""
+    commit_id: str
+    restored:  list[str]          # element/connector ids written back
+    deleted:   list[str]          # element/connector ids removed
+    warnings:  list[str] = []
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # BRANCHES (PRD-17d)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -450,6 +512,7 @@ class BranchOut(BaseModel):
     board_id:           str
     name:               str
     is_default:         bool
+    copy_on_write:      bool = False
     state_snapshot:     Optional[dict[str, Any]] = None
     created_by_user_id: Optional[str] = None
     created_at:         datetime
@@ -457,6 +520,22 @@ class BranchOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class MergeChanges(BaseModel):
+    add:    list[dict[str, Any]] = []
+    update: list[dict[str, Any]] = []
+    delete: list[dict[str, Any]] = []
+
+
+class MergeResult(BaseModel):
+    dry_run:    bool
+    commit_id:  Optional[str] = None
+    elements:   MergeChanges
+    connectors: MergeChanges
+    swimlanes:  MergeChanges
+    steps:      MergeChanges
+    conflicts:  list[dict[str, Any]] = []
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # ELEMENTS
 # ─────────────────────────────────────────────────────────────────────────────
@@ -537,6 +616,46 @@ class ElementUpdate(BaseModel):
         return v
 
 
+class ElementBatchCreate(ElementCreate):
+    op: Literal["create"]
+
+
+class ElementBatchUpdate(ElementUpdate):
+    op: Literal["update"]
+    id: str
+
+
+class ElementBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: str
+
+
+ElementBatchOp = Annotated[
+    Union[ElementBatchCreate, ElementBatchUpdate, ElementBatchDelete],
+    Field(discriminator="op"),
+]
+
+
+class ElementBatchRequest(BaseModel):
+    operations: list[ElementBatchOp] = Field(min_length=1, max_length=500)
+    message:    Optional[str] = Field(None, max_length=500)   # grouped commit message
+    actor:      str = Field("user", max_length=30)
+
+    @field_validator("actor")
+    @classmethod
+    def validate_actor(cls, v: str) -> str:
+        if v not in {"user", "agent", "agent_undo", "system"}:
+            raise ValueError("actor must be user|agent|agent_undo|system")
+        return v
+
+
+class ElementBatchResult(BaseModel):
+    created:   list[ElementOut] = []
+    updated:   list[ElementOut] = []
+    deleted:   list[str] = []
+    commit_id: Optional[str] = None
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # CONNECTORS (PRD-18)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -569,6 +688,8 @@ class ConnectorUpdate(BaseModel):
 class ConnectorOut(BaseModel):
     id:                 str
     board_id:           str
+    branch_id:          Optional[str] = None
+    base_connector_id:  Optional[str] = None   # branch overlay row: the main connector it replaces
     source_step_id:     Optional[str] = None
     source_element_id:  Optional[str] = None
     target_step_id:     Optional[str] = None
@@ -587,10 +708,44 @@ class ConnectorOut(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ConnectorBatchCreate(ConnectorCreate):
+    op: Literal["create"]
+
+
+class ConnectorBatchUpdate(ConnectorUpdate):
+    op: Literal["update"]
+    id: str
+
+
+class ConnectorBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: str
+
+
+ConnectorBatchOp = Annotated[
+    Union[ConnectorBatchCreate, ConnectorBatchUpdate, ConnectorBatchDelete],
+    Field(discriminator="op"),
+]
+
+
+class ConnectorBatchRequest(BaseModel):
+    operations: list[ConnectorBatchOp] = Field(min_length=1, max_length=500)
+    message:    Optional[str] = Field(None, max_length=500)   # grouped commit message
+    actor:      Literal["user", "agent"] = "user"
+
+
+class ConnectorBatchResult(BaseModel):
+    created:   list[ConnectorOut] = []
+    updated:   list[ConnectorOut] = []
+    deleted:   list[str] = []
+    commit_id: Optional[str] = None
+
+
 class ElementOut(BaseModel):
     id:          str
     board_id:    str
     branch_id:   Optional[str] = None
+    base_element_id: Optional[str] = None   # branch overlay row: the main element it replaces
     swimlane_id: Optional[str] = None
     step_id:     Optional[str] = None
     type:        str
@@ -5,11 +5,16 @@ persists both turns of the conversation.
 """
 from __future__ import annotations
 
+import asyncio
+import io
 import json
 import logging
+import re
 import uuid
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+import anyio
 
 try:
     from google import genai
@@ -20,14 +25,16 @@ except ImportError:  # CI / test environment without google-genai installed
     types         = None  # type: ignore[assignment]
     genai_errors  = None  # type: ignore[assignment]
 
-from fastapi import HTTPException
+from fastapi import BackgroundTasks, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.models import Board, Capability, Connector, Element, Insight, GovernanceDecision, ChatMessage, Upload
+from app.models import Board, Branch, Capability, Connector, Element, Insight, GovernanceDecision, ChatMessage, Upload
 from app.schemas import AgentError, AgentCallError
 from app.services.error_messages import USER_MESSAGES, RETRY_ADVICE
+from app.services import chat_memory_service, pdf_text_service, prompt_cache_service, retrieval_service
+from app.services.text_stats import estimate_tokens, query_terms
 
 log = logging.getLogger(__name__)
 
@@ -50,7 +57,6 @@ def _get_client():
     return _client
 
 
-MAX_HISTORY_MESSAGES = 20
 MAX_RESPONSE_TOKENS  = 8192
 
 
@@ -114,7 +120,70 @@ def _classify_error(exc: Exception, request_id: str) -> AgentError:
 
 # -- Board context builder -----------------------------------------------------
 
-_CONNECTOR_FULL_LIMIT = 100
+# The board context is sized to a token budget (settings.agent_context_token_budget). Every
+# section has up to three representations — full, compressed (fewer fields per row) and
+# summary (counts plus the rows most relevant to the user's message) — and sections are
+# downgraded, least relevant first, until the context fits. A board that fits the budget
+# is rendered in full and identically for every message, so its prompt stays cacheable;
+# a trimmed context depends on the message and is sent inline (see _prepare_turn).
+
+_LEVELS = ("full", "compressed", "summary")
+_QUESTION_KEYS = ("relevant_to_question", "document_excerpts")   # sent in the user turn
+_SAMPLE_SIZE      = 10
+_REPORT_TOKENS    = 80    # the ctx["context_tokens"] entry itself
+_RETRIEVAL_K      = 12    # rows and document chunks retrieved per question
+_EXCERPT_LIMIT    = 5
+_NOTES_CHARS      = 300
+_GOVERNANCE_LIMIT = 500   # decisions indexed for retrieval (the 5 latest are always listed)
+# Words in the user's message that make a section relevant even without naming a row.
+_SECTION_HINTS: dict[str, tuple[str, ...]] = {
+    "board_state":                 ("swimlane", "lane", "step", "stage", "phase", "place"),
+    "elements":                    ("element", "touchpoint", "action", "system", "owner", "status"),
+    "unplaced_elements":           ("unplaced", "orphan", "hidden", "place", "missing"),
+    "capabilities":                ("capabilit", "model", "autonom", "xai", "risk", "hcai"),
+    "open_insights":               ("insight", "issue", "gap", "risk", "problem", "finding"),
+    "recent_governance_decisions": ("governance", "decision", "approv", "policy"),
+    "connectors":                  ("connector", "flow", "link", "connect", "depend", "trigger",
+                                    "sequence", "feedback", "failure", "dead"),
+}
+
+
+def _ctx_tokens(fragment: dict) -> int:
+    return estimate_tokens(json.dumps(fragment, indent=2, default=str))
+
+
+def _row_text(row) -> str:
+    if isinstance(row, dict):
+        return " ".join(_row_text(v) for k, v in row.items() if k != "id")
+    return row if isinstance(row, str) else ""
+
+
+def _score(row: dict, terms: set[str]) -> int:
+    return len(terms & query_terms(_row_text(row))) if terms else 0
+
+
+def _relevant(rows: list[dict], terms: set[str], rank: Optional[dict[str, float]] = None) -> list[dict]:
+    """
+    Top rows by message relevance — retrieval score by row id when `rank` is given, then
+    term overlap; ties keep their original (recency) order.
+    """
+    rank = rank or {}
+    ranked = sorted(
+        enumerate(rows),
+        key=lambda p: (-rank.get(p[1].get("id"), 0.0), -_score(p[1], terms), p[0]),
+    )
+    return [r for _, r in ranked[:_SAMPLE_SIZE]]
+
+
+def _counts(rows: list[dict], field: str) -> dict[str, int]:
+    out: dict[str, int] = {}
+    for r in rows:
+        out[str(r.get(field))] = out.get(str(r.get(field)), 0) + 1
+    return out
+
+
+def _pick(rows: list[dict], fields: tuple[str, ...]) -> list[dict]:
+    return [{f: r[f] for f in fields if r.get(f) is not None} for r in rows]
 
 
 def _resolve_endpoint(
@@ -140,28 +209,30 @@ def _serialize_connector(c: "Connector", step_map: dict, element_map: dict) -> d
     }
 
 
+def _compress_connector(c: dict) -> dict:
+    out = {"id": c["id"], "source": c["source"]["name"], "target": c["target"]["name"], "type": c["type"]}
+    if c.get("label"):
+        out["label"] = c["label"]
+    return out
+
+
 def _build_connector_context(
     connectors: list,
     all_elements: list,
     step_map: dict[str, str],
     element_map: dict[str, str],
-) -> dict:
-    """Return full list or summary dict depending on connector count."""
-    if len(connectors) <= _CONNECTOR_FULL_LIMIT:
-        return {
-            "connectors": [_serialize_connector(c, step_map, element_map) for c in connectors]
-        }
+    terms: set[str],
+    rank: Optional[dict[str, float]] = None,
+) -> list[dict]:
+    """Full, compressed and summary representations of the board's connectors."""
+    full = [_serialize_connector(c, step_map, element_map) for c in connectors]
+    if not full:
+        return [{"connectors": []}]
 
-    # Summary mode for large boards
-    by_type: dict[str, int] = {}
-    by_tier: dict[str, int] = {}
     connected_ids: set[str] = set()
     target_ids: set[str]  = set()
     source_ids: set[str]  = set()
-
     for c in connectors:
-        by_type[c.connector_type] = by_type.get(c.connector_type, 0) + 1
-        by_tier[c.tier]           = by_tier.get(c.tier, 0) + 1
         for fld in (c.source_element_id, c.target_element_id,
                     c.source_step_id,    c.target_step_id):
             if fld:
@@ -183,53 +254,164 @@ def _build_connector_context(
         if str(e.id) in target_ids and str(e.id) not in source_ids
     ][:10]
 
-    return {
-        "connectors_summary": {
-            "total":              len(connectors),
-            "by_type":            by_type,
-            "by_tier":            by_tier,
-            "orphaned_elements":  orphaned,
-            "dead_ends":          dead_ends,
+    compressed = [_compress_connector(c) for c in full]
+    return [
+        {"connectors": full},
+        {"connectors": compressed},
+        {
+            "connectors_summary": {
+                "total":              len(full),
+                "by_type":            _counts(full, "type"),
+                "by_tier":            _counts(full, "tier"),
+                "orphaned_elements":  orphaned,
+                "dead_ends":          dead_ends,
+            },
+            "connectors_sample": _relevant(compressed, terms, rank),
         },
-        "connectors_sample": [
-            _serialize_connector(c, step_map, element_map)
-            for c in connectors[-20:]
-        ],
-    }
+    ]
+
+
+def _list_variants(
+    key: str, rows: list[dict], short: tuple[str, ...], by: tuple[str, ...], terms: set[str],
+    rank: Optional[dict[str, float]] = None,
+) -> list[dict]:
+    """Full / compressed / summary representations of a list section."""
+    if not rows:
+        return [{key: []}]
+    compressed = _pick(rows, short)
+    summary = {"total": len(rows), **{f"by_{f}": _counts(rows, f) for f in by}}
+    return [
+        {key: rows},
+        {key: compressed},
+        {key: _relevant(compressed, terms, rank), f"{key}_summary": summary},
+    ]
 
 
-async def build_board_context(db: AsyncSession, board_id: str) -> dict:
-    """Pull live board state from every relevant table and return as a dict."""
+def _section_costs(
+    variants: dict[str, list[dict]], terms: set[str],
+) -> tuple[dict[str, list[int]], dict[str, int]]:
+    """(section -> estimated tokens per level, section -> relevance to the message)."""
+    cost = {s: [_ctx_tokens(v) for v in vs] for s, vs in variants.items()}
+    relevance = {}
+    for section, vs in variants.items():
+        hints = _SECTION_HINTS.get(section, ())
+        hinted = any(t.startswith(h) for t in terms for h in hints)
+        rows = next(iter(vs[0].values()))
+        hits = sum(1 for r in rows if _score(r, terms)) if isinstance(rows, list) else 0
+        relevance[section] = hits + (5 if hinted else 0)
+    return cost, relevance
+
+
+def _fit_to_budget(
+    cost: dict[str, list[int]], relevance: dict[str, int], base_tokens: int, budget: int,
+) -> tuple[dict[str, int], int]:
+    """
+    Choose a representation level per section so the context fits `budget`. Each step
+    downgrades the section with the best token saving per unit of message relevance.
+    Returns (section -> level index, estimated tokens).
+    """
+    level = {s: 0 for s in cost}
+    used = base_tokens + sum(c[0] for c in cost.values())
+    while used > budget:
+        options = [
+            ((cost[s][level[s]] - cost[s][level[s] + 1]) / (1 + relevance[s]), s)
+            for s in cost if level[s] + 1 < len(cost[s])
+        ]
+        if not options:
+            break
+        _, section = max(options)
+        used -= cost[section][level[section]] - cost[section][level[section] + 1]
+        level[section] += 1
+    return level, used
+
+
+def _retrieval_docs(
+    elements: list, connectors: list, governance: list,
+    step_map: dict[str, str], element_map: dict[str, str],
+) -> list[tuple[str, str, dict]]:
+    """Board rows as retrieval_service docs: (key, text to embed, payload for the prompt)."""
+    docs = []
+    for e in elements:
+        payload = {"kind": "element", "id": str(e.id), "type": e.type, "name": e.name,
+                   "status": e.status, "placed": bool(e.swimlane_id and e.step_id)}
+        if e.notes:
+            payload["notes"] = e.notes[:_NOTES_CHARS]
+        docs.append((f"element:{e.id}", f"{e.type} {e.name} {e.owner or ''} {e.notes or ''}", payload))
+    for c in connectors:
+        row = _compress_connector(_serialize_connector(c, step_map, element_map))
+        docs.append((f"connector:{c.id}",
+                     f"{row['source']} {row['target']} {row['type']} {c.label or ''} {c.notes or ''}",
+                     {"kind": "connector", **row}))
+    for g in governance:
+        payload = {"kind": "governance", "id": str(g.id), "type": g.decision_type, "title": g.title}
+        if g.rationale:
+            payload["rationale"] = g.rationale[:_NOTES_CHARS]
+        docs.append((f"governance:{g.id}", f"{g.decision_type or ''} {g.title or ''} {g.rationale or ''}", payload))
+    return docs
+
+
+async def build_board_context(
+    db: AsyncSession,
+    board_id: str,
+    branch_id: Optional[str] = None,
+    message: str = "",
+    token_budget: Optional[int] = None,
+) -> dict:
+    """
+    Pull live board state from every relevant table and return as a dict. With branch_id,
+    elements and swimlanes/steps are the branch's view (main plus its overlay).
+
+    The result is sized to `token_budget` (default settings.agent_context_token_budget);
+    `message` decides which sections keep their detail when the board does not fit.
+    ctx["context_tokens"] reports the estimate and the representation chosen per section.
+    """
+    from app.services.element_service import _element_scope, is_copy_on_write
+    from app.services.connector_service import _connector_scope, branch_endpoint_map
+
     board_res = await db.execute(select(Board).where(Board.id == board_id))
     board = board_res.scalar_one_or_none()
     if not board:
         return {}
+    state = board.state or {}
+    overlay = False
+    if branch_id:
+        branch = (await db.execute(
+            select(Branch).where(Branch.id == branch_id, Branch.board_id == board_id)
+        )).scalar_one_or_none()
+        if not branch or branch.is_default:
+            branch_id = None
+        else:
+            overlay = branch.copy_on_write
+            state = {**state, **(branch.state_snapshot or {})}
 
     caps_res = await db.execute(
         select(Capability).where(Capability.board_id == board_id).order_by(Capability.cap_id)
     )
     caps = caps_res.scalars().all()
 
-    # Fetch all elements — need all for connector name resolution; display is capped at 20.
+    # Fetch all elements — need all for connector name resolution; display is budgeted below.
     elems_res = await db.execute(
         select(Element)
-        .where(Element.board_id == board_id)
+        .where(_element_scope(board_id, branch_id, overlay=overlay))
         .order_by(Element.updated_at.desc())
     )
     all_elements = elems_res.scalars().all()
-    elements = all_elements[:20]
 
     conn_res = await db.execute(
         select(Connector)
-        .where(Connector.board_id == board_id)
+        .where(_connector_scope(board_id, branch_id, overlay=overlay))
         .order_by(Connector.created_at)
     )
     connectors = conn_res.scalars().all()
 
     element_map = {str(e.id): e.name for e in all_elements}
+    if overlay:
+        # Connectors keep main element ids; name them after the branch's overlay rows.
+        for base_id, overlay_id in (await branch_endpoint_map(db, board_id, branch_id)).items():
+            element_map[base_id] = element_map.get(overlay_id, base_id)
     step_map    = {
         str(s["id"]): s.get("name", "")
-        for s in (board.state or {}).get("steps", [])
+        for s in state.get("steps", [])
         if "id" in s
     }
 
@@ -242,7 +424,7 @@ async def build_board_context(db: AsyncSession, board_id: str) -> dict:
         select(Insight).where(
             Insight.board_id     == board_id,
             Insight.is_dismissed.is_(False),
-        ).order_by(Insight.generated_at.desc()).limit(10)
+        ).order_by(Insight.generated_at.desc()).limit(100)
     )
     open_insights = open_ins_res.scalars().all()
 
@@ -250,19 +432,99 @@ async def build_board_context(db: AsyncSession, board_id: str) -> dict:
         select(GovernanceDecision)
         .where(GovernanceDecision.board_id == board_id)
         .order_by(GovernanceDecision.decided_at.desc())
-        .limit(5)
+        .limit(_GOVERNANCE_LIMIT)
     )
-    recent_gov = gov_res.scalars().all()
+    all_gov = gov_res.scalars().all()
+    recent_gov = all_gov[:5]
+
+    terms = query_terms(message)
+    rank: dict[str, float] = {}
+    excerpts: list[dict] = []
+    related: list[dict] = []
+    if message:
+        docs = _retrieval_docs(all_elements, connectors, all_gov, step_map, element_map)
+        docs += await retrieval_service.upload_docs(db, board_id)
+        hits = retrieval_service.search(f"{board_id}:{branch_id or 'main'}", docs, message, k=_RETRIEVAL_K)
+        rank = {h["payload"]["id"]: h["score"] for h in hits if "id" in h["payload"]}
+        excerpts = [h["payload"] for h in hits if h["payload"]["kind"] == "document"][:_EXCERPT_LIMIT]
+        related = [h["payload"] for h in hits if h["payload"]["kind"] != "document"]
+    capabilities = [
+        {
+            "cap_id":       c.cap_id,
+            "name":         c.name,
+            "type":         c.type,
+            "risk_level":   c.risk_level,
+            "frontstage":   c.frontstage,
+            "xai_strategy": c.xai_strategy,
+            "autonomy":     c.autonomy,
+            "status":       c.status,
+            "owner":        c.owner,
+        }
+        for c in caps
+    ]
+    elements = [
+        {
+            "id":     str(e.id),
+            "type":   e.type,
+            "name":   e.name,
+            "status": e.status,
+            "owner":  e.owner,
+        }
+        for e in placed_elements
+    ]
+    unplaced = [{"id": str(e.id), "type": e.type, "name": e.name} for e in orphaned_elements]
+    insights = [
+        {"severity": i.severity, "title": i.title, "source": i.source_ref}
+        for i in open_insights
+    ]
+    governance = [
+        {
+            "type":       g.decision_type,
+            "title":      g.title,
+            "decided_at": str(g.decided_at),
+        }
+        for g in recent_gov
+    ]
 
-    connector_ctx = _build_connector_context(connectors, all_elements, step_map, element_map)
+    variants: dict[str, list[dict]] = {
+        # Swimlane/step ids back the placement reference, so the state is never summarised.
+        "board_state": [
+            {"board_state": state},
+            {"board_state": {
+                "swimlanes": _pick(state.get("swimlanes", []), ("id", "name", "lane_type")),
+                "steps":     _pick(state.get("steps", []), ("id", "name")),
+            }},
+        ],
+        "capabilities": _list_variants(
+            "capabilities", capabilities, ("cap_id", "name", "risk_level", "autonomy", "status"),
+            ("risk_level", "status"), terms, rank,
+        ),
+        "elements": _list_variants(
+            "elements", elements, ("id", "type", "name"), ("type", "status"), terms, rank,
+        ),
+        # Unplaced elements exist in the DB but are NOT visible on the canvas.
+        # Use update_element with swimlane_id + step_id to place them.
+        # Never use create_element for these — that would create duplicates.
+        "unplaced_elements": _list_variants(
+            "unplaced_elements", unplaced, ("id", "name"), ("type",), terms, rank,
+        ),
+        "open_insights": _list_variants(
+            "open_insights", insights, ("severity", "title"), ("severity",), terms,
+        ),
+        "recent_governance_decisions": _list_variants(
+            "recent_governance_decisions", governance, ("type", "title"), ("type",), terms, rank,
+        ),
+        "connectors": _build_connector_context(
+            connectors, all_elements, step_map, element_map, terms, rank,
+        ),
+    }
 
-    return {
+    ctx = {
         "board_id":      board.id,
         "title":         board.title,
         "domain":        board.domain,
         "current_phase": board.phase,
         "version":       board.version,
-        "board_state":   board.state,
         # IMPORTANT: only placed_elements are VISIBLE on the canvas.
         # Orphaned elements exist in the DB but have no swimlane+step placement
         # and are completely invisible to users. Do NOT tell the user the board
@@ -270,58 +532,41 @@ async def build_board_context(db: AsyncSession, board_id: str) -> dict:
         "canvas_summary": {
             "placed_element_count":  len(placed_elements),
             "orphaned_element_count": len(orphaned_elements),
-            "swimlane_count":        len((board.state or {}).get("swimlanes", [])),
-            "step_count":            len((board.state or {}).get("steps", [])),
+            "swimlane_count":        len(state.get("swimlanes", [])),
+            "step_count":            len(state.get("steps", [])),
         },
-        "capabilities": [
-            {
-                "cap_id":       c.cap_id,
-                "name":         c.name,
-                "type":         c.type,
-                "risk_level":   c.risk_level,
-                "frontstage":   c.frontstage,
-                "xai_strategy": c.xai_strategy,
-                "autonomy":     c.autonomy,
-                "status":       c.status,
-                "owner":        c.owner,
-            }
-            for c in caps
-        ],
-        "elements": [
-            {
-                "id":     str(e.id),
-                "type":   e.type,
-                "name":   e.name,
-                "status": e.status,
-                "owner":  e.owner,
-            }
-            for e in placed_elements[:20]
-        ],
-        # Unplaced elements exist in the DB but are NOT visible on the canvas.
-        # Use update_element with swimlane_id + step_id to place them.
-        # Never use create_element for these — that would create duplicates.
-        "unplaced_elements": [
-            {
-                "id":   str(e.id),
-                "type": e.type,
-                "name": e.name,
-            }
-            for e in orphaned_elements
-        ],
-        "open_insights": [
-            {"severity": i.severity, "title": i.title, "source": i.source_ref}
-            for i in open_insights
-        ],
-        "recent_governance_decisions": [
-            {
-                "type":       g.decision_type,
-                "title":      g.title,
-                "decided_at": str(g.decided_at),
-            }
-            for g in recent_gov
-        ],
-        **connector_ctx,
     }
+    budget = token_budget if token_budget is not None else settings.agent_context_token_budget
+    base = _ctx_tokens(ctx) + _REPORT_TOKENS
+    # The _QUESTION_KEYS sections share the budget but are reported apart: "used" lands
+    # in the system prompt, which must not change from one question to the next.
+    question = _ctx_tokens({"document_excerpts": excerpts}) if excerpts else 0
+    if excerpts:
+        ctx["document_excerpts"] = excerpts
+    cost, relevance = _section_costs(variants, terms)
+    level, used = _fit_to_budget(cost, relevance, base + question, budget)
+    if related and any(level.values()):
+        # Trimmed sections may have dropped rows the question is about: add them back,
+        # best first, as far as the budget allows.
+        extra = [_ctx_tokens({"relevant_to_question": []})] + [_ctx_tokens(r) for r in related]
+        for n in range(len(related), 0, -1):
+            fit = _fit_to_budget(cost, relevance, base + question + sum(extra[:n + 1]), budget)
+            if fit[1] <= budget:
+                level, used = fit
+                question += sum(extra[:n + 1])
+                ctx["relevant_to_question"] = related[:n]
+                break
+    for section, vs in variants.items():
+        ctx.update(vs[level[section]])
+    ctx["context_tokens"] = {
+        "budget":   budget,
+        "used":     used - question,   # board sections only
+        "sections": {s: _LEVELS[i] for s, i in level.items()},
+    }
+    if any(level.values()):
+        log.info("board context %s trimmed to ~%d/%d tokens: %s",
+                 board_id, used, budget, ctx["context_tokens"]["sections"])
+    return ctx
 
 
 # -- System prompt builder -----------------------------------------------------
@@ -329,6 +574,8 @@ async def build_board_context(db: AsyncSession, board_id: str) -> dict:
 def _has_ai_content(ctx: dict) -> bool:
     if ctx.get("capabilities"):
         return True
+    if (ctx.get("elements_summary") or {}).get("by_type", {}).get("ai_capability"):
+        return True
     return any(e.get("type") == "ai_capability" for e in ctx.get("elements", []))
 
 
@@ -352,9 +599,23 @@ def _placement_reference(ctx: dict) -> str:
     return "\n".join(lines)
 
 
+def _trimmed_note(ctx: dict) -> str:
+    """Tell the agent which context sections were shortened to fit the token budget."""
+    sections = (ctx.get("context_tokens") or {}).get("sections", {})
+    trimmed = [s for s, level in sections.items() if level != "full"]
+    if not trimmed:
+        return ""
+    return (
+        f"\nThis board is large: {', '.join(trimmed)} are abbreviated above (compressed rows, or "
+        "counts plus the rows most relevant to this question). Do not assume a row is missing "
+        "from the board because it is not listed; ask the user or refer to the counts.\n"
+    )
+
+
 def _core_section(ctx: dict) -> str:
-    ctx_json = json.dumps(ctx, indent=2, default=str)
-    placement_ref = _placement_reference(ctx)
+    board = {k: v for k, v in ctx.items() if k not in _QUESTION_KEYS}
+    ctx_json = json.dumps(board, indent=2, default=str)
+    placement_ref = _placement_reference(ctx) + _trimmed_note(ctx)
     return f"""You are the Blueprint Agent -- an expert collaborator embedded in Blueprint AI, a tool for mapping end-to-end system journeys across stakeholders, services, and systems.
 
 You have real-time access to the current board:
@@ -574,6 +835,29 @@ def _parse_agent_response(text: str) -> tuple[str, list[dict]]:
     return text, []
 
 
+def _question_context(ctx: dict) -> str:
+    """
+    The retrieval results for this question, sent in the user turn ahead of the message.
+    They differ per question, so keeping them out of the system prompt keeps that prompt
+    (and its provider cache) the same from one question to the next.
+    """
+    lines = []
+    if ctx.get("relevant_to_question"):
+        lines.append(
+            "[Board rows (elements, connectors, governance decisions) that best match my "
+            "question, retrieved from the full board — including rows the abbreviated board "
+            "context leaves out. Prefer them when answering.]\n"
+            + json.dumps(ctx["relevant_to_question"], indent=2, default=str)
+        )
+    if ctx.get("document_excerpts"):
+        lines.append(
+            "[Passages from PDFs uploaded to this board that match my question. Cite them by "
+            "filename and page; they are excerpts, not whole documents.]\n"
+            + json.dumps(ctx["document_excerpts"], indent=2, default=str)
+        )
+    return "\n\n".join(lines)
+
+
 def build_system_prompt(ctx: dict, role: Optional[str] = None) -> str:
     sections = [_core_section(ctx)]
     sections.append(_connectors_section(ctx))
@@ -589,93 +873,200 @@ def build_system_prompt(ctx: dict, role: Optional[str] = None) -> str:
 
 # -- Message format helpers ----------------------------------------------------
 
-def _history_to_gemini(history: list[dict]) -> list[types.Content]:
-    """Convert stored message history to Gemini Content objects."""
+def _history_to_gemini(
+    history: list[dict], file_parts: Optional[dict[str, types.Part]] = None,
+) -> list[types.Content]:
+    """
+    Convert stored message history to Gemini Content objects. Attachments of earlier
+    turns are included when `file_parts` has a part for them (by upload_id).
+    """
     contents = []
     for msg in history:
         role = "user" if msg["role"] == "user" else "model"
         text = msg["content"] if isinstance(msg["content"], str) else str(msg["content"])
-        contents.append(types.Content(role=role, parts=[types.Part(text=text)]))
+        files = [
+            file_parts[a["upload_id"]] for a in (msg.get("attachments") or [])
+            if file_parts and a.get("upload_id") in file_parts
+        ]
+        contents.append(types.Content(role=role, parts=files + [types.Part(text=text)]))
     return contents
 
 
+def _summary_to_gemini(summary: str) -> list[types.Content]:
+    """The rolling summary of older turns, as an opening exchange."""
+    if not summary:
+        return []
+    return [
+        types.Content(role="user", parts=[types.Part(
+            text=f"Summary of our earlier conversation about this board:\n{summary}"
+        )]),
+        types.Content(role="model", parts=[types.Part(text="Understood — I'll keep that in mind.")]),
+    ]
+
+
 async def _build_user_parts(
-    db: AsyncSession, attachment_ids: list[str], board_id: str, text: str
-) -> tuple[list[types.Part], list[dict]]:
+    db: AsyncSession,
+    attachment_ids: list[str],
+    board_id: str,
+    text: str,
+    earlier_ids: frozenset[str] = frozenset(),
+) -> tuple[list[types.Part], list[dict], dict[str, types.Part]]:
     """
-    Fetch attached files and build Gemini Part objects (images and PDFs supported).
+    Build Gemini Part objects for attached files (images and PDFs supported):
+    (this turn's parts ending with the text, attachment refs to store, upload_id -> part
+    for attachments of earlier turns still in the prompt).
+    Files are resolved concurrently. Each is uploaded to the Gemini Files API once and
+    then sent by reference; bytes go inline only for this turn's files when that is
+    unavailable, and earlier turns' files are then left out rather than re-sent.
     Falls back gracefully if storage is not configured or a file fails.
     """
-    from app.services.upload_service import download_bytes
-
-    parts: list[types.Part] = []
     attach_refs: list[dict] = []
-
-    if attachment_ids:
+    wanted = set(attachment_ids) | set(earlier_ids)
+    uploads: list[Upload] = []
+    if wanted:
         uploads_res = await db.execute(
             select(Upload).where(
-                Upload.id.in_(attachment_ids),
+                Upload.id.in_(wanted),
                 Upload.board_id == board_id,
             )
         )
         uploads = uploads_res.scalars().all()
 
-        for up in uploads:
+    current = set(attachment_ids)
+    for up in uploads:
+        if str(up.id) in current:
             attach_refs.append({
                 "upload_id":    str(up.id),
                 "filename":     up.filename,
                 "content_type": up.content_type,
             })
-            try:
-                file_bytes = await download_bytes(up.storage_path)
-                parts.append(types.Part(
-                    inline_data=types.Blob(
-                        mime_type=up.content_type,
-                        data=file_bytes,
-                    )
-                ))
-            except Exception as exc:
-                log.warning("Could not fetch attachment %s: %s", up.id, exc)
+
+    resolved = await asyncio.gather(
+        *(_file_part(up, inline=str(up.id) in current, query=text) for up in uploads),
+        return_exceptions=True,
+    )
+    parts: list[types.Part] = []
+    earlier: dict[str, types.Part] = {}
+    for up, result in zip(uploads, resolved):
+        if isinstance(result, BaseException):
+            log.warning("Could not fetch attachment %s: %s", up.id, result)
+            continue
+        if result is None:
+            continue
+        part, ref = result
+        if ref:   # newly uploaded: remember it for later turns (committed with the user turn)
+            up.provider_file_uri, up.provider_file_expires_at = ref
+        if str(up.id) in current:
+            parts.append(part)
+        else:
+            earlier[str(up.id)] = part
 
     parts.append(types.Part(text=text))
-    return parts, attach_refs
+    return parts, attach_refs, earlier
+
+
+_FILE_REF_MARGIN = timedelta(hours=1)   # re-upload before the provider deletes the file
+
+
+async def _file_part(
+    up: Upload, inline: bool, query: str = "",
+) -> Optional[tuple[types.Part, Optional[tuple[str, datetime]]]]:
+    """
+    (part, new (uri, expiry) to store or None) for one upload; None to leave it out.
+    PDFs with a text layer become their locally extracted text when pdf_text_service
+    is available, trimmed to the pages relevant to `query`.
+    """
+    from app.services.upload_service import download_bytes
+
+    if up.content_type == "application/pdf" and pdf_text_service.available():
+        doc = await pdf_text_service.extract(str(up.id), lambda: download_bytes(up.storage_path))
+        if doc:
+            text = pdf_text_service.render(doc, up.filename, query, settings.pdf_text_token_budget)
+            return types.Part(text=text), None
+
+    expires = up.provider_file_expires_at
+    if expires is not None and expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    if up.provider_file_uri and expires and expires > datetime.now(timezone.utc) + _FILE_REF_MARGIN:
+        return _file_ref_part(up.provider_file_uri, up.content_type), None
+
+    if not settings.gemini_file_uploads and not inline:
+        return None
+    data = await download_bytes(up.storage_path)
+    ref = await _upload_file(up, data) if settings.gemini_file_uploads else None
+    if ref:
+        return _file_ref_part(ref[0], up.content_type), ref
+    if not inline:
+        return None
+    return types.Part(inline_data=types.Blob(mime_type=up.content_type, data=data)), None
+
+
+def _file_ref_part(uri: str, mime_type: str) -> types.Part:
+    return types.Part(file_data=types.FileData(file_uri=uri, mime_type=mime_type))
+
+
+async def _upload_file(up: Upload, data: bytes) -> Optional[tuple[str, datetime]]:
+    """Upload to the Gemini Files API; (uri, expiry) or None when unsupported or failed."""
+    try:
+        client = _get_client()
+        f = await client.aio.files.upload(
+            file=io.BytesIO(data),
+            config=types.UploadFileConfig(mime_type=up.content_type, display_name=up.filename[:128]),
+        )
+        # PDFs are processed before they can be referenced; this normally takes seconds.
+        for _ in range(10):
+            if not str(f.state or "").upper().endswith("PROCESSING"):
+                break
+            await asyncio.sleep(1)
+            f = await client.aio.files.get(name=f.name)
+        if not f.uri or not str(f.state or "ACTIVE").upper().endswith("ACTIVE"):
+            return None
+        return f.uri, f.expiration_time or datetime.now(timezone.utc) + timedelta(hours=47)
+    except Exception as exc:
+        log.info("File upload unavailable for attachment %s: %s", up.id, exc)
+        return None
 
 
 # -- Main chat function --------------------------------------------------------
 
-async def chat(
+async def _prepare_turn(
     db:             AsyncSession,
     board_id:       str,
     user_id:        str,
     message:        str,
-    history:        list[dict],
-    role:           Optional[str] = None,
-    attachment_ids: list[str] = [],
-) -> tuple[str, int, str, list[dict]]:
+    role:           Optional[str],
+    attachment_ids: list[str],
+    branch_id:      Optional[str],
+    background:     Optional[BackgroundTasks] = None,
+) -> tuple[list[types.Content], str, list[dict], Optional[str]]:
     """
-    Call Gemini API with board-aware system prompt.
-    Persists user turn immediately; persists assistant turn on success only.
-    Returns (response_text, total_tokens_used, assistant_message_id).
-    Raises AgentCallError on any AI service failure.
+    Build the Gemini request for one turn: (contents, system prompt, attachment refs,
+    prompt cache key). The conversation so far comes from chat_memory_service (summary +
+    recent turns); a fold that is due is added to `background`, to run after the
+    response. Persists the user message before any LLM call.
+
+    The cache key is None when the board context was trimmed to the token budget: which
+    sections are abbreviated, and which rows their samples keep, then depend on the
+    message, so caching that prompt would register a new cache on nearly every turn.
     """
-    global _consecutive_failures, _last_error_code
-
-    if types is None:
-        raise HTTPException(503, "AI service unavailable: google-genai package not installed.")
-
-    request_id = str(uuid.uuid4())
-
-    ctx     = await build_board_context(db, board_id)
+    ctx     = await build_board_context(db, board_id, branch_id=branch_id, message=message)
     system  = build_system_prompt(ctx, role=role)
-    trimmed = history[-MAX_HISTORY_MESSAGES:]
+    summary, recent, pending = await chat_memory_service.load_memory(db, board_id)
+    if background is not None and chat_memory_service.fold_due(pending):
+        background.add_task(chat_memory_service.fold_in_background, board_id)
 
-    if attachment_ids:
-        user_parts, attach_refs = await _build_user_parts(
-            db, attachment_ids, board_id, message
+    earlier_ids = frozenset(
+        a["upload_id"] for m in recent for a in (m.get("attachments") or []) if a.get("upload_id")
+    )
+    if attachment_ids or earlier_ids:
+        user_parts, attach_refs, earlier_parts = await _build_user_parts(
+            db, attachment_ids, board_id, message, earlier_ids
         )
     else:
-        user_parts  = [types.Part(text=message)]
-        attach_refs = []
+        user_parts, attach_refs, earlier_parts = [types.Part(text=message)], [], {}
+    retrieved = _question_context(ctx)
+    if retrieved:
+        user_parts.insert(len(user_parts) - 1, types.Part(text=retrieved))
 
     # Persist user message before LLM call (FR-7: user message survives AI errors).
     # commit() not flush() so the row is durable even when the LLM call fails and
@@ -687,48 +1078,94 @@ async def chat(
     db.add(user_msg)
     await db.commit()
 
-    contents = _history_to_gemini(trimmed) + [
+    contents = _summary_to_gemini(summary) + _history_to_gemini(recent, earlier_parts) + [
         types.Content(role="user", parts=user_parts)
     ]
+    full = all(level == "full" for level in ctx.get("context_tokens", {}).get("sections", {}).values())
+    cache_key = _prompt_key(board_id, branch_id, role) if full else None
+    return contents, system, attach_refs, cache_key
 
-    try:
-        response = await _get_client().aio.models.generate_content(
-            model=settings.gemini_model,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                system_instruction=system,
-                max_output_tokens=MAX_RESPONSE_TOKENS,
-            ),
-        )
-    except HTTPException:
-        raise
-    except Exception as exc:
-        _consecutive_failures += 1
-        agent_error = _classify_error(exc, request_id)
-        _last_error_code = agent_error.code
-        log.error(
-            "Gemini API error (request_id=%s board=%s user=%s code=%s): %s: %s",
-            request_id, board_id, user_id, agent_error.code,
-            type(exc).__name__, exc,
-        )
-        raise AgentCallError(error=agent_error) from exc
 
+async def _call_model(
+    cache_key: Optional[str],
+    system:    str,
+    contents:  list[types.Content],
+    stream:    bool = False,
+):
+    """
+    generate_content (or the streaming variant) with the system prompt served from the
+    provider cache when one is available (never when cache_key is None). If the provider rejects the cached content
+    (expired or evicted), the cache is dropped and the request resent once with the
+    prompt inline.
+    """
+    client = _get_client()
+    call = client.aio.models.generate_content_stream if stream else client.aio.models.generate_content
+    cached = await prompt_cache_service.cached_prompt(client, types, cache_key, system) if cache_key else None
+    if cached:
+        try:
+            return await call(
+                model=settings.gemini_model,
+                contents=contents,
+                config=types.GenerateContentConfig(
+                    cached_content=cached,
+                    max_output_tokens=MAX_RESPONSE_TOKENS,
+                ),
+            )
+        except Exception as exc:
+            if not (genai_errors and isinstance(exc, genai_errors.ClientError) and exc.code in (400, 403, 404)):
+                raise
+            log.info("cached prompt rejected (%s): %s — resending inline", cache_key, exc)
+            await prompt_cache_service.drop(client, cache_key)
+    return await call(
+        model=settings.gemini_model,
+        contents=contents,
+        config=types.GenerateContentConfig(
+            system_instruction=system,
+            max_output_tokens=MAX_RESPONSE_TOKENS,
+        ),
+    )
+
+
+def _prompt_key(board_id: str, branch_id: Optional[str], role: Optional[str]) -> str:
+    """Prompt-cache variant: the system prompt differs per branch and per agent role."""
+    return ":".join([board_id, branch_id or "main", role or "default"])
+
+
+def _call_failed(exc: Exception, request_id: str, board_id: str, user_id: str) -> AgentCallError:
+    """Count the failure for /health/agent, log it, and wrap it for the client."""
+    global _consecutive_failures, _last_error_code
+    _consecutive_failures += 1
+    agent_error = _classify_error(exc, request_id)
+    _last_error_code = agent_error.code
+    log.error(
+        "Gemini API error (request_id=%s board=%s user=%s code=%s): %s: %s",
+        request_id, board_id, user_id, agent_error.code,
+        type(exc).__name__, exc,
+    )
+    return AgentCallError(error=agent_error)
+
+
+def _call_succeeded() -> None:
+    global _consecutive_failures, _last_error_code
     _consecutive_failures = 0
     _last_error_code = None
 
-    text   = response.text or ""
-    tokens = response.usage_metadata.total_token_count if response.usage_metadata else 0
 
+async def _persist_reply(
+    db:            AsyncSession,
+    board_id:      str,
+    text:          str,
+    tokens:        int,
+    finish_reason: object = None,
+) -> tuple[str, str, list[dict]]:
+    """Store the assistant turn; returns (display_text, message_id, actions). Flushes only."""
     # Detect truncation: if the model was stopped by the token limit, append a hint
     try:
-        finish_reason = response.candidates[0].finish_reason if response.candidates else None
-        if finish_reason and str(finish_reason).upper() in ("MAX_TOKENS", "2"):
+        if finish_reason and str(finish_reason).upper() in ("MAX_TOKENS", "2", "FINISHREASON.MAX_TOKENS"):
             text = text.rstrip() + "\n\n*Response reached length limit. Ask me to continue, or narrow your question.*"
     except Exception:
         pass
 
-    log.info("Chat tokens used: %d (board=%s, attachments=%d)", tokens, board_id, len(attach_refs))
-
     # Parse structured JSON response ({message, actions}) if present.
     # Store the raw text (JSON) in DB so history can reconstruct proposal cards.
     display_text, actions = _parse_agent_response(text)
@@ -739,5 +1176,228 @@ async def chat(
     )
     db.add(asst_msg)
     await db.flush()
+    return display_text, str(asst_msg.id), actions
+
+
+async def chat(
+    db:             AsyncSession,
+    board_id:       str,
+    user_id:        str,
+    message:        str,
+    role:           Optional[str] = None,
+    attachment_ids: list[str] = [],
+    branch_id:      Optional[str] = None,
+    background:     Optional[BackgroundTasks] = None,
+) -> tuple[str, int, str, list[dict]]:
+    """
+    Call Gemini API with board-aware system prompt.
+    Persists user turn immediately; persists assistant turn on success only.
+    Returns (response_text, total_tokens_used, assistant_message_id).
+    Raises AgentCallError on any AI service failure.
+    """
+    if types is None:
+        raise HTTPException(503, "AI service unavailable: google-genai package not installed.")
+
+    request_id = str(uuid.uuid4())
+    contents, system, attach_refs, cache_key = await _prepare_turn(
+        db, board_id, user_id, message, role, attachment_ids, branch_id, background,
+    )
+
+    try:
+        response = await _call_model(cache_key, system, contents)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise _call_failed(exc, request_id, board_id, user_id) from exc
+
+    _call_succeeded()
+
+    text   = response.text or ""
+    tokens = response.usage_metadata.total_token_count if response.usage_metadata else 0
+    try:
+        finish_reason = response.candidates[0].finish_reason if response.candidates else None
+    except Exception:
+        finish_reason = None
+
+    log.info("Chat tokens used: %d (board=%s, attachments=%d)", tokens, board_id, len(attach_refs))
+
+    display_text, msg_id, actions = await _persist_reply(db, board_id, text, tokens, finish_reason)
+    return display_text, tokens, msg_id, actions
+
+
+# -- Streaming chat ------------------------------------------------------------
 
-    return display_text, tokens, str(asst_msg.id), actions
+class _EnvelopeStream:
+    """
+    Incremental reader for a streamed reply. The model answers with a
+    {"message": ..., "actions": [...]} envelope (optionally fenced or after some prose);
+    feed() returns the newly readable part of the message text, so it can be shown
+    while the actions are still being generated. Plain-prose replies pass through.
+    The complete reply is always re-parsed with _parse_agent_response at the end.
+    """
+    _START   = re.compile(r'\{\s*"message"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+    _HOLD    = 40   # chars to wait after a '{' or '`' before deciding it is not an envelope
+
+    def __init__(self) -> None:
+        self.raw   = ""
+        self._pos  = None    # index of the next unread char of the message string
+        self._sent = 0       # prose mode: chars of raw already returned
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self._done:
+            return ""
+        if self._pos is None:
+            m = self._START.search(self.raw, self._sent)
+            if not m:
+                return self._prose()
+            self._pos = m.end()
+        return self._message()
+
+    def _prose(self) -> str:
+        end = len(self.raw)
+        for ch in ("{", "`"):
+            i = self.raw.find(ch, self._sent)
+            if i >= 0 and end - i < self._HOLD:
+                end = min(end, i)
+        out, self._sent = self.raw[self._sent:end], end
+        return out
+
+    def _message(self) -> str:
+        raw, i, out = self.raw, self._pos, []
+        while i < len(raw):
+            ch = raw[i]
+            if ch == '"':
+                self._done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break                                   # escape split across chunks
+            esc = raw[i + 1]
+            if esc == "u":
+                if i + 6 > len(raw):
+                    break
+                try:
+                    out.append(chr(int(raw[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+
+async def open_chat_stream(
+    db:              AsyncSession,
+    board_id:        str,
+    user_id:         str,
+    message:         str,
+    role:            Optional[str] = None,
+    attachment_ids:  list[str] = [],
+    branch_id:       Optional[str] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    background:      Optional[BackgroundTasks] = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Streaming variant of chat(). Context building, the user-turn commit and opening
+    the Gemini stream happen here (so HTTP errors surface before any bytes are sent);
+    the returned iterator then yields
+      ("delta", {"text"})  — more of the reply's message text, as it is generated,
+      ("done",  {"response", "token_count", "message_id", "actions"}) — once, at the end,
+      ("error", {"error"}) — instead of "done" when the AI call fails.
+    The assistant turn is committed when the stream ends. If the client disconnects,
+    generation stops and the partial reply is kept, marked as interrupted.
+    """
+    if types is None:
+        raise HTTPException(503, "AI service unavailable: google-genai package not installed.")
+
+    request_id = str(uuid.uuid4())
+    contents, system, attach_refs, cache_key = await _prepare_turn(
+        db, board_id, user_id, message, role, attachment_ids, branch_id, background,
+    )
+    try:
+        stream = await _call_model(cache_key, system, contents, stream=True)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        failure = _call_failed(exc, request_id, board_id, user_id)
+
+        async def _failed() -> AsyncIterator[tuple[str, dict]]:
+            yield "error", {"error": failure.error.model_dump()}
+        return _failed()
+
+    return _relay_stream(board_id, user_id, request_id, stream, len(attach_refs), is_disconnected)
+
+
+async def _relay_stream(
+    board_id:        str,
+    user_id:         str,
+    request_id:      str,
+    stream:          AsyncIterator,
+    attachments:     int,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+) -> AsyncIterator[tuple[str, dict]]:
+    # The response body runs after the request's get_db session has been closed, so the
+    # reply is persisted through a session of its own.
+    from app.database import AsyncSessionLocal
+    db = AsyncSessionLocal()
+    try:
+        envelope      = _EnvelopeStream()
+        tokens        = 0
+        finish_reason = None
+        interrupted   = False
+        failure: Optional[AgentCallError] = None
+
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage and usage.total_token_count:
+                    tokens = usage.total_token_count
+                if chunk.candidates and chunk.candidates[0].finish_reason:
+                    finish_reason = chunk.candidates[0].finish_reason
+                delta = envelope.feed(chunk.text or "")
+                if delta:
+                    yield "delta", {"text": delta}
+                if is_disconnected is not None and await is_disconnected():
+                    interrupted = True
+                    break
+        except (asyncio.CancelledError, GeneratorExit):
+            # Starlette cancels the response task when the client goes away mid-reply.
+            with anyio.CancelScope(shield=True):
+                await _save_partial(db, board_id, envelope.raw, tokens)
+            raise
+        except Exception as exc:
+            failure = _call_failed(exc, request_id, board_id, user_id)
+            interrupted = True
+
+        if failure is None:
+            _call_succeeded()
+        log.info("Chat tokens used: %d (board=%s, attachments=%d, streamed)", tokens, board_id, attachments)
+
+        if interrupted:
+            await _save_partial(db, board_id, envelope.raw, tokens)
+            if failure is not None:
+                yield "error", {"error": failure.error.model_dump()}
+            return
+
+        display_text, msg_id, actions = await _persist_reply(db, board_id, envelope.raw, tokens, finish_reason)
+        await db.commit()
+        yield "done", {"response": display_text, "token_count": tokens, "message_id": msg_id, "actions": actions}
+    finally:
+        with anyio.CancelScope(shield=True):
+            await db.close()
+
+
+async def _save_partial(db: AsyncSession, board_id: str, text: str, tokens: int) -> None:
+    if not text.strip():
+        return
+    await _persist_reply(db, board_id, text.rstrip() + "\n\n*Response interrupted.*", tokens)
+    await db.commit()
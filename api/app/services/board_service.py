@@ -1,15 +1,26 @@
 """
-Board service — CRUD, collaborator management, optimistic-lock state merging, audit trail.
-Every mutating operation writes to audit_logs.
+Board service — CRUD, duplication/templates, collaborator management, optimistic-lock
+state merging, audit trail. Every mutating operation writes to audit_logs.
 """
+import base64
+import json
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
 from typing import Optional
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select, or_, and_, func, insert, literal, text, column, bindparam, Uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from fastapi import HTTPException
 
-from app.models import Board, BoardCollaborator, User, AuditLog
-from app.schemas import BoardCreate, BoardPatch, CollaboratorOut
+from app.models import (
+    Board, BoardCollaborator, User, AuditLog, Element, Connector, Capability, Insight, ChangeEvent,
+)
+from app.schemas import BoardCopy, BoardCounts, BoardCreate, BoardPatch, BoardSummary, CollaboratorOut
+
+TEMPLATES_DIR = Path(__file__).resolve().parents[3] / "frontend" / "templates"
+_TEMPLATE_NAME = re.compile(r"[a-z0-9][a-z0-9-]*")
 
 
 # ── Access control ────────────────────────────────────────────────────────────
@@ -47,21 +58,108 @@ async def assert_board_access(
 
 # ── CRUD ──────────────────────────────────────────────────────────────────────
 
-async def list_boards(db: AsyncSession, user_id: str) -> list[Board]:
+async def list_boards(
+    db: AsyncSession,
+    user_id: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_counts: bool = False,
+) -> tuple[list, Optional[str]]:
+    """
+    Boards visible to the user, most recently updated first.
+
+    Keyset-paginated on (updated_at, id): the opaque cursor carries both values of the
+    last board of the previous page, so editing, archiving or deleting that board does
+    not shift or end the listing. With
+    include_counts, per-board aggregates come from correlated subqueries in that one
+    SELECT and are returned as BoardSummary objects. Returns (boards, next_cursor).
+    """
     collab_ids = (
         select(BoardCollaborator.board_id)
         .where(BoardCollaborator.user_id == user_id)
         .scalar_subquery()
     )
-    result = await db.execute(
+    q = (
         select(Board)
         .where(
             Board.is_archived.is_(False),
             or_(Board.owner_id == user_id, Board.id.in_(collab_ids)),
         )
-        .order_by(Board.updated_at.desc())
     )
-    return list(result.scalars().all())
+    q = keyset_page(db, q, Board.updated_at, Board.id, cursor, descending=True)
+    if limit:
+        q = q.limit(limit + 1)  # one extra row tells us whether another page exists
+    if include_counts:
+        q = q.add_columns(*_board_count_columns())
+
+    rows = (await db.execute(q)).all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_keyset(rows[-1][0].updated_at, rows[-1][0].id)
+
+    if not include_counts:
+        return [r[0] for r in rows], next_cursor
+    return [
+        BoardSummary.model_validate(board).model_copy(update={"counts": BoardCounts(
+            elements=elements,
+            connectors=connectors,
+            open_insights=open_insights,
+            last_activity_at=max(filter(None, (board.updated_at, last_event))),
+        )})
+        for board, elements, connectors, open_insights, last_event in rows
+    ], next_cursor
+
+
+def _board_count_columns() -> list:
+    def scalar(stmt, label):
+        return stmt.correlate(Board).scalar_subquery().label(label)
+
+    return [
+        scalar(select(func.count(Element.id)).where(
+            Element.board_id == Board.id, Element.branch_id.is_(None)), "element_count"),
+        scalar(select(func.count(Connector.id)).where(
+            Connector.board_id == Board.id, Connector.branch_id.is_(None)), "connector_count"),
+        scalar(select(func.count(Insight.id)).where(
+            Insight.board_id == Board.id, Insight.is_dismissed.is_(False)), "open_insight_count"),
+        scalar(select(func.max(ChangeEvent.created_at)).where(
+            ChangeEvent.board_id == Board.id), "last_event_at"),
+    ]
+
+
+def keyset_page(db: AsyncSession, q, ts_col, id_col, cursor: Optional[str], descending: bool = False):
+    """
+    Order q by (ts_col, id_col) and, given a cursor from encode_keyset, keep only the
+    rows after it. Shared by board, element and connector listings.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite stores timestamps as text, with or without a fraction depending on
+        # whether CURRENT_TIMESTAMP or a bound datetime wrote them; compare normalised.
+        ts_col = func.datetime(ts_col)
+    if cursor:
+        after_ts, after_id = _decode_keyset(cursor)
+        if db.get_bind().dialect.name == "sqlite":
+            after_ts = after_ts.strftime("%Y-%m-%d %H:%M:%S")
+        if descending:
+            q = q.where(or_(ts_col < after_ts, and_(ts_col == after_ts, id_col < after_id)))
+        else:
+            q = q.where(or_(ts_col > after_ts, and_(ts_col == after_ts, id_col > after_id)))
+    if descending:
+        return q.order_by(ts_col.desc(), id_col.desc())
+    return q.order_by(ts_col, id_col)
+
+
+def encode_keyset(ts: datetime, row_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+
+def _decode_keyset(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.split("|")
+        return datetime.fromisoformat(ts), str(uuid.UUID(row_id))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Invalid cursor")
 
 
 async def create_board(db: AsyncSession, user_id: str, data: BoardCreate) -> Board:
@@ -115,6 +213,218 @@ async def archive_board(db: AsyncSession, board_id: str, user_id: str) -> None:
     _audit(db, board_id, user_id, "board.archive", "board", board_id)
 
 
+# ── Duplication & templates ───────────────────────────────────────────────────
+#
+# Both paths build the whole board inside the caller's transaction with a fixed number
+# of statements: rows are copied with INSERT … SELECT joined against an old→new id map,
+# so the cost does not grow in round-trips with the size of the board.
+
+async def duplicate_board(
+    db: AsyncSession, board_id: str, user_id: str, data: BoardCopy,
+) -> Board:
+    """Copy a board's state, main-branch elements, connectors and capabilities."""
+    src = await assert_board_access(db, board_id, user_id)
+    board = Board(
+        owner_id=user_id,
+        title=data.title or f"{src.title} (copy)",
+        domain=data.domain or src.domain,
+        phase=src.phase,
+        state=dict(src.state or {}),
+    )
+    db.add(board)
+    await db.flush()
+
+    # Swimlane/step ids are soft refs scoped to the board's state, so they are kept as-is;
+    # only table primary keys (and FKs pointing at them) are remapped.
+    element_ids = (await db.execute(
+        select(Element.id).where(Element.board_id == board_id, Element.branch_id.is_(None))
+    )).scalars().all()
+    element_map = _id_map_cte(db, "element_map", element_ids)
+    if element_map is not None:
+        await db.execute(insert(Element).from_select(
+            ["id", "board_id", "swimlane_id", "step_id", "type", "name", "notes", "owner",
+             "status", "meta", "created_at", "created_by_user_id", "created_by_actor",
+             "updated_by_user_id", "updated_by_actor"],
+            select(
+                element_map.c.new_id, literal(board.id, Uuid(as_uuid=False)),
+                Element.swimlane_id, Element.step_id, Element.type, Element.name,
+                Element.notes, Element.owner, Element.status, Element.meta,
+                Element.created_at,  # keeps the source's (created_at, id) list order
+                literal(user_id, Uuid(as_uuid=False)), literal("user"),
+                literal(user_id, Uuid(as_uuid=False)), literal("user"),
+            ).join(element_map, element_map.c.old_id == Element.id),
+            include_defaults=False,
+        ))
+
+    # Step-to-step connectors are copied even when the board has no elements.
+    connector_ids = (await db.execute(
+        select(Connector.id).where(Connector.board_id == board_id, Connector.branch_id.is_(None))
+    )).scalars().all()
+    connector_map = _id_map_cte(db, "connector_map", connector_ids)
+    if connector_map is not None:
+        conn_select = (
+            select(connector_map.c.new_id, literal(board.id, Uuid(as_uuid=False)))
+            .join_from(Connector, connector_map, connector_map.c.old_id == Connector.id)
+        )
+        if element_map is not None:
+            src_map = element_map.alias("src_map")
+            tgt_map = element_map.alias("tgt_map")
+            src_id, tgt_id = src_map.c.new_id, tgt_map.c.new_id
+            conn_select = (
+                conn_select
+                .outerjoin(src_map, src_map.c.old_id == Connector.source_element_id)
+                .outerjoin(tgt_map, tgt_map.c.old_id == Connector.target_element_id)
+            )
+        else:
+            src_id = tgt_id = literal(None, Uuid(as_uuid=False))
+        conn_select = conn_select.add_columns(
+            Connector.source_step_id, src_id, Connector.target_step_id, tgt_id,
+            Connector.tier, Connector.connector_type, Connector.label, Connector.notes,
+            Connector.waypoints, Connector.created_at,
+            literal(user_id, Uuid(as_uuid=False)), literal("user"),
+        ).where(
+            # Edges touching a branch-only element have no counterpart in the copy.
+            or_(Connector.source_element_id.is_(None), src_id.is_not(None)),
+            or_(Connector.target_element_id.is_(None), tgt_id.is_not(None)),
+        )
+        await db.execute(insert(Connector).from_select(
+            ["id", "board_id", "source_step_id", "source_element_id", "target_step_id",
+             "target_element_id", "tier", "connector_type", "label", "notes", "waypoints",
+             "created_at", "created_by_user_id", "created_by_actor"],
+            conn_select,
+            include_defaults=False,
+        ))
+
+    cap_ids = (await db.execute(
+        select(Capability.id).where(Capability.board_id == board_id)
+    )).scalars().all()
+    cap_map = _id_map_cte(db, "capability_map", cap_ids)
+    if cap_map is not None:
+        cap_select = select(
+            cap_map.c.new_id, literal(board.id, Uuid(as_uuid=False)),
+            Capability.cap_id, Capability.name, Capability.type, Capability.risk_level,
+            Capability.frontstage, Capability.xai_strategy, Capability.autonomy,
+            Capability.input_spec, Capability.output_spec, Capability.owner,
+            Capability.status, Capability.notes, Capability.meta,
+            element_map.c.new_id if element_map is not None else literal(None, Uuid(as_uuid=False)),
+        ).join(cap_map, cap_map.c.old_id == Capability.id)
+        if element_map is not None:
+            cap_select = cap_select.outerjoin(element_map, element_map.c.old_id == Capability.element_id)
+        await db.execute(insert(Capability).from_select(
+            ["id", "board_id", "cap_id", "name", "type", "risk_level", "frontstage",
+             "xai_strategy", "autonomy", "input_spec", "output_spec", "owner", "status",
+             "notes", "meta", "element_id"],
+            cap_select,
+            include_defaults=False,
+        ))
+        # meta.element_id mirrors the FK for API consumers; repoint it in one executemany.
+        linked = (await db.execute(
+            select(Capability.id, Capability.element_id, Capability.meta).where(
+                Capability.board_id == board.id, Capability.element_id.is_not(None),
+            )
+        )).all()
+        if linked:
+            await db.execute(
+                Capability.__table__.update()
+                .where(Capability.id == bindparam("cap_pk"))
+                .values(meta=bindparam("new_meta")),
+                [{"cap_pk": r.id, "new_meta": {**(r.meta or {}), "element_id": str(r.element_id)}}
+                 for r in linked],
+            )
+
+    _audit(db, board.id, user_id, "board.duplicate", "board", board.id,
+           diff={"source_board_id": board_id})
+    return board
+
+
+async def create_board_from_template(
+    db: AsyncSession, user_id: str, name: str, data: BoardCopy,
+) -> Board:
+    """Instantiate frontend/templates/{name}.json as a new board in one transaction."""
+    path = TEMPLATES_DIR / f"{name}.json"
+    if not (_TEMPLATE_NAME.fullmatch(name) and path.is_file()):
+        raise HTTPException(404, "Template not found")
+    tpl = json.loads(path.read_text(encoding="utf-8"))
+
+    # Template ids are placeholders ("sl-ai-1"); every one gets a fresh UUID.
+    ids: dict[str, str] = {}
+    def remap(placeholder: Optional[str]) -> Optional[str]:
+        if not placeholder:
+            return None
+        return ids.setdefault(placeholder, str(uuid.uuid4()))
+
+    swimlanes = [{**sl, "id": remap(sl["id"])} for sl in tpl.get("swimlanes", [])]
+    steps     = [{**st, "id": remap(st["id"])} for st in tpl.get("steps", [])]
+    board = Board(
+        owner_id=user_id,
+        title=data.title or tpl.get("title_default") or "Untitled Blueprint",
+        domain=data.domain or tpl.get("domain_default"),
+        state={"steps": steps, "swimlanes": swimlanes, "cards": {}, "capabilities": []},
+    )
+    db.add(board)
+    await db.flush()
+
+    elements = [
+        Element(
+            id=remap(el.get("id")) or str(uuid.uuid4()),
+            board_id=board.id,
+            swimlane_id=ids.get(el.get("swimlane_id")),
+            step_id=ids.get(el.get("step_id")),
+            type=el["type"],
+            name=el["name"],
+            notes=el.get("notes"),
+            owner=el.get("owner"),
+            status=el.get("status") or "draft",
+            meta=el.get("meta") or {},
+            created_by_user_id=user_id,
+            created_by_actor="user",
+            updated_by_user_id=user_id,
+            updated_by_actor="user",
+        )
+        for el in tpl.get("elements", [])
+    ]
+    if elements:
+        db.add_all(elements)
+        await db.flush()  # one batched INSERT … RETURNING for all rows
+        from app.services.element_service import _capability_row
+        caps = [_capability_row(board.id, el) for el in elements if el.type == "ai_capability"]
+        if caps:
+            await db.execute(insert(Capability).values(caps))
+
+    _audit(db, board.id, user_id, "board.create", "board", board.id, diff={"template": name})
+    return board
+
+
+def _id_map_cte(db: AsyncSession, name: str, old_ids: list[str]):
+    """
+    old_id → new_id mapping as a CTE (None when empty), bound as one or two array/JSON
+    parameters rather than two per row, so large boards stay under the driver's bind
+    parameter limit (32767 on asyncpg).
+    """
+    if not old_ids:
+        return None
+    old = [str(i) for i in old_ids]
+    new = [str(uuid.uuid4()) for _ in old]
+    cols = (column("old_id", Uuid(as_uuid=False)), column("new_id", Uuid(as_uuid=False)))
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import ARRAY
+        rows = text(
+            f"SELECT t.old_id, t.new_id FROM unnest(:{name}_old, :{name}_new) AS t(old_id, new_id)"
+        ).bindparams(
+            bindparam(f"{name}_old", old, type_=ARRAY(Uuid(as_uuid=False))),
+            bindparam(f"{name}_new", new, type_=ARRAY(Uuid(as_uuid=False))),
+        )
+    else:
+        # Without a native uuid type, Uuid columns store 32-character hex strings.
+        pairs = [(uuid.UUID(o).hex, uuid.UUID(n).hex) for o, n in zip(old, new)]
+        rows = text(
+            f"SELECT json_extract(value, '$[0]') AS old_id, json_extract(value, '$[1]') AS new_id "
+            f"FROM json_each(:{name}_pairs)"
+        ).bindparams(bindparam(f"{name}_pairs", json.dumps(pairs)))
+    values = rows.columns(*cols).subquery(f"{name}_values")
+    return select(values.c.old_id, values.c.new_id).cte(name)
+
+
 # ── Collaborators ─────────────────────────────────────────────────────────────
 
 async def list_collaborators(
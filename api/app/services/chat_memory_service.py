@@ -0,0 +1,184 @@
+"""
+Chat memory service — the agent's memory of a board conversation, kept server-side.
+
+Every turn sends the model a rolling summary of the board's older messages followed by
+the not-yet-summarised messages verbatim, read from chat_messages (clients no longer
+upload the transcript). Once RECENT_MESSAGES + FOLD_BATCH messages are unsummarised,
+the turn schedules a fold of the oldest of them into the summary stored in
+chat_summaries (one extra model call every FOLD_BATCH turns). The fold runs after the
+response is sent, in a session of its own, so it never delays the reply; until it
+lands, load_memory caps the verbatim window, so the prompt stays bounded however long
+the conversation runs.
+
+Messages are ordered by (created_at, id); ChatSummary.message_count is how many of the
+oldest ones the summary covers. Folding is incremental — only the newly aged-out
+messages and the previous summary are sent to the model — and uses NIM first with
+Gemini as fallback, like insight generation.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import ChatMessage, ChatSummary
+from app.services.nim_client import nim_complete
+
+log = logging.getLogger(__name__)
+
+RECENT_MESSAGES    = 20     # always sent verbatim
+FOLD_BATCH         = 10     # fold once this many more have aged out of the recent window
+SUMMARY_MAX_CHARS  = 6000
+_MESSAGE_MAX_CHARS = 2000   # per message, when feeding the summariser
+
+_SYSTEM = (
+    "You maintain the running memory of a conversation between users and an AI assistant "
+    "about one service-blueprint board. Merge the new messages into the existing summary. "
+    "Keep decisions, requests still open, board changes proposed or applied (with element, "
+    "step and swimlane names), and user preferences; drop pleasantries and repetition. "
+    "Write plain prose or short bullets, at most 300 words, and nothing else."
+)
+
+
+async def load_memory(db: AsyncSession, board_id: str) -> tuple[str, list[dict], int]:
+    """
+    (summary, recent messages oldest first as {"role","content","attachments"},
+    unsummarised count).
+    The summary is "" until the conversation first outgrows the recent window.
+    """
+    row = await db.get(ChatSummary, board_id)
+    folded = row.message_count if row else 0
+    total = (await db.execute(
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.board_id == board_id)
+    )).scalar_one()
+    if folded > total:
+        # History was cleared (or pruned) under a summary, e.g. while a fold ran: the
+        # summary describes messages that are gone, so it is ignored until refolded.
+        row, folded = None, 0
+    pending = total - folded
+
+    rows = (await db.execute(
+        select(ChatMessage.role, ChatMessage.content, ChatMessage.attachments)
+        .where(ChatMessage.board_id == board_id)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        # A lagging fold never grows the prompt past the window plus one batch.
+        .limit(min(pending, RECENT_MESSAGES + FOLD_BATCH))
+    )).all()
+    recent = [
+        {"role": r.role, "content": _display(r.role, r.content), "attachments": r.attachments or []}
+        for r in reversed(rows)
+    ]
+    return (row.summary if row else ""), recent, pending
+
+
+def fold_due(pending: int) -> bool:
+    """Whether `pending` unsummarised messages warrant a fold."""
+    return pending >= RECENT_MESSAGES + FOLD_BATCH
+
+
+async def fold_in_background(board_id: str) -> bool:
+    """
+    Background-task entry point: fold older messages through a session of its own (the
+    request's session is closed by the time it runs). Concurrent folds of the same
+    messages are settled by the compare-and-set in fold_older_messages.
+    """
+    from app.database import AsyncSessionLocal
+    try:
+        async with AsyncSessionLocal() as db:
+            return await fold_older_messages(db, board_id)
+    except Exception as exc:
+        log.warning("chat summary fold failed for board %s: %s", board_id, exc)
+        return False
+
+
+async def fold_older_messages(db: AsyncSession, board_id: str) -> bool:
+    """
+    Fold every message older than the recent window into the board's summary.
+    Returns False when there was nothing to fold, the model call failed, or another
+    worker folded the same messages first.
+    """
+    row = await db.get(ChatSummary, board_id)
+    folded = row.message_count if row else 0
+    total = (await db.execute(
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.board_id == board_id)
+    )).scalar_one()
+    if row is not None and folded > total:
+        # Summary of messages that no longer exist: start over from the first message.
+        row.summary, row.message_count = "", 0
+        await db.flush()
+        folded = 0
+    count = total - folded - RECENT_MESSAGES
+    if count < FOLD_BATCH:
+        return False
+
+    older = (await db.execute(
+        select(ChatMessage.role, ChatMessage.content)
+        .where(ChatMessage.board_id == board_id)
+        .order_by(ChatMessage.created_at, ChatMessage.id)
+        .offset(folded)
+        .limit(count)
+    )).all()
+    previous = row.summary if row else ""
+    summary = await _summarise(previous, [(r.role, _display(r.role, r.content)) for r in older])
+    if not summary:
+        return False
+    summary = summary[:SUMMARY_MAX_CHARS]
+
+    if row is None:
+        db.add(ChatSummary(board_id=board_id, summary=summary, message_count=count))
+        try:
+            await db.commit()
+        except IntegrityError:   # another worker created it first
+            await db.rollback()
+            return False
+        return True
+
+    # Compare-and-set on message_count: a concurrent fold of the same messages wins once.
+    res = await db.execute(
+        update(ChatSummary)
+        .where(ChatSummary.board_id == board_id, ChatSummary.message_count == folded)
+        .values(summary=summary, message_count=folded + count)
+    )
+    await db.commit()
+    return res.rowcount == 1
+
+
+async def _summarise(previous: str, messages: list[tuple[str, str]]) -> Optional[str]:
+    transcript = "\n\n".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {text[:_MESSAGE_MAX_CHARS]}"
+        for role, text in messages
+    )
+    user = (
+        f"Existing summary:\n{previous or '(none yet)'}\n\n"
+        f"New messages, oldest first:\n{transcript}\n\n"
+        "Return the updated summary."
+    )
+    raw = await nim_complete(system=_SYSTEM, user=user, max_tokens=1024)
+    if raw is None:
+        from app.services.agent_service import _get_client, types
+        if types is None:
+            return None
+        try:
+            response = await _get_client().aio.models.generate_content(
+                model=get_settings().gemini_model,
+                contents=[types.Content(role="user", parts=[types.Part(text=user)])],
+                config=types.GenerateContentConfig(system_instruction=_SYSTEM, max_output_tokens=1024),
+            )
+        except Exception as exc:
+            log.info("chat summary model call failed: %s", exc)
+            return None
+        raw = response.text
+    return (raw or "").strip() or None
+
+
+def _display(role: str, content: str) -> str:
+    """Assistant turns are stored as the raw reply envelope; keep only its message text."""
+    if role == "user":
+        return content
+    from app.services.agent_service import _parse_agent_response
+    text, _ = _parse_agent_response(content)
+    return text
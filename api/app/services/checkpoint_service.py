@@ -0,0 +1,224 @@
+"""
+Checkpoint service — board time travel.
+
+The board as of any instant is rebuilt from the nearest checkpoint at or before that
+instant plus the change events after it; only the last event per entity in that window
+matters, so the work is bounded by the entities touched since the checkpoint, not by
+the length of history. Without a checkpoint the live board is walked backwards instead
+(the first event per entity after the instant supplies its before_snapshot).
+
+Board state (swimlanes/steps) comes from the before/after diffs that patch_board writes
+to audit_logs as "board.update".
+
+Reads never write: checkpoints are created by the compaction job (once a board has
+recorded more than history_checkpoint_interval change events since its latest one),
+when history is compacted, and when a branch is created or merged.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.models import AuditLog, Board, BoardCheckpoint, ChangeEvent, Commit, Connector, Element
+from app.services.history_service import _connector_snapshot, _element_snapshot, hydrate_snapshots
+
+log = logging.getLogger(__name__)
+
+_TRACKED = ("element", "connector")
+
+
+async def board_at(
+    db: AsyncSession,
+    board: Board,
+    ts: Optional[datetime] = None,
+    commit_id: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Reconstruct state, main-branch elements and connectors as of `ts` or as of the end
+    of `commit_id`. Read-only.
+    """
+    board_id = str(board.id)
+    if commit_id:
+        commit = (await db.execute(
+            select(Commit).where(Commit.id == commit_id, Commit.board_id == board_id)
+        )).scalar_one_or_none()
+        if not commit:
+            raise HTTPException(404, "Commit not found")
+        ts = commit.created_at
+    if ts is None:
+        raise HTTPException(422, "Pass either commit or ts")
+
+    checkpoint = (await db.execute(
+        select(BoardCheckpoint)
+        .where(BoardCheckpoint.board_id == board_id, BoardCheckpoint.as_of <= ts)
+        .order_by(BoardCheckpoint.as_of.desc())
+        .limit(1)
+    )).scalar_one_or_none()
+
+    if checkpoint:
+        # Forward: checkpoint + the last event per entity in (checkpoint, ts].
+        state = dict(checkpoint.state or {})
+        entities = {
+            "element":   {e["id"]: e for e in checkpoint.elements or []},
+            "connector": {c["id"]: c for c in checkpoint.connectors or []},
+        }
+        events = await _edge_events(db, board_id, after=checkpoint.as_of, upto=ts, last=True)
+        changes = [(ev, ev.after_snapshot) for ev in events]
+        state_log = await _edge_state_change(db, board_id, after=checkpoint.as_of, upto=ts, last=True)
+        if state_log is not None:
+            state = (state_log.diff or {}).get("after", state)
+    else:
+        # Backward: live board, undoing the first event per entity after ts.
+        state, elements, connectors = await _live_board(db, board)
+        entities = {"element": elements, "connector": connectors}
+        events = await _edge_events(db, board_id, after=ts, upto=None, last=False)
+        changes = [(ev, ev.before_snapshot) for ev in events]
+        state_log = await _edge_state_change(db, board_id, after=ts, upto=None, last=False)
+        if state_log is not None:
+            state = (state_log.diff or {}).get("before", state)
+
+    for ev, snap in changes:
+        bucket = entities[ev.entity_type]
+        if snap is None or snap.get("branch_id"):
+            bucket.pop(ev.entity_id, None)
+        else:
+            bucket[ev.entity_id] = snap
+
+    return {
+        "board_id":        board_id,
+        "as_of":           ts,
+        "commit_id":       commit_id,
+        "checkpoint_id":   str(checkpoint.id) if checkpoint else None,
+        "replayed_events": len(changes),
+        "state":           state,
+        "elements":        _ordered(entities["element"]),
+        "connectors":      _ordered(entities["connector"]),
+    }
+
+
+async def create_checkpoint(
+    db: AsyncSession, board: Board, as_of: Optional[datetime] = None,
+) -> BoardCheckpoint:
+    """
+    Checkpoint the live board as of now, or the board reconstructed as of `as_of`
+    (the compaction cutoff). Does not commit.
+    """
+    board_id = str(board.id)
+    if as_of is None:
+        state, elements, connectors = await _live_board(db, board)
+        cp = BoardCheckpoint(
+            board_id=board_id,
+            as_of=(await db.execute(select(func.now()))).scalar_one(),
+            state=state,
+            elements=_ordered(elements),
+            connectors=_ordered(connectors),
+        )
+    else:
+        at = await board_at(db, board, ts=as_of)
+        cp = BoardCheckpoint(
+            board_id=board_id, as_of=as_of, state=at["state"],
+            elements=at["elements"], connectors=at["connectors"],
+        )
+    db.add(cp)
+    await db.flush()
+    return cp
+
+
+async def checkpoint_if_due(db: AsyncSession, board: Board) -> Optional[BoardCheckpoint]:
+    """
+    Checkpoint the live board when more than history_checkpoint_interval change events
+    were recorded since its latest checkpoint (used by the compaction job). Does not commit.
+    """
+    board_id = str(board.id)
+    latest = (await db.execute(
+        select(func.max(BoardCheckpoint.as_of)).where(BoardCheckpoint.board_id == board_id)
+    )).scalar_one()
+    q = select(func.count()).select_from(ChangeEvent).where(ChangeEvent.board_id == board_id)
+    if latest is not None:
+        q = q.where(ChangeEvent.created_at > latest)
+    if (await db.execute(q)).scalar_one() <= get_settings().history_checkpoint_interval:
+        return None
+    return await create_checkpoint(db, board)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+async def _edge_events(
+    db: AsyncSession,
+    board_id: str,
+    after: Optional[datetime],
+    upto: Optional[datetime],
+    last: bool,
+    commit_id: Optional[str] = None,
+) -> list[ChangeEvent]:
+    """Last (or first) element/connector event per entity in (after, upto], hydrated."""
+    window = [
+        ChangeEvent.board_id == board_id,
+        ChangeEvent.entity_type.in_(_TRACKED),
+    ]
+    if commit_id is not None:
+        window.append(ChangeEvent.commit_id == commit_id)
+    if after is not None:
+        window.append(ChangeEvent.created_at > after)
+    if upto is not None:
+        window.append(ChangeEvent.created_at <= upto)
+    order = (
+        (ChangeEvent.created_at.desc(), ChangeEvent.entity_version.desc()) if last
+        else (ChangeEvent.created_at.asc(), ChangeEvent.entity_version.asc())
+    )
+    ranked = (
+        select(
+            ChangeEvent.id,
+            func.row_number().over(
+                partition_by=(ChangeEvent.entity_type, ChangeEvent.entity_id),
+                order_by=order,
+            ).label("rn"),
+        )
+        .where(*window)
+        .subquery()
+    )
+    events = (await db.execute(
+        select(ChangeEvent).join(ranked, ranked.c.id == ChangeEvent.id).where(ranked.c.rn == 1)
+    )).scalars().all()
+    await hydrate_snapshots(db, events)
+    return events
+
+
+async def _edge_state_change(
+    db: AsyncSession,
+    board_id: str,
+    after: datetime,
+    upto: Optional[datetime],
+    last: bool,
+) -> Optional[AuditLog]:
+    q = select(AuditLog).where(
+        AuditLog.board_id == board_id,
+        AuditLog.action == "board.update",
+        AuditLog.created_at > after,
+    )
+    if upto is not None:
+        q = q.where(AuditLog.created_at <= upto)
+    q = q.order_by(AuditLog.created_at.desc() if last else AuditLog.created_at.asc()).limit(1)
+    return (await db.execute(q)).scalar_one_or_none()
+
+
+async def _live_board(db: AsyncSession, board: Board) -> tuple[dict, dict, dict]:
+    """(state, {element_id: snapshot}, {connector_id: snapshot}) for the live main branch."""
+    elements = (await db.execute(
+        select(Element).where(Element.board_id == board.id, Element.branch_id.is_(None))
+    )).scalars().all()
+    connectors = (await db.execute(
+        select(Connector).where(Connector.board_id == board.id, Connector.branch_id.is_(None))
+    )).scalars().all()
+    return (
+        dict(board.state or {}),
+        {str(e.id): _element_snapshot(e) for e in elements},
+        {str(c.id): _connector_snapshot(c) for c in connectors},
+    )
+
+
+def _ordered(snaps: dict[str, dict]) -> list[dict]:
+    return sorted(snaps.values(), key=lambda s: (str(s.get("created_at") or ""), str(s.get("id"))))
@@ -0,0 +1,258 @@
+"""
+Compaction service — history retention for change_events, commits and audit_logs.
+
+For history older than `history_retention_days`:
+  - per entity, only keyframes and the newest event survive; that newest event is
+    rewritten as a full keyframe so the delta chains of younger events still decode;
+  - the surviving events' per-edit commits are squashed into one commit per hour/day
+    (`history_compaction_granularity`), and commits left without events are dropped.
+Audit logs are only pruned when `audit_log_retention_days` is set (> 0); time travel
+reads board state from board.update audit entries, so pruning them limits how far back
+/at can reconstruct swimlanes and steps.
+
+Each run also checkpoints boards that recorded more than `history_checkpoint_interval`
+change events since their latest checkpoint (time-travel reads never write one).
+
+Serverless deployments (Vercel) have no long-lived process, so schedule the CLI:
+
+    cd api && DATABASE_URL=... python -m app.services.compaction_service [--board ID]
+
+from cron or a scheduled CI job (see README, "History compaction"). Long-running
+deployments can instead set `history_compaction_interval_hours` to start the lifespan
+task in main.py.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, func, and_, or_, update, delete as sql_delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import AuditLog, Board, BoardCheckpoint, ChangeEvent, Commit
+from app.services.checkpoint_service import checkpoint_if_due, create_checkpoint
+from app.services.history_service import hydrate_snapshots
+
+log = logging.getLogger(__name__)
+
+_BUCKET_FORMAT = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d"}
+
+
+async def compact_board(
+    db: AsyncSession,
+    board_id: str,
+    cutoff: datetime,
+    granularity: str = "day",
+) -> dict[str, int]:
+    """Compact one board's history older than cutoff. Does not commit."""
+    if granularity not in _BUCKET_FORMAT:
+        raise ValueError("granularity must be 'hour' or 'day'")
+    stats = {"events_deleted": 0, "events_rekeyed": 0, "commits_squashed": 0, "commits_deleted": 0}
+
+    old = and_(ChangeEvent.board_id == board_id, ChangeEvent.created_at < cutoff)
+    ranked = (
+        select(
+            ChangeEvent.id,
+            ChangeEvent.is_keyframe,
+            func.row_number().over(
+                partition_by=(ChangeEvent.entity_type, ChangeEvent.entity_id),
+                order_by=(ChangeEvent.entity_version.desc(), ChangeEvent.created_at.desc()),
+            ).label("rn"),
+        )
+        .where(old)
+        .subquery()
+    )
+
+    # 1. Newest old event per entity becomes a keyframe (full snapshots).
+    newest = (await db.execute(
+        select(ChangeEvent)
+        .join(ranked, ranked.c.id == ChangeEvent.id)
+        .where(ranked.c.rn == 1, ranked.c.is_keyframe.is_(False))
+    )).scalars().all()
+    if newest:
+        await hydrate_snapshots(db, newest)
+        await db.execute(update(ChangeEvent), [
+            {"id": ev.id, "before_snapshot": ev.before_snapshot,
+             "after_snapshot": ev.after_snapshot, "is_keyframe": True}
+            for ev in newest
+        ])
+        for ev in newest:
+            db.expire(ev)
+        stats["events_rekeyed"] = len(newest)
+
+    # 2. Drop the older intermediate (delta) events.
+    doomed = select(ranked.c.id).where(ranked.c.rn > 1, ranked.c.is_keyframe.is_(False))
+    result = await db.execute(
+        sql_delete(ChangeEvent).where(ChangeEvent.id.in_(doomed)).execution_options(synchronize_session=False)
+    )
+    stats["events_deleted"] = result.rowcount or 0
+
+    # 3. Squash old commits into one per bucket; drop those left empty.
+    rows = (await db.execute(
+        select(Commit, func.count(ChangeEvent.id))
+        .outerjoin(ChangeEvent, ChangeEvent.commit_id == Commit.id)
+        .where(Commit.board_id == board_id, Commit.created_at < cutoff)
+        .group_by(Commit.id)
+        .order_by(Commit.created_at)
+    )).all()
+    empty = [c.id for c, n in rows if n == 0]
+    buckets: dict[str, list[Commit]] = {}
+    for commit, n in rows:
+        if n:
+            buckets.setdefault(commit.created_at.strftime(_BUCKET_FORMAT[granularity]), []).append(commit)
+
+    for label, commits in buckets.items():
+        if len(commits) < 2:
+            continue
+        authors = {c.author_user_id for c in commits}
+        squashed = Commit(
+            board_id=board_id,
+            author_user_id=authors.pop() if len(authors) == 1 else None,
+            actor_type="system",
+            message=f"Compacted {len(commits)} commits ({label})",
+            created_at=commits[0].created_at,
+        )
+        db.add(squashed)
+        await db.flush()
+        ids = [c.id for c in commits]
+        await db.execute(
+            update(ChangeEvent).where(ChangeEvent.commit_id.in_(ids)).values(commit_id=squashed.id)
+        )
+        empty += ids
+        stats["commits_squashed"] += len(ids)
+
+    if empty:
+        await db.execute(
+            sql_delete(Commit).where(Commit.id.in_(empty)).execution_options(synchronize_session=False)
+        )
+        stats["commits_deleted"] = len(empty)
+
+    # Surviving old commits lost or gained events; recount them.
+    await db.execute(
+        update(Commit)
+        .where(Commit.board_id == board_id, Commit.created_at < cutoff)
+        .values(event_count=(
+            select(func.count(ChangeEvent.id))
+            .where(ChangeEvent.commit_id == Commit.id)
+            .scalar_subquery()
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    return stats
+
+
+async def run_compaction(
+    db: AsyncSession,
+    retention_days: Optional[int] = None,
+    granularity: Optional[str] = None,
+    audit_retention_days: Optional[int] = None,
+    board_id: Optional[str] = None,
+) -> dict[str, int]:
+    """Compact every board with history past the window (or just board_id); commits per board."""
+    settings = get_settings()
+    retention_days = settings.history_retention_days if retention_days is None else retention_days
+    granularity = granularity or settings.history_compaction_granularity
+    audit_retention_days = (
+        settings.audit_log_retention_days if audit_retention_days is None else audit_retention_days
+    )
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=retention_days)
+
+    if board_id:
+        board_ids = [board_id]
+    else:
+        latest = (
+            select(func.max(BoardCheckpoint.as_of))
+            .where(BoardCheckpoint.board_id == Board.id)
+            .scalar_subquery()
+        )
+        since_checkpoint = (
+            select(func.count(ChangeEvent.id))
+            .where(ChangeEvent.board_id == Board.id,
+                   or_(latest.is_(None), ChangeEvent.created_at > latest))
+            .scalar_subquery()
+        )
+        board_ids = (await db.execute(
+            select(Board.id).where(or_(
+                select(ChangeEvent.id)
+                .where(ChangeEvent.board_id == Board.id, ChangeEvent.created_at < cutoff)
+                .exists(),
+                since_checkpoint > settings.history_checkpoint_interval,
+            ))
+        )).scalars().all()
+
+    totals = {"boards": 0, "events_deleted": 0, "events_rekeyed": 0,
+              "commits_squashed": 0, "commits_deleted": 0, "audit_logs_deleted": 0,
+              "checkpoints": 0}
+    for bid in board_ids:
+        stats = await compact_board(db, str(bid), cutoff, granularity)
+        board = await db.get(Board, str(bid))
+        if board is not None:
+            if stats["events_deleted"]:
+                # Reads at or after the cutoff start from the board as of the cutoff instead
+                # of walking back through the (now sparser) compacted history.
+                await create_checkpoint(db, board, as_of=cutoff)
+                totals["checkpoints"] += 1
+            elif await checkpoint_if_due(db, board) is not None:
+                totals["checkpoints"] += 1
+        await db.commit()
+        totals["boards"] += 1
+        for k, v in stats.items():
+            totals[k] += v
+
+    if audit_retention_days > 0:
+        q = sql_delete(AuditLog).where(AuditLog.created_at < now - timedelta(days=audit_retention_days))
+        if board_id:
+            q = q.where(AuditLog.board_id == board_id)
+        result = await db.execute(q.execution_options(synchronize_session=False))
+        await db.commit()
+        totals["audit_logs_deleted"] = result.rowcount or 0
+
+    log.info("history compaction: %s", totals)
+    return totals
+
+
+async def compaction_loop(interval_hours: float) -> None:
+    """
+    Background task started from the app lifespan; runs until cancelled. Only for
+    long-running servers — on serverless, schedule main() instead.
+    """
+    from app.database import AsyncSessionLocal
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            async with AsyncSessionLocal() as session:
+                await run_compaction(session)
+        except Exception as exc:
+            log.warning("history compaction failed: %s", exc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact board history (change events, commits, audit logs).")
+    parser.add_argument("--retention-days", type=int, help="keep full history this many days (default: settings)")
+    parser.add_argument("--granularity", choices=sorted(_BUCKET_FORMAT), help="commit squash bucket (default: settings)")
+    parser.add_argument("--audit-retention-days", type=int, help="prune audit logs older than this; 0 keeps all")
+    parser.add_argument("--board", help="only compact this board id")
+    args = parser.parse_args()
+
+    async def _run() -> None:
+        from app.database import AsyncSessionLocal
+        if AsyncSessionLocal is None:
+            raise SystemExit("DATABASE_URL is not set")
+        async with AsyncSessionLocal() as session:
+            totals = await run_compaction(
+                session,
+                retention_days=args.retention_days,
+                granularity=args.granularity,
+                audit_retention_days=args.audit_retention_days,
+                board_id=args.board,
+            )
+        print(totals)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
-"""Connector service — PRD-18 (data model, validation, CRUD, cascades)."""
+"""
+Connector service — PRD-18 (data model, validation, CRUD, cascades).
+
+Connectors branch the same way elements do: a copy-on-write branch reads main's
+connectors until one is edited (overlay row, base_connector_id) or deleted (tombstone)
+on the branch, plus connectors created on it. Element endpoints are always stored as
+main (or branch-only) element ids; a branch listing rewrites them to the branch's
+overlay element ids in bulk (branch_endpoint_map), so nothing is copied when a branch
+is created.
+"""
 import logging
-from typing import Optional
-from sqlalchemy import select, delete as sql_delete
+from typing import Any, Optional
+from sqlalchemy import select, func, and_, or_, delete as sql_delete
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
-from app.models import Board, Connector, Element
-from app.schemas import ConnectorCreate, ConnectorUpdate
-from app.services.history_service import record_change_event
+from app.models import Board, Branch, Connector, Element
+from app.schemas import ConnectorBatchRequest, ConnectorCreate, ConnectorUpdate
+from app.services.history_service import create_commit, record_change_event, _connector_snapshot
+from app.services.element_service import _element_scope, _paginate, is_copy_on_write
 
 log = logging.getLogger(__name__)
 
@@ -27,15 +38,13 @@ def _derive_tier(
     return "mixed"
 
 
-async def _validate_endpoints(
-    db:       AsyncSession,
-    board:    Board,
+def _check_endpoint_shape(
     source_step_id:    Optional[str],
     source_element_id: Optional[str],
     target_step_id:    Optional[str],
     target_element_id: Optional[str],
 ) -> None:
-    """Raise HTTPException if any endpoint constraint is violated."""
+    """Raise HTTPException if the endpoint combination itself is invalid (no DB access)."""
     src_set = (source_step_id is not None, source_element_id is not None)
     tgt_set = (target_step_id is not None, target_element_id is not None)
 
@@ -50,42 +59,182 @@ async def _validate_endpoints(
     if source_element_id and source_element_id == target_element_id:
         raise HTTPException(400, "Source and target cannot be the same element")
 
-    # Validate step IDs exist in boards.state.steps
-    step_ids_to_check = {s for s in [source_step_id, target_step_id] if s}
-    if step_ids_to_check:
+
+async def _validate_endpoint_refs(
+    db:          AsyncSession,
+    board:       Board,
+    step_ids:    set[str],
+    element_ids: set[str],
+    branch_id:   Optional[str] = None,
+) -> dict[str, str]:
+    """
+    Check that every referenced step and element exists on this board — on branch_id's
+    view of it, if given — and return {element id given: element id to store}; a branch
+    overlay id maps to the main element it stands in for.
+    One pass over the step list and at most one SELECT per table, however many ids are given.
+    """
+    state = board.state or {}
+    overlay = False
+    if branch_id:
+        branch = (await db.execute(
+            select(Branch).where(Branch.id == branch_id, Branch.board_id == board.id)
+        )).scalar_one_or_none()
+        if not branch:
+            raise HTTPException(404, "Branch not found")
+        overlay = branch.copy_on_write
+        if branch.state_snapshot and branch.state_snapshot.get("steps") is not None:
+            state = branch.state_snapshot
+
+    if step_ids:
         board_step_ids = {
             str(s["id"])
-            for s in (board.state or {}).get("steps", [])
+            for s in state.get("steps", [])
             if "id" in s
         }
-        missing = step_ids_to_check - board_step_ids
+        missing = step_ids - board_step_ids
         if missing:
-            raise HTTPException(400, f"Step ID(s) not found on this board: {', '.join(missing)}")
+            raise HTTPException(400, f"Step ID(s) not found on this board: {', '.join(sorted(missing))}")
 
-    # Validate element IDs belong to this board
-    el_ids_to_check = [e for e in [source_element_id, target_element_id] if e]
-    for el_id in el_ids_to_check:
-        result = await db.execute(
-            select(Element).where(Element.id == el_id, Element.board_id == str(board.id))
+    if not element_ids:
+        return {}
+    result = await db.execute(
+        select(Element.id, Element.base_element_id).where(
+            _element_scope(str(board.id), branch_id, overlay=overlay),
+            Element.id.in_(element_ids),
         )
-        if not result.scalar_one_or_none():
-            raise HTTPException(400, f"Element {el_id} not found on this board")
+    )
+    refs = {str(eid): str(base or eid) for eid, base in result.all()}
+    missing = element_ids - refs.keys()
+    if missing:
+        if len(missing) == 1:
+            raise HTTPException(400, f"Element {next(iter(missing))} not found on this board")
+        raise HTTPException(400, f"Elements not found on this board: {', '.join(sorted(missing))}")
+    return refs
 
 
-async def list_connectors(
+async def _validate_endpoints(
     db:       AsyncSession,
-    board_id: str,
-    tier:     Optional[str] = None,
-    type_:    Optional[str] = None,
-) -> list[Connector]:
-    q = select(Connector).where(Connector.board_id == board_id)
+    board:    Board,
+    source_step_id:    Optional[str],
+    source_element_id: Optional[str],
+    target_step_id:    Optional[str],
+    target_element_id: Optional[str],
+    branch_id:         Optional[str] = None,
+) -> dict[str, str]:
+    """Raise HTTPException if any endpoint constraint is violated; returns the element id map."""
+    _check_endpoint_shape(source_step_id, source_element_id, target_step_id, target_element_id)
+    return await _validate_endpoint_refs(
+        db, board,
+        {s for s in [source_step_id, target_step_id] if s},
+        {e for e in [source_element_id, target_element_id] if e},
+        branch_id,
+    )
+
+
+def _connector_scope(board_id: str, branch_id: Optional[str] = None, overlay: bool = False):
+    """
+    WHERE clause for the connectors on main or on a branch. With overlay=True a branch
+    reads as main minus the connectors it shadows or whose element endpoint it deleted,
+    plus its own live rows (ix_connectors_branch_base answers the shadow lookup).
+    """
+    if not branch_id:
+        return and_(Connector.board_id == board_id, Connector.branch_id.is_(None))
+    if not overlay:
+        return and_(Connector.board_id == board_id, Connector.branch_id == branch_id)
+    shadow = aliased(Connector)
+    deleted_on_branch = select(Element.base_element_id).where(
+        Element.branch_id == branch_id,
+        Element.is_tombstone.is_(True),
+        Element.base_element_id.is_not(None),
+    )
+    return and_(
+        Connector.board_id == board_id,
+        or_(
+            and_(Connector.branch_id == branch_id, Connector.is_tombstone.is_(False)),
+            and_(
+                Connector.branch_id.is_(None),
+                ~select(shadow.id).where(
+                    shadow.branch_id == branch_id, shadow.base_connector_id == Connector.id,
+                ).exists(),
+            ),
+        ),
+        or_(Connector.source_element_id.is_(None), Connector.source_element_id.not_in(deleted_on_branch)),
+        or_(Connector.target_element_id.is_(None), Connector.target_element_id.not_in(deleted_on_branch)),
+    )
+
+
+async def branch_endpoint_map(db: AsyncSession, board_id: str, branch_id: str) -> dict[str, str]:
+    """{main element id: the branch's overlay row id}, in one SELECT."""
+    rows = await db.execute(
+        select(Element.base_element_id, Element.id).where(
+            Element.board_id == board_id,
+            Element.branch_id == branch_id,
+            Element.base_element_id.is_not(None),
+            Element.is_tombstone.is_(False),
+        )
+    )
+    return {str(base): str(eid) for base, eid in rows.all()}
+
+
+async def as_branch_view(
+    db:         AsyncSession,
+    board_id:   str,
+    branch_id:  Optional[str],
+    connectors: list[Connector],
+) -> list[Any]:
+    """
+    Connectors as a branch shows them: element endpoints rewritten to the overlay ids the
+    branch's element list returns. Without a branch the rows are returned unchanged.
+    """
+    if not branch_id:
+        return connectors
+    endpoint_map = await branch_endpoint_map(db, board_id, branch_id)
+    out = []
+    for c in connectors:
+        snap = _connector_snapshot(c)
+        for k in ("source_element_id", "target_element_id"):
+            snap[k] = endpoint_map.get(snap[k], snap[k])
+        out.append(snap)
+    return out
+
+
+async def list_connectors(
+    db:           AsyncSession,
+    board_id:     str,
+    branch_id:    Optional[str] = None,
+    tier:         Optional[str] = None,
+    type_:        Optional[str] = None,
+    swimlane_ids: Optional[list[str]] = None,
+    step_ids:     Optional[list[str]] = None,
+    limit:        Optional[int] = None,
+    cursor:       Optional[str] = None,
+) -> tuple[list[Connector], Optional[str]]:
+    """
+    Connectors on a branch (main by default), optionally limited to those with at least
+    one endpoint inside the viewport: an element in the requested lanes/step window, or
+    a step in the window (step endpoints ignore lanes). Returns (connectors, next_cursor).
+    """
+    overlay = branch_id is not None and await is_copy_on_write(db, board_id, branch_id)
+    q = select(Connector).where(_connector_scope(board_id, branch_id, overlay))
     if tier:
         q = q.where(Connector.tier == tier)
     if type_:
         q = q.where(Connector.connector_type == type_)
-    q = q.order_by(Connector.created_at)
-    result = await db.execute(q)
-    return result.scalars().all()
+    if swimlane_ids or step_ids is not None:
+        # Connectors store main element ids; an overlay row counts as the element it replaces.
+        visible = select(func.coalesce(Element.base_element_id, Element.id)).where(
+            _element_scope(board_id, branch_id, swimlane_ids, step_ids, overlay=overlay)
+        )
+        endpoint_in_view = [
+            Connector.source_element_id.in_(visible),
+            Connector.target_element_id.in_(visible),
+        ]
+        if step_ids is None:
+            endpoint_in_view += [Connector.source_step_id.is_not(None), Connector.target_step_id.is_not(None)]
+        else:
+            endpoint_in_view += [Connector.source_step_id.in_(step_ids), Connector.target_step_id.in_(step_ids)]
+        q = q.where(or_(*endpoint_in_view))
+    return await _paginate(db, q, Connector, limit, cursor)
 
 
 async def get_connector(
@@ -107,11 +256,13 @@ async def create_connector(
     board:    Board,
     data:     ConnectorCreate,
     user_id:  Optional[str] = None,
+    branch_id: Optional[str] = None,
 ) -> Connector:
-    await _validate_endpoints(
+    refs = await _validate_endpoints(
         db, board,
         data.source_step_id, data.source_element_id,
         data.target_step_id, data.target_element_id,
+        branch_id,
     )
     tier = _derive_tier(
         data.source_step_id, data.source_element_id,
@@ -119,10 +270,11 @@ async def create_connector(
     )
     c = Connector(
         board_id           = str(board.id),
+        branch_id          = branch_id,
         source_step_id     = data.source_step_id,
-        source_element_id  = data.source_element_id,
+        source_element_id  = refs.get(data.source_element_id),
         target_step_id     = data.target_step_id,
-        target_element_id  = data.target_element_id,
+        target_element_id  = refs.get(data.target_element_id),
         tier               = tier,
         connector_type     = data.connector_type,
         label              = data.label,
@@ -140,8 +292,7 @@ async def create_connector(
     try:
         await record_change_event(
             db, str(board.id), user_id, data.actor,
-            "connector", str(c.id), "create", None,
-            {"id": str(c.id), "type": c.connector_type, "tier": c.tier},
+            "connector", str(c.id), "create", None, _connector_snapshot(c),
             commit_message=f"Created {c.connector_type} connector",
         )
         await db.commit()
@@ -158,8 +309,18 @@ async def update_connector(
     connector_id: str,
     data:         ConnectorUpdate,
     user_id:      Optional[str] = None,
+    branch_id:    Optional[str] = None,
 ) -> Connector:
-    c = await get_connector(db, board_id, connector_id)
+    """
+    With branch_id, editing a main connector writes a copy-on-write overlay row on that
+    branch (returned in its place) and leaves main untouched.
+    """
+    c = await _get_in_scope(db, board_id, connector_id, branch_id)
+    if branch_id and c.branch_id is None:
+        c, created = await _overlay_connector(db, board_id, branch_id, c)
+        before_snap = None if created else _connector_snapshot(c)
+    else:
+        before_snap = _connector_snapshot(c)
 
     if data.connector_type is not None:
         c.connector_type = data.connector_type
@@ -178,15 +339,15 @@ async def update_connector(
     try:
         await record_change_event(
             db, board_id, user_id, "user",
-            "connector", connector_id, "update", None,
-            {"id": str(c.id), "type": c.connector_type},
+            "connector", str(c.id), "update" if before_snap else "create",
+            before_snap, _connector_snapshot(c),
             commit_message=f"Updated {c.connector_type} connector",
         )
         await db.commit()
     except Exception as exc:
-        log.warning("history event failed (connector update) %s: %s", connector_id, exc)
+        log.warning("history event failed (connector update) %s: %s", c.id, exc)
 
-    await _broadcast(board_id, "update", connector_id)
+    await _broadcast(board_id, "update", str(c.id))
     return c
 
 
@@ -195,16 +356,32 @@ async def delete_connector(
     board_id:     str,
     connector_id: str,
     user_id:      Optional[str] = None,
+    branch_id:    Optional[str] = None,
 ) -> None:
-    c = await get_connector(db, board_id, connector_id)
+    c = await _get_in_scope(db, board_id, connector_id, branch_id)
+    if branch_id and (c.branch_id is None or c.base_connector_id is not None):
+        # Hide the main connector on this branch only.
+        if c.branch_id is None:
+            c, _ = await _overlay_connector(db, board_id, branch_id, c)
+        c.is_tombstone = True
+        await db.flush()
+        await record_change_event(
+            db, board_id, user_id, "user", "connector", str(c.id), "delete",
+            _connector_snapshot(c), None,
+            commit_message="Deleted connector on branch",
+        )
+        await db.commit()
+        await _broadcast(board_id, "delete", connector_id)
+        return
+
+    before_snap = _connector_snapshot(c)
     await db.delete(c)
     await db.commit()
 
     try:
         await record_change_event(
             db, board_id, user_id, "user",
-            "connector", connector_id, "delete",
-            {"id": connector_id}, None,
+            "connector", connector_id, "delete", before_snap, None,
             commit_message="Deleted connector",
         )
         await db.commit()
@@ -214,6 +391,176 @@ async def delete_connector(
     await _broadcast(board_id, "delete", connector_id)
 
 
+async def apply_connector_batch(
+    db:       AsyncSession,
+    board:    Board,
+    data:     ConnectorBatchRequest,
+    user_id:  Optional[str] = None,
+    branch_id: Optional[str] = None,
+) -> dict:
+    """
+    Create, update and delete many connectors in one transaction.
+
+    All endpoints referenced by the creates are validated together (one pass over
+    board.state.steps, one SELECT for element ids), new rows are inserted with a
+    single flush, every change event shares one Commit, and subscribers get one
+    realtime broadcast for the whole batch.
+
+    With branch_id the batch applies to that branch like the single-connector routes:
+    creates land on the branch, main connectors are edited through copy-on-write
+    overlays, and deleting a main connector (or its overlay) writes a tombstone.
+    """
+    board_id = str(board.id)
+
+    creates = [op for op in data.operations if op.op == "create"]
+    for op in creates:
+        _check_endpoint_shape(
+            op.source_step_id, op.source_element_id,
+            op.target_step_id, op.target_element_id,
+        )
+    refs = await _validate_endpoint_refs(
+        db, board,
+        {s for op in creates for s in (op.source_step_id, op.target_step_id) if s},
+        {e for op in creates for e in (op.source_element_id, op.target_element_id) if e},
+        branch_id,
+    )
+
+    target_ids = {op.id for op in data.operations if op.op != "create"}
+    existing: dict[str, Connector] = {}
+    fresh: set[str] = set()   # overlay rows created by this batch
+    if target_ids:
+        result = await db.execute(
+            select(Connector).where(Connector.board_id == board_id, Connector.id.in_(target_ids))
+        )
+        existing = {
+            str(c.id): c for c in result.scalars().all()
+            # Rows of another branch (or any branch, on main) are not addressable here.
+            if c.branch_id is None or (branch_id and str(c.branch_id) == branch_id)
+        }
+        missing = target_ids - existing.keys()
+        if missing:
+            raise HTTPException(404, f"Connector(s) not found: {', '.join(sorted(missing))}")
+        if branch_id:
+            on_main = [c for c in existing.values() if c.branch_id is None]
+            for main_id, (row, created) in (
+                await _overlay_connectors(db, board_id, branch_id, on_main)
+            ).items():
+                existing[main_id] = row
+                if created:
+                    fresh.add(main_id)
+
+    created: list[Connector] = []
+    updated: dict[str, Connector] = {}
+    deleted: list[str] = []
+    tombstoned: dict[str, Connector] = {}
+    before_snaps: dict[str, Optional[dict]] = {}
+
+    for op in data.operations:
+        if op.op == "create":
+            c = Connector(
+                board_id           = board_id,
+                branch_id          = branch_id,
+                source_step_id     = op.source_step_id,
+                source_element_id  = refs.get(op.source_element_id),
+                target_step_id     = op.target_step_id,
+                target_element_id  = refs.get(op.target_element_id),
+                tier               = _derive_tier(
+                    op.source_step_id, op.source_element_id,
+                    op.target_step_id, op.target_element_id,
+                ),
+                connector_type     = op.connector_type,
+                label              = op.label,
+                notes              = op.notes,
+                waypoints          = op.waypoints or [],
+                created_by_user_id = user_id,
+                created_by_actor   = op.actor,
+                updated_by_user_id = user_id,
+                updated_by_actor   = op.actor,
+            )
+            created.append(c)
+            continue
+
+        if op.id in deleted or op.id in tombstoned:
+            raise HTTPException(422, f"Connector {op.id} is deleted earlier in this batch")
+        c = existing[op.id]
+        before_snaps.setdefault(op.id, None if op.id in fresh else _connector_snapshot(c))
+        if op.op == "update":
+            for field in ("connector_type", "label", "notes", "waypoints"):
+                value = getattr(op, field)
+                if value is not None:
+                    setattr(c, field, value)
+            c.updated_by_user_id = user_id
+            c.updated_by_actor   = data.actor
+            updated[op.id] = c
+        elif branch_id and c.base_connector_id is not None:
+            c.is_tombstone = True
+            updated.pop(op.id, None)
+            tombstoned[op.id] = c
+        else:
+            updated.pop(op.id, None)
+            deleted.append(op.id)
+            await db.delete(c)
+
+    db.add_all(created)
+    ops = len(data.operations)
+    commit = await create_commit(
+        db, board_id, user_id, data.actor,
+        data.message or f"Batch edit: {ops} connector operation{'s' if ops != 1 else ''}",
+    )
+    commit_id = str(commit.id)
+    await db.flush()  # INSERT … RETURNING fills ids and timestamps for new connectors
+
+    touched = [str(c.id) for c in created] + [str(c.id) for c in updated.values()]
+    if touched:
+        await db.execute(
+            select(Connector)
+            .where(Connector.id.in_(touched))
+            .execution_options(populate_existing=True)
+        )
+
+    for c in created:
+        await record_change_event(
+            db, board_id, user_id, c.created_by_actor,
+            "connector", str(c.id), "create", None, _connector_snapshot(c),
+            commit_id=commit_id,
+        )
+    for cid, c in updated.items():
+        before = before_snaps[cid]
+        await record_change_event(
+            db, board_id, user_id, data.actor,
+            "connector", str(c.id), "update" if before else "create", before, _connector_snapshot(c),
+            commit_id=commit_id,
+        )
+    for cid, c in tombstoned.items():
+        await record_change_event(
+            db, board_id, user_id, data.actor,
+            "connector", str(c.id), "delete", _connector_snapshot(c), None,
+            commit_id=commit_id,
+        )
+    for cid in deleted:
+        await record_change_event(
+            db, board_id, user_id, data.actor,
+            "connector", cid, "delete", before_snaps[cid], None,
+            commit_id=commit_id,
+        )
+
+    await db.commit()
+
+    result = {
+        "created":   created,
+        "updated":   list(updated.values()),
+        "deleted":   deleted + list(tombstoned),
+        "commit_id": commit_id,
+    }
+    await _send_broadcast(board_id, {
+        "operation": "batch",
+        "created":   [str(c.id) for c in created],
+        "updated":   [str(c.id) for c in updated.values()],
+        "deleted":   result["deleted"],
+    })
+    return result
+
+
 async def delete_connectors_for_step(
     db:           AsyncSession,
     board_id:     str,
@@ -229,12 +576,12 @@ async def delete_connectors_for_step(
     )
     connectors = result.scalars().all()
     for c in connectors:
+        before_snap = _connector_snapshot(c)
         await db.delete(c)
         try:
             await record_change_event(
                 db, board_id, actor_user_id, "system",
-                "connector", str(c.id), "delete",
-                {"id": str(c.id), "reason": f"step {step_id} deleted"}, None,
+                "connector", str(c.id), "delete", before_snap, None,
             )
         except Exception as exc:
             log.warning("history event failed (step cascade connector) %s: %s", c.id, exc)
@@ -243,41 +590,126 @@ async def delete_connectors_for_step(
     return len(connectors)
 
 
-async def delete_connectors_for_element(
+async def delete_connectors_for_elements(
     db:           AsyncSession,
     board_id:     str,
-    element_id:   str,
+    element_ids:  list[str],
     actor_user_id: Optional[str] = None,
+    commit_id:    Optional[str] = None,
+    branch_id:    Optional[str] = None,
 ) -> int:
     """
-    Explicitly delete connectors referencing element_id and log history events.
+    Explicitly delete connectors referencing any of element_ids and log history events.
     Explicit deletion ensures correctness in SQLite (no FK cascade) and on PostgreSQL
     the FK ON DELETE CASCADE is a harmless no-op afterwards.
+
+    Only connectors of the elements' own scope go: main's for main elements (branch_id
+    None), the branch's for branch-only elements. Branch rows that reference a deleted
+    main element stay, like element overlays, so the merge reports the conflict.
+
+    One SELECT for every affected connector; does not commit — the caller owns the transaction.
     """
+    if not element_ids:
+        return 0
     result = await db.execute(
         select(Connector).where(
             Connector.board_id == board_id,
-            (Connector.source_element_id == element_id) | (Connector.target_element_id == element_id),
+            Connector.branch_id == branch_id if branch_id else Connector.branch_id.is_(None),
+            Connector.source_element_id.in_(element_ids) | Connector.target_element_id.in_(element_ids),
         )
     )
     connectors = result.scalars().all()
     for c in connectors:
+        before_snap = _connector_snapshot(c)
         await db.delete(c)
-        try:
-            await record_change_event(
-                db, board_id, actor_user_id, "system",
-                "connector", str(c.id), "delete",
-                {"id": str(c.id), "reason": f"element {element_id} deleted"}, None,
-            )
-        except Exception as exc:
-            log.warning("history event failed (element cascade connector) %s: %s", c.id, exc)
-    if connectors:
-        await db.commit()
+        await record_change_event(
+            db, board_id, actor_user_id, "system",
+            "connector", str(c.id), "delete", before_snap, None,
+            commit_id=commit_id,
+        )
     return len(connectors)
 
 
+async def _get_in_scope(
+    db: AsyncSession, board_id: str, connector_id: str, branch_id: Optional[str],
+) -> Connector:
+    """A main connector, or a row of branch_id itself; another branch's rows are 404."""
+    c = await get_connector(db, board_id, connector_id)
+    if c.branch_id is not None and str(c.branch_id) != branch_id:
+        raise HTTPException(404, "Connector not found")
+    return c
+
+
+async def _overlay_connector(
+    db: AsyncSession, board_id: str, branch_id: str, c: Connector,
+) -> tuple[Connector, bool]:
+    """
+    Copy-on-write: the row on branch_id standing in for main connector c, created on
+    first write. Returns (row, created).
+    """
+    rows = await _overlay_connectors(db, board_id, branch_id, [c])
+    return rows[str(c.id)]
+
+
+async def _overlay_connectors(
+    db: AsyncSession, board_id: str, branch_id: str, cs: list[Connector],
+) -> dict[str, tuple[Connector, bool]]:
+    """_overlay_connector for many main connectors with one lookup: main id -> (row, created)."""
+    branch = (await db.execute(
+        select(Branch).where(Branch.id == branch_id, Branch.board_id == board_id)
+    )).scalar_one_or_none()
+    if not branch:
+        raise HTTPException(404, "Branch not found")
+    if not branch.copy_on_write:
+        raise HTTPException(422, "This branch predates copy-on-write branches — its connectors live on main")
+    if not cs:
+        return {}
+    existing = {str(r.base_connector_id): r for r in (await db.execute(
+        select(Connector).where(
+            Connector.branch_id == branch_id,
+            Connector.base_connector_id.in_([str(c.id) for c in cs]),
+        )
+    )).scalars().all()}
+    out: dict[str, tuple[Connector, bool]] = {}
+    for c in cs:
+        row = existing.get(str(c.id))
+        if row is not None:
+            if row.is_tombstone:
+                raise HTTPException(404, "Connector not found")
+            out[str(c.id)] = (row, False)
+            continue
+        row = Connector(
+            board_id=board_id,
+            branch_id=branch_id,
+            base_connector_id=str(c.id),
+            source_step_id=c.source_step_id,
+            source_element_id=c.source_element_id,
+            target_step_id=c.target_step_id,
+            target_element_id=c.target_element_id,
+            tier=c.tier,
+            connector_type=c.connector_type,
+            label=c.label,
+            notes=c.notes,
+            waypoints=list(c.waypoints or []),
+            created_at=c.created_at,  # keeps the connector's place in (created_at, id) order
+            created_by_user_id=c.created_by_user_id,
+            created_by_actor=c.created_by_actor,
+        )
+        db.add(row)
+        out[str(c.id)] = (row, True)
+    return out
+
+
 async def _broadcast(board_id: str, operation: str, connector_id: str) -> None:
     """Best-effort Supabase Realtime broadcast. Never raises."""
+    await _send_broadcast(board_id, {
+        "operation":    operation,
+        "connector_id": connector_id,
+    })
+
+
+async def _send_broadcast(board_id: str, event_payload: dict) -> None:
+    """Post one connector_changed event to the board channel. Never raises."""
     try:
         from app.config import get_settings
         settings = get_settings()
@@ -293,10 +725,7 @@ async def _broadcast(board_id: str, operation: str, connector_id: str) -> None:
                 "payload": {
                     "type":  "broadcast",
                     "event": "connector_changed",
-                    "payload": {
-                        "operation":    operation,
-                        "connector_id": connector_id,
-                    },
+                    "payload": event_payload,
                 },
             }]
         }
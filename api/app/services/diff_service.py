@@ -0,0 +1,192 @@
+"""
+Diff service — compare two versions of a board: commits, timestamps, branches or live main.
+
+Each side is reduced to swimlanes, steps, elements and connectors keyed by id, and rows
+present on both sides are compared on the compared fields only. Both sides are loaded
+in full before the first record is produced and every shared row is compared, so the
+cost of a diff grows with the size of the board; ndjson streaming bounds the response
+size, not that work.
+
+On a copy-on-write branch an overlay row is matched to the main row it replaces
+(base_element_id / base_connector_id). Older branches hold full element copies with fresh
+ids, so when one of those is a side, elements are matched by (type, name) instead.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Iterator, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+
+from app.models import Board, Branch, Commit
+from app.services.checkpoint_service import board_at, _live_board, _ordered
+from app.services.history_service import (
+    _CONNECTOR_FIELDS, _SNAPSHOT_FIELDS, _connector_snapshot, _element_snapshot,
+)
+
+log = logging.getLogger(__name__)
+
+SECTIONS = ("swimlanes", "steps", "elements", "connectors")
+_FIELDS: dict[str, Optional[tuple]] = {
+    "swimlanes":  None,   # state items: every key is compared
+    "steps":      None,
+    "elements":   tuple(sorted(_SNAPSHOT_FIELDS)),
+    "connectors": _CONNECTOR_FIELDS,
+}
+
+
+async def resolve_side(db: AsyncSession, board: Board, ref: str) -> dict[str, Any]:
+    """
+    Load one side of a diff. `ref` is "main" (live board), a commit id, a branch id or an
+    ISO timestamp. Read-only.
+    """
+    board_id = str(board.id)
+    if ref == "main":
+        return await _live_side(db, board, ref)
+
+    if _is_uuid(ref):
+        commit = (await db.execute(
+            select(Commit.id).where(Commit.id == ref, Commit.board_id == board_id)
+        )).scalar_one_or_none()
+        if commit:
+            at = await board_at(db, board, commit_id=ref)
+            return _side(ref, "commit", at["as_of"], at["state"], at["elements"], at["connectors"])
+
+        branch = (await db.execute(
+            select(Branch).where(Branch.id == ref, Branch.board_id == board_id)
+        )).scalar_one_or_none()
+        if branch:
+            if branch.is_default:
+                return await _live_side(db, board, ref)
+            from app.services.element_service import list_elements
+            from app.services.connector_service import list_connectors
+            elements, _ = await list_elements(db, board_id, branch_id=ref)
+            if branch.copy_on_write:
+                rows, _ = await list_connectors(db, board_id, branch_id=ref)
+                connectors = [_connector_snapshot(c) for c in rows]
+            else:  # full-copy branches never had connectors of their own
+                _, _, live = await _live_board(db, board)
+                connectors = _ordered(live)
+            side = _side(
+                ref, "branch", None, {**(board.state or {}), **(branch.state_snapshot or {})},
+                [_element_snapshot(e) for e in elements], connectors,
+            )
+            side["branch_name"] = branch.name
+            side["copy_on_write"] = branch.copy_on_write
+            return side
+        raise HTTPException(404, f"No commit or branch {ref} on this board")
+
+    try:
+        ts = datetime.fromisoformat(ref.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(422, f"'{ref}' is not a commit id, branch id, timestamp or 'main'")
+    at = await board_at(db, board, ts=ts)
+    return _side(ref, "timestamp", ts, at["state"], at["elements"], at["connectors"])
+
+
+def iter_diff(old: dict[str, Any], new: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """
+    Yield one record per added/removed/changed row, section by section, then a final
+    {"type": "summary"} record with per-section counts (including unchanged rows).
+    """
+    by_content = any(side["kind"] == "branch" and not side["copy_on_write"] for side in (old, new))
+    summary: dict[str, dict[str, int]] = {}
+    for section in SECTIONS:
+        counts = summary.setdefault(section, {"added": 0, "removed": 0, "changed": 0, "unchanged": 0})
+        a = _keyed(old[section], section, by_content)
+        b = _keyed(new[section], section, by_content)
+        fields = _FIELDS[section]
+
+        for key, snap in b.items():
+            if key not in a:
+                counts["added"] += 1
+                yield {"type": "added", "section": section, "id": snap.get("id"), "snapshot": snap}
+                continue
+            before = a[key]
+            names = fields or sorted(set(before) | set(snap))
+            changed = {f: {"from": before.get(f), "to": snap.get(f)}
+                       for f in names if before.get(f) != snap.get(f)}
+            if not changed:
+                counts["unchanged"] += 1
+                continue
+            counts["changed"] += 1
+            yield {
+                "type":    "changed",
+                "section": section,
+                "id":      snap.get("id"),
+                "from_id": before.get("id"),
+                "name":    snap.get("name"),
+                "fields":  changed,
+            }
+        for key, snap in a.items():
+            if key not in b:
+                counts["removed"] += 1
+                yield {"type": "removed", "section": section, "id": snap.get("id"), "snapshot": snap}
+    yield {"type": "summary", "counts": summary}
+
+
+def collect_diff(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
+    """iter_diff folded into one JSON document."""
+    out: dict[str, Any] = {
+        "from": describe_side(old),
+        "to":   describe_side(new),
+        **{s: {"added": [], "removed": [], "changed": []} for s in SECTIONS},
+    }
+    for rec in iter_diff(old, new):
+        if rec["type"] == "summary":
+            out["summary"] = rec["counts"]
+        elif rec["type"] == "changed":
+            out[rec["section"]]["changed"].append(
+                {k: rec[k] for k in ("id", "from_id", "name", "fields")}
+            )
+        else:
+            out[rec["section"]][rec["type"]].append(rec["snapshot"])
+    return out
+
+
+def describe_side(side: dict[str, Any]) -> dict[str, Any]:
+    return {k: side.get(k) for k in ("ref", "kind", "as_of", "branch_name")}
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+async def _live_side(db: AsyncSession, board: Board, ref: str) -> dict[str, Any]:
+    state, elements, connectors = await _live_board(db, board)
+    return _side(ref, "main", None, state, _ordered(elements), _ordered(connectors))
+
+
+def _side(ref, kind, as_of, state, elements, connectors) -> dict[str, Any]:
+    return {
+        "ref":        ref,
+        "kind":       kind,
+        "as_of":      as_of.isoformat() if as_of else None,
+        "swimlanes":  [s for s in (state or {}).get("swimlanes", []) if isinstance(s, dict)],
+        "steps":      [s for s in (state or {}).get("steps", []) if isinstance(s, dict)],
+        "elements":   elements,
+        "connectors": connectors,
+    }
+
+
+def _keyed(rows: list[dict], section: str, by_content: bool) -> dict[Any, dict]:
+    if section == "connectors":
+        return {r.get("base_connector_id") or r.get("id"): r for r in rows}
+    if section != "elements":
+        return {r.get("id"): r for r in rows}
+    if not by_content:
+        return {r.get("base_element_id") or r.get("id"): r for r in rows}
+    out: dict[Any, dict] = {}
+    for r in rows:
+        key = (r.get("type"), r.get("name"), 0)
+        while key in out:  # same type and name more than once: pair them in order
+            key = (key[0], key[1], key[2] + 1)
+        out[key] = r
+    return out
+
+
+def _is_uuid(ref: str) -> bool:
+    try:
+        uuid.UUID(ref)
+    except ValueError:
+        return False
+    return True
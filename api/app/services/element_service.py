@@ -4,27 +4,125 @@ For ai_capability elements, also syncs to the capabilities table (best-effort).
 """
 import logging
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import select, func, and_, or_, delete as sql_delete
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
-from app.models import Element, Capability
-from app.schemas import ElementCreate, ElementUpdate
-from app.services.history_service import record_change_event, _element_snapshot
+from app.models import Board, Branch, Element, Capability
+from app.schemas import ElementBatchRequest, ElementCreate, ElementUpdate
+from app.services.history_service import create_commit, record_change_event, _element_snapshot
+from app.services.board_service import encode_keyset, keyset_page
 
 log = logging.getLogger(__name__)
 
 
 async def list_elements(
-    db: AsyncSession, board_id: str, branch_id: Optional[str] = None
-) -> list[Element]:
-    q = select(Element).where(Element.board_id == board_id)
-    if branch_id:
-        q = q.where(Element.branch_id == branch_id)
+    db: AsyncSession,
+    board_id: str,
+    branch_id: Optional[str] = None,
+    swimlane_ids: Optional[list[str]] = None,
+    step_ids: Optional[list[str]] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> tuple[list[Element], Optional[str]]:
+    """
+    Elements on a branch, optionally narrowed to a viewport (lanes × step window).
+    Keyset-paginated on (created_at, id); returns (elements, next_cursor).
+    """
+    overlay = branch_id is not None and await is_copy_on_write(db, board_id, branch_id)
+    q = select(Element).where(_element_scope(board_id, branch_id, swimlane_ids, step_ids, overlay=overlay))
+    return await _paginate(db, q, Element, limit, cursor)
+
+
+async def is_copy_on_write(db: AsyncSession, board_id: str, branch_id: str) -> bool:
+    return bool((await db.execute(
+        select(Branch.copy_on_write).where(Branch.id == branch_id, Branch.board_id == board_id)
+    )).scalar_one_or_none())
+
+
+def _element_scope(
+    board_id: str,
+    branch_id: Optional[str],
+    swimlane_ids: Optional[list[str]] = None,
+    step_ids: Optional[list[str]] = None,
+    overlay: bool = False,
+):
+    """
+    WHERE clause for list_elements; served by ix_elements_board_branch_lane_step.
+    With overlay=True a branch reads as main minus the elements it shadows, plus its own
+    live rows (ix_elements_branch_base answers the shadow lookup).
+    """
+    if branch_id and overlay:
+        shadow = aliased(Element)
+        on_branch = or_(
+            and_(Element.branch_id == branch_id, Element.is_tombstone.is_(False)),
+            and_(
+                Element.branch_id.is_(None),
+                ~select(shadow.id).where(
+                    shadow.branch_id == branch_id, shadow.base_element_id == Element.id,
+                ).exists(),
+            ),
+        )
     else:
-        q = q.where(Element.branch_id.is_(None))
-    result = await db.execute(q.order_by(Element.created_at))
-    return result.scalars().all()
+        on_branch = Element.branch_id == branch_id if branch_id else Element.branch_id.is_(None)
+    clauses = [Element.board_id == board_id, on_branch]
+    if swimlane_ids:
+        clauses.append(Element.swimlane_id.in_(swimlane_ids))
+    if step_ids is not None:
+        clauses.append(Element.step_id.in_(step_ids))
+    return and_(*clauses)
+
+
+async def resolve_step_window(
+    db: AsyncSession,
+    board: Board,
+    branch_id: Optional[str],
+    step_from: Optional[str],
+    step_to: Optional[str],
+) -> Optional[list[str]]:
+    """
+    Step ids between step_from and step_to (inclusive) in canvas order, or None when
+    no window was requested. A branch with its own state snapshot uses its step list.
+    """
+    if not step_from and not step_to:
+        return None
+    state = board.state or {}
+    if branch_id:
+        snapshot = (await db.execute(
+            select(Branch.state_snapshot).where(Branch.id == branch_id, Branch.board_id == board.id)
+        )).scalar_one_or_none()
+        if snapshot and snapshot.get("steps") is not None:
+            state = snapshot
+    steps = [
+        str(st["id"]) for _, st in sorted(
+            enumerate(s for s in state.get("steps", []) if isinstance(s, dict) and "id" in s),
+            key=lambda pair: (pair[1].get("order", pair[0]), pair[0]),
+        )
+    ]
+    try:
+        start = steps.index(step_from) if step_from else 0
+        end   = steps.index(step_to)   if step_to   else len(steps) - 1
+    except ValueError:
+        raise HTTPException(400, "step_from/step_to must be steps on this board")
+    if start > end:
+        start, end = end, start
+    return steps[start:end + 1]
+
+
+async def _paginate(db: AsyncSession, q, model, limit: Optional[int], cursor: Optional[str]):
+    """
+    Apply (created_at, id) keyset pagination to q; shared with connector listing. The
+    cursor carries both values, so deleting the last row of a page does not end the list.
+    """
+    q = keyset_page(db, q, model.created_at, model.id, cursor)
+    if limit:
+        q = q.limit(limit + 1)
+    rows = list((await db.execute(q)).scalars().all())
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_keyset(rows[-1].created_at, rows[-1].id)
+    return rows, None
 
 
 async def get_element(db: AsyncSession, board_id: str, element_id: str) -> Element:
@@ -50,33 +148,33 @@ async def create_element(
         **data.model_dump(exclude_none=True, exclude={"actor"}),
     )
     db.add(el)
-    await db.flush()
+    await db.flush()  # INSERT … RETURNING populates id and timestamps
 
     if el.type == "ai_capability":
-        await _sync_capability_create(db, board_id, el)
+        await _sync_capability_upsert(db, board_id, el)
 
+    await record_change_event(
+        db, board_id, user_id, actor, "element", str(el.id), "create", None, _element_snapshot(el),
+        commit_message=f"Created element '{el.name}'",
+    )
     await db.commit()
-    await db.refresh(el)
-
-    try:
-        snap = _element_snapshot(el)
-        await record_change_event(
-            db, board_id, user_id, actor, "element", str(el.id), "create", None, snap,
-            commit_message=f"Created element '{el.name}'",
-        )
-        await db.commit()
-    except Exception as exc:
-        log.warning("history event failed (create) for element %s: %s", el.id, exc)
-
     return el
 
 
 async def update_element(
     db: AsyncSession, board_id: str, element_id: str, data: ElementUpdate,
-    user_id: Optional[str] = None,
+    user_id: Optional[str] = None, branch_id: Optional[str] = None,
 ) -> Element:
-    el = await get_element(db, board_id, element_id)
-    before_snap = _element_snapshot(el)
+    """
+    With branch_id, editing a main element writes a copy-on-write overlay row on that
+    branch (returned in its place) and leaves main untouched.
+    """
+    el = await _get_in_scope(db, board_id, element_id, branch_id)
+    if branch_id and el.branch_id is None:
+        el, created = await _overlay_row(db, board_id, branch_id, el)
+        before_snap = None if created else _element_snapshot(el)
+    else:
+        before_snap = _element_snapshot(el)
     actor = data.actor
     old_type = el.type
 
@@ -87,101 +185,358 @@ async def update_element(
     el.updated_by_actor = actor
 
     new_type = el.type
-    if old_type == "ai_capability" and new_type != "ai_capability":
-        await _sync_capability_delete(db, board_id, element_id)
-    elif new_type == "ai_capability":
-        await _sync_capability_upsert(db, board_id, el)
+    if el.base_element_id is None:  # overlay rows leave the capability registry to main
+        if old_type == "ai_capability" and new_type != "ai_capability":
+            await _sync_capability_delete(db, board_id, element_id)
+        elif new_type == "ai_capability":
+            await _sync_capability_upsert(db, board_id, el)
+
+    await db.flush()  # UPDATE … RETURNING refreshes updated_at
 
+    await record_change_event(
+        db, board_id, user_id, actor, "element", str(el.id), "update" if before_snap else "create",
+        before_snap, _element_snapshot(el),
+        commit_message=f"Updated element '{el.name}'",
+    )
     await db.commit()
-    await db.refresh(el)
+    return el
 
-    try:
-        after_snap = _element_snapshot(el)
+
+async def delete_element(
+    db: AsyncSession, board_id: str, element_id: str, user_id: Optional[str] = None,
+    branch_id: Optional[str] = None,
+) -> None:
+    el = await _get_in_scope(db, board_id, element_id, branch_id)
+    if branch_id and (el.branch_id is None or el.base_element_id is not None):
+        # Hide the main element on this branch only; its connectors drop out of the
+        # branch's connector scope with it (connector_service._connector_scope).
+        if el.branch_id is None:
+            el, _ = await _overlay_row(db, board_id, branch_id, el)
+        el.is_tombstone = True
+        await db.flush()
         await record_change_event(
-            db, board_id, user_id, actor, "element", str(el.id), "update", before_snap, after_snap,
-            commit_message=f"Updated element '{el.name}'",
+            db, board_id, user_id, "user", "element", str(el.id), "delete", _element_snapshot(el), None,
+            commit_message=f"Deleted element '{el.name}' on branch",
         )
         await db.commit()
-    except Exception as exc:
-        log.warning("history event failed (update) for element %s: %s", el.id, exc)
+        return
 
-    return el
+    before_snap = _element_snapshot(el)
+    el_name = before_snap.get("name", element_id)
 
+    commit = await create_commit(db, board_id, user_id, "user", f"Deleted element '{el_name}'")
+    commit_id = str(commit.id)
 
-async def delete_element(
-    db: AsyncSession, board_id: str, element_id: str, user_id: Optional[str] = None
-) -> None:
-    el = await get_element(db, board_id, element_id)
-    before_snap = _element_snapshot(el)
     if el.type == "ai_capability":
         await _sync_capability_delete(db, board_id, element_id)
     # Log history for connectors that FK-cascade will delete (FR-7, PRD-18)
-    try:
-        from app.services.connector_service import delete_connectors_for_element
-        await delete_connectors_for_element(db, board_id, element_id, actor_user_id=user_id)
-    except Exception as exc:
-        log.warning("connector cascade history failed for element %s: %s", element_id, exc)
+    from app.services.connector_service import delete_connectors_for_elements
+    await delete_connectors_for_elements(
+        db, board_id, [element_id], actor_user_id=user_id, commit_id=commit_id,
+        branch_id=el.branch_id and str(el.branch_id),
+    )
     await db.delete(el)
+
+    await record_change_event(
+        db, board_id, user_id, "user", "element", element_id, "delete", before_snap, None,
+        commit_id=commit_id,
+    )
     await db.commit()
 
-    el_name = before_snap.get("name", element_id) if before_snap else element_id
-    try:
+
+# ── Batch mutations ───────────────────────────────────────────────────────────
+
+async def apply_element_batch(
+    db: AsyncSession,
+    board_id: str,
+    data: ElementBatchRequest,
+    user_id: Optional[str] = None,
+    branch_id: Optional[str] = None,
+) -> dict:
+    """
+    Apply a list of create/update/delete operations in one transaction.
+
+    Every referenced element is loaded with a single SELECT, capability sync runs
+    once for the whole batch, and all change events share one grouped Commit.
+    Nothing is written if any operation refers to an element that is not on the board.
+
+    With branch_id (a copy-on-write branch) the batch edits that branch the way
+    update_element/delete_element do: creates land on the branch, main elements are
+    updated through overlay rows and deleted with tombstones, and main is not touched.
+    """
+    if branch_id:
+        await _require_copy_on_write(db, board_id, branch_id)
+    target_ids = {op.id for op in data.operations if op.op != "create"}
+    existing: dict[str, Element] = {}
+    fresh: set[str] = set()   # overlay rows created by this batch
+    if target_ids:
+        result = await db.execute(
+            select(Element).where(Element.board_id == board_id, Element.id.in_(target_ids))
+        )
+        existing = {
+            str(el.id): el for el in result.scalars().all()
+            if not branch_id or el.branch_id is None or str(el.branch_id) == branch_id
+        }
+        missing = target_ids - existing.keys()
+        if missing:
+            raise HTTPException(404, f"Element(s) not found: {', '.join(sorted(missing))}")
+        if branch_id:
+            on_main = [el for el in existing.values() if el.branch_id is None]
+            for main_id, (row, created) in (
+                await _overlay_rows(db, board_id, branch_id, on_main)
+            ).items():
+                existing[main_id] = row
+                if created:
+                    fresh.add(main_id)
+
+    created: list[Element] = []
+    updated: dict[str, Element] = {}
+    deleted: dict[str, dict] = {}
+    tombstoned: dict[str, Element] = {}
+    before_snaps: dict[str, Optional[dict]] = {}
+    cap_upserts: dict[str, Element] = {}
+    cap_deletes: set[str] = set()
+
+    for op in data.operations:
+        if op.op == "create":
+            actor = op.actor
+            fields = op.model_dump(exclude_none=True, exclude={"actor", "op"})
+            if branch_id:
+                fields["branch_id"] = branch_id
+            el = Element(
+                board_id=board_id,
+                created_by_user_id=user_id,
+                created_by_actor=actor,
+                updated_by_user_id=user_id,
+                updated_by_actor=actor,
+                **fields,
+            )
+            db.add(el)
+            created.append(el)
+            if el.type == "ai_capability":
+                cap_upserts[str(id(el))] = el
+            continue
+
+        if op.id in deleted or op.id in tombstoned:
+            raise HTTPException(422, f"Element {op.id} is deleted earlier in this batch")
+        el = existing[op.id]
+        if op.id not in before_snaps:
+            before_snaps[op.id] = None if op.id in fresh else _element_snapshot(el)
+        # Overlay rows leave the capability registry to main.
+        registered = el.base_element_id is None
+
+        if op.op == "update":
+            old_type = el.type
+            for k, v in op.model_dump(exclude_unset=True, exclude={"actor", "op", "id"}).items():
+                setattr(el, k, v)
+            el.updated_by_user_id = user_id
+            el.updated_by_actor = op.actor
+            updated[op.id] = el
+            if not registered:
+                continue
+            if el.type == "ai_capability":
+                cap_upserts[op.id] = el
+                cap_deletes.discard(op.id)
+            elif old_type == "ai_capability":
+                cap_upserts.pop(op.id, None)
+                cap_deletes.add(op.id)
+        elif branch_id and not registered:
+            el.is_tombstone = True
+            updated.pop(op.id, None)
+            tombstoned[op.id] = el
+        else:
+            snap = before_snaps[op.id]
+            if el.type == "ai_capability" or (snap or {}).get("type") == "ai_capability":
+                cap_deletes.add(op.id)
+            cap_upserts.pop(op.id, None)
+            updated.pop(op.id, None)
+            deleted[op.id] = snap
+
+    ops = len(data.operations)
+    commit = await create_commit(
+        db, board_id, user_id, data.actor,
+        data.message or f"Batch edit: {ops} element operation{'s' if ops != 1 else ''}",
+    )
+    commit_id = str(commit.id)
+
+    if deleted:
+        from app.services.connector_service import delete_connectors_for_elements
+        await delete_connectors_for_elements(
+            db, board_id, list(deleted), actor_user_id=user_id, commit_id=commit_id,
+            branch_id=branch_id,
+        )
+        for el_id in deleted:
+            await db.delete(existing[el_id])
+
+    await db.flush()  # RETURNING fills server-side timestamps for every touched row
+
+    await _sync_capabilities_bulk(db, board_id, list(cap_upserts.values()), cap_deletes)
+
+    for el in created:
         await record_change_event(
-            db, board_id, user_id, "user", "element", element_id, "delete", before_snap, None,
-            commit_message=f"Deleted element '{el_name}'",
+            db, board_id, user_id, el.created_by_actor, "element", str(el.id), "create",
+            None, _element_snapshot(el), commit_id=commit_id,
         )
-        await db.commit()
-    except Exception as exc:
-        log.warning("history event failed (delete) for element %s: %s", element_id, exc)
+    for el_id, el in updated.items():
+        before = before_snaps[el_id]
+        await record_change_event(
+            db, board_id, user_id, el.updated_by_actor, "element", str(el.id),
+            "update" if before else "create", before, _element_snapshot(el), commit_id=commit_id,
+        )
+    for el_id, snap in deleted.items():
+        await record_change_event(
+            db, board_id, user_id, data.actor, "element", el_id, "delete",
+            snap, None, commit_id=commit_id,
+        )
+    for el in tombstoned.values():
+        await record_change_event(
+            db, board_id, user_id, data.actor, "element", str(el.id), "delete",
+            _element_snapshot(el), None, commit_id=commit_id,
+        )
+
+    await db.commit()
+
+    return {
+        "created":   created,
+        "updated":   list(updated.values()),
+        "deleted":   list(deleted) + list(tombstoned),
+        "commit_id": commit_id,
+    }
 
 
 # ── Capability sync helpers (best-effort) ─────────────────────────────────────
 
-async def _sync_capability_create(db: AsyncSession, board_id: str, el: Element) -> None:
-    try:
-        meta = el.meta or {}
-        cap = Capability(
-            board_id=board_id,
-            cap_id=meta.get("cap_id") or f"CAP-{str(el.id)[:6].upper()}",
-            name=el.name,
-            type=meta.get("ai_type"),
-            risk_level=meta.get("risk_level"),
-            frontstage=bool(meta.get("frontstage", True)),
-            xai_strategy=meta.get("xai_strategy"),
-            autonomy=meta.get("autonomy"),
-            owner=el.owner,
-            status=el.status or "draft",
-            notes=el.notes,
-            meta={"element_id": str(el.id)},
+_CAPABILITY_SYNC_FIELDS = (
+    "name", "type", "risk_level", "frontstage", "xai_strategy", "autonomy", "owner", "status", "notes",
+)
+
+
+def _capability_fields(el: Element) -> dict:
+    """Capability columns derived from an ai_capability element."""
+    meta = el.meta or {}
+    return {
+        "name":         el.name,
+        "type":         meta.get("ai_type"),
+        "risk_level":   meta.get("risk_level"),
+        "frontstage":   bool(meta.get("frontstage", True)),
+        "xai_strategy": meta.get("xai_strategy"),
+        "autonomy":     meta.get("autonomy"),
+        "owner":        el.owner,
+        "status":       el.status or "draft",
+        "notes":        el.notes,
+    }
+
+
+def _capability_row(board_id: str, el: Element) -> dict:
+    meta = el.meta or {}
+    return {
+        "board_id":   board_id,
+        "element_id": str(el.id),
+        "cap_id":     meta.get("cap_id") or f"CAP-{str(el.id)[:6].upper()}",
+        "meta":       {"element_id": str(el.id)},  # kept for API consumers of Capability.meta
+        **_capability_fields(el),
+    }
+
+
+def _upsert_capabilities_stmt(db: AsyncSession, rows: list[dict]):
+    """
+    INSERT … ON CONFLICT (element_id) DO UPDATE for the bound dialect.
+    cap_id and meta are only set on insert so user edits to them survive re-syncs.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(Capability).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Capability.element_id],
+        set_={
+            **{k: stmt.excluded[k] for k in _CAPABILITY_SYNC_FIELDS},
+            "updated_at": func.now(),
+        },
+    )
+
+
+async def _get_in_scope(
+    db: AsyncSession, board_id: str, element_id: str, branch_id: Optional[str],
+) -> Element:
+    """With branch_id: a main element or a row of that branch; another branch's rows are 404."""
+    el = await get_element(db, board_id, element_id)
+    if branch_id and el.branch_id is not None and str(el.branch_id) != branch_id:
+        raise HTTPException(404, "Element not found")
+    return el
+
+
+async def _overlay_row(
+    db: AsyncSession, board_id: str, branch_id: str, el: Element,
+) -> tuple[Element, bool]:
+    """
+    Copy-on-write: the row on branch_id standing in for main element el, created on
+    first write. Returns (row, created).
+    """
+    rows = await _overlay_rows(db, board_id, branch_id, [el])
+    return rows[str(el.id)]
+
+
+async def _overlay_rows(
+    db: AsyncSession, board_id: str, branch_id: str, els: list[Element],
+) -> dict[str, tuple[Element, bool]]:
+    """_overlay_row for many main elements with one lookup: main id -> (row, created)."""
+    await _require_copy_on_write(db, board_id, branch_id)
+    existing = {str(r.base_element_id): r for r in (await db.execute(
+        select(Element).where(
+            Element.branch_id == branch_id,
+            Element.base_element_id.in_([str(el.id) for el in els]),
         )
-        db.add(cap)
-        await db.flush()
-    except Exception as exc:
-        log.warning("capability sync (create) failed for element %s: %s", el.id, exc)
+    )).scalars().all()}
+    out: dict[str, tuple[Element, bool]] = {}
+    for el in els:
+        row = existing.get(str(el.id))
+        if row is not None:
+            if row.is_tombstone:
+                raise HTTPException(404, "Element not found")
+            out[str(el.id)] = (row, False)
+            continue
+        row = _new_overlay(board_id, branch_id, el)
+        db.add(row)
+        out[str(el.id)] = (row, True)
+    return out
+
+
+async def _require_copy_on_write(db: AsyncSession, board_id: str, branch_id: str) -> None:
+    branch = (await db.execute(
+        select(Branch).where(Branch.id == branch_id, Branch.board_id == board_id)
+    )).scalar_one_or_none()
+    if not branch:
+        raise HTTPException(404, "Branch not found")
+    if not branch.copy_on_write:
+        raise HTTPException(422, "This branch keeps its own element copies — edit those instead")
+
+
+def _new_overlay(board_id: str, branch_id: str, el: Element) -> Element:
+    return Element(
+        board_id=board_id,
+        branch_id=branch_id,
+        base_element_id=str(el.id),
+        swimlane_id=el.swimlane_id,
+        step_id=el.step_id,
+        type=el.type,
+        name=el.name,
+        notes=el.notes,
+        owner=el.owner,
+        status=el.status,
+        meta=dict(el.meta or {}),
+        created_at=el.created_at,  # keeps the element's place in (created_at, id) order
+        created_by_user_id=el.created_by_user_id,
+        created_by_actor=el.created_by_actor,
+    )
 
 
 async def _sync_capability_upsert(db: AsyncSession, board_id: str, el: Element) -> None:
+    await db.flush()  # element errors must surface, not be logged as sync failures
     try:
-        meta = el.meta or {}
-        result = await db.execute(
-            select(Capability).where(
-                Capability.board_id == board_id,
-                Capability.meta["element_id"].astext == str(el.id),
-            )
-        )
-        cap = result.scalar_one_or_none()
-        if cap:
-            cap.name = el.name
-            cap.type = meta.get("ai_type")
-            cap.risk_level = meta.get("risk_level")
-            cap.frontstage = bool(meta.get("frontstage", True))
-            cap.xai_strategy = meta.get("xai_strategy")
-            cap.autonomy = meta.get("autonomy")
-            cap.owner = el.owner
-            cap.status = el.status or "draft"
-            cap.notes = el.notes
-        else:
-            await _sync_capability_create(db, board_id, el)
+        async with db.begin_nested():  # a failed sync rolls back to here, not the request
+            await db.execute(_upsert_capabilities_stmt(db, [_capability_row(board_id, el)]))
     except Exception as exc:
         log.warning("capability sync (upsert) failed for element %s: %s", el.id, exc)
 
@@ -189,15 +544,39 @@ async def _sync_capability_upsert(db: AsyncSession, board_id: str, el: Element)
 async def _sync_capability_delete(
     db: AsyncSession, board_id: str, element_id: str
 ) -> None:
+    await db.flush()
     try:
-        result = await db.execute(
-            select(Capability).where(
-                Capability.board_id == board_id,
-                Capability.meta["element_id"].astext == element_id,
+        async with db.begin_nested():
+            await db.execute(
+                sql_delete(Capability).where(
+                    Capability.board_id == board_id,
+                    Capability.element_id == element_id,
+                )
             )
-        )
-        cap = result.scalar_one_or_none()
-        if cap:
-            await db.delete(cap)
     except Exception as exc:
         log.warning("capability sync (delete) failed for element %s: %s", element_id, exc)
+
+
+async def _sync_capabilities_bulk(
+    db: AsyncSession,
+    board_id: str,
+    upserts: list[Element],
+    delete_element_ids: set[str],
+) -> None:
+    """Batch counterpart of the helpers above: one multi-row upsert and one DELETE."""
+    await db.flush()
+    try:
+        async with db.begin_nested():
+            if upserts:
+                await db.execute(
+                    _upsert_capabilities_stmt(db, [_capability_row(board_id, el) for el in upserts])
+                )
+            if delete_element_ids:
+                await db.execute(
+                    sql_delete(Capability).where(
+                        Capability.board_id == board_id,
+                        Capability.element_id.in_(delete_element_ids),
+                    )
+                )
+    except Exception as exc:
+        log.warning("capability sync (batch) failed for board %s: %s", board_id, exc)
@@ -1,11 +1,26 @@
-"""History service — PRD-17a/17c/17e snapshot-based change event log, restore, and commits."""
+"""
+History service — PRD-17a/17c/17e snapshot-based change event log, restore, and commits.
+
+Change events are buffered per session (ChangeRecorder in session.info) and written with
+one multi-row INSERT when the transaction commits; commits are added to the session
+with client-side ids and go out in the same flush. Nothing is written for a transaction
+that rolls back. Entity versions are unique (ix_change_events_entity_version): when a
+concurrent transaction took the same versions first, the buffered events are
+renumbered after its head and the INSERT is retried.
+"""
 import logging
+from collections import Counter
+from datetime import datetime
 from typing import Any, Optional
-from sqlalchemy import select, func, update as sql_update
+from sqlalchemy import bindparam, event, select, func, and_, or_, insert, update as sql_update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import HTTPException
 
-from app.models import Board, ChangeEvent, Commit, Element
+from app.config import get_settings
+from app.models import Board, ChangeEvent, Commit, Element, _uuid
 
 log = logging.getLogger(__name__)
 
@@ -16,6 +31,12 @@ def _element_snapshot(el) -> dict[str, Any]:
     return ElementOut.model_validate(el).model_dump(mode="json")
 
 
+def _connector_snapshot(c) -> dict[str, Any]:
+    """Serialize a Connector ORM object to a JSON-safe dict for snapshotting."""
+    from app.schemas import ConnectorOut
+    return ConnectorOut.model_validate(c).model_dump(mode="json")
+
+
 async def create_commit(
     db: AsyncSession,
     board_id: str,
@@ -23,14 +44,15 @@ async def create_commit(
     actor_type: str,
     message: str,
 ) -> Commit:
+    """Add a commit to the session; its id is assigned here, so no flush is needed."""
     c = Commit(
+        id=_uuid(),
         board_id=board_id,
         author_user_id=author_user_id,
         actor_type=actor_type,
         message=message,
     )
     db.add(c)
-    await db.flush()  # materialise id before ChangeEvent references it
     return c
 
 
@@ -47,22 +69,93 @@ async def record_change_event(
     commit_id: Optional[str] = None,
     commit_message: Optional[str] = None,
 ) -> None:
+    """
+    Append a change event to the session's recorder; it is written when the transaction
+    commits. Callers always pass full snapshots; storage is delta-encoded against the
+    entity's previous version, with a full keyframe every `history_keyframe_interval`
+    versions (see _encode_rows).
+    """
     if commit_message and not commit_id:
         c = await create_commit(db, board_id, actor_user_id, actor_type, commit_message)
         commit_id = str(c.id)
 
-    ev = ChangeEvent(
-        board_id=board_id,
-        actor_user_id=actor_user_id,
-        actor_type=actor_type,
-        entity_type=entity_type,
-        entity_id=entity_id,
-        operation=operation,
-        before_snapshot=before_snapshot,
-        after_snapshot=after_snapshot,
-        commit_id=commit_id,
-    )
-    db.add(ev)
+    recorder = _recorder(db)
+    recorder.snapshots.append(((board_id, entity_type, entity_id), before_snapshot, after_snapshot))
+    recorder.rows.append({  # versions and stored snapshots are filled in by _encode_rows
+        "id":              _uuid(),
+        "board_id":        board_id,
+        "actor_user_id":   actor_user_id,
+        "actor_type":      actor_type,
+        "entity_type":     entity_type,
+        "entity_id":       entity_id,
+        "operation":       operation,
+        "before_snapshot": None,
+        "after_snapshot":  None,
+        "entity_version":  None,
+        "is_keyframe":     True,
+        "commit_id":       commit_id,
+    })
+
+
+# ── Change recorder ───────────────────────────────────────────────────────────
+
+_RECORDER_KEY = "change_recorder"
+_WRITE_ATTEMPTS = 3
+
+
+class ChangeRecorder:
+    """
+    Per-session buffer of change_events rows, with the full (entity key, before, after)
+    of each. Rows are version-numbered and delta-encoded at commit, against heads read
+    for every buffered entity in one query.
+    """
+
+    def __init__(self) -> None:
+        self.rows: list[dict[str, Any]] = []
+        self.snapshots: list[tuple[tuple, Optional[dict], Optional[dict]]] = []
+
+
+def _recorder(db: AsyncSession) -> ChangeRecorder:
+    return db.info.setdefault(_RECORDER_KEY, ChangeRecorder())
+
+
+@event.listens_for(Session, "before_commit")
+def _write_change_events(session: Session) -> None:
+    recorder = session.info.pop(_RECORDER_KEY, None)
+    if recorder is None or not recorder.rows:
+        return
+    counts = Counter(row["commit_id"] for row in recorder.rows if row["commit_id"])
+    for obj in session.new:
+        if isinstance(obj, Commit) and obj.id in counts:
+            obj.event_count = (obj.event_count or 0) + counts.pop(obj.id)
+    session.flush()  # commits (and any new boards) before the events that reference them
+    _encode_rows(session, recorder)
+    for attempt in range(_WRITE_ATTEMPTS):
+        try:
+            with session.begin_nested():
+                session.execute(insert(ChangeEvent), recorder.rows)
+            break
+        except IntegrityError:
+            if attempt == _WRITE_ATTEMPTS - 1:
+                raise
+            log.info("history: entity versions taken by a concurrent write; renumbering")
+            _encode_rows(session, recorder)
+    if counts:  # commits flushed earlier in the transaction
+        commits = Commit.__table__
+        session.execute(
+            commits.update()
+            .where(commits.c.id == bindparam("commit_id"))
+            .values(event_count=commits.c.event_count + bindparam("n")),
+            [{"commit_id": cid, "n": n} for cid, n in counts.items()],
+        )
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_change_events(session: Session, previous_transaction) -> None:
+    # A SAVEPOINT rolling back leaves the outer transaction, and its events, intact.
+    if previous_transaction.nested:
+        return
+    session.info.pop(_RECORDER_KEY, None)
 
 
 async def list_history(
@@ -70,15 +163,41 @@ async def list_history(
     board_id: str,
     limit: int = 50,
     offset: int = 0,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    operation: Optional[str] = None,
+    actor_user_id: Optional[str] = None,
+    actor_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
 ) -> list[ChangeEvent]:
+    """
+    Newest first. With entity_type + entity_id this is one entity's timeline, served
+    by ix_change_events_entity_time.
+    """
+    q = select(ChangeEvent).where(ChangeEvent.board_id == board_id)
+    if entity_type:
+        q = q.where(ChangeEvent.entity_type == entity_type)
+    if entity_id:
+        q = q.where(ChangeEvent.entity_id == entity_id)
+    if operation:
+        q = q.where(ChangeEvent.operation == operation)
+    if actor_user_id:
+        q = q.where(ChangeEvent.actor_user_id == actor_user_id)
+    if actor_type:
+        q = q.where(ChangeEvent.actor_type == actor_type)
+    if since:
+        q = q.where(ChangeEvent.created_at >= since)
+    if until:
+        q = q.where(ChangeEvent.created_at < until)
     result = await db.execute(
-        select(ChangeEvent)
-        .where(ChangeEvent.board_id == board_id)
-        .order_by(ChangeEvent.created_at.desc())
+        q.order_by(ChangeEvent.created_at.desc(), ChangeEvent.entity_version.desc())
         .limit(limit)
         .offset(offset)
     )
-    return result.scalars().all()
+    events = result.scalars().all()
+    await hydrate_snapshots(db, events)
+    return events
 
 
 async def get_change_event(
@@ -95,14 +214,182 @@ async def get_change_event(
     ev = result.scalar_one_or_none()
     if not ev:
         raise HTTPException(404, "Change event not found")
+    await hydrate_snapshots(db, [ev])
     return ev
 
 
+# ── Snapshot delta encoding ───────────────────────────────────────────────────
+#
+# A non-keyframe event stores before_snapshot as a diff against the previous version's
+# after_snapshot, and after_snapshot as a diff against its own before_snapshot. A stored
+# value is self-describing: a dict carrying _DELTA is a diff, anything else (a full
+# dict or None) is used as-is. Replaying from the nearest keyframe therefore
+# reconstructs every version of the entity.
+
+_DELTA = "__delta__"
+
+
+def _is_delta(value: Any) -> bool:
+    return isinstance(value, dict) and _DELTA in value
+
+
+def _diff(base: Optional[dict], new: Optional[dict]) -> Optional[dict]:
+    if base is None or new is None:
+        return new
+    return {_DELTA: {
+        "set":   {k: v for k, v in new.items() if k not in base or base[k] != v},
+        "unset": [k for k in base if k not in new],
+    }}
+
+
+def _apply(base: Optional[dict], value: Any) -> Any:
+    if not _is_delta(value):
+        return value
+    if base is None:
+        log.warning("history: delta snapshot without a base version; chain is broken")
+        return None
+    delta = value[_DELTA]
+    out = {k: v for k, v in base.items() if k not in delta.get("unset", ())}
+    out.update(delta.get("set", {}))
+    return out
+
+
+def _replay(chain) -> dict[str, tuple]:
+    """Full (before, after) per event id for a chain ordered by entity_version ascending."""
+    out: dict[str, tuple] = {}
+    prev_after = None
+    for ev in chain:
+        before = _apply(prev_after, ev.before_snapshot)
+        after = _apply(before, ev.after_snapshot)
+        out[str(ev.id)] = (before, after)
+        prev_after = after
+    return out
+
+
+def _encode_rows(session: Session, recorder: ChangeRecorder) -> None:
+    """Number and delta-encode the buffered events against the entities' stored heads."""
+    interval = get_settings().history_keyframe_interval
+    heads = _stored_heads(session, {key for key, _, _ in recorder.snapshots})
+    for row, (key, before, after) in zip(recorder.rows, recorder.snapshots):
+        head = heads.get(key)
+        if head is None:
+            version, keyframe = 1, True
+        else:
+            prev_version, keyframe_version, _ = head
+            version = prev_version + 1
+            keyframe = keyframe_version is None or version - keyframe_version >= interval
+        heads[key] = (version, version if keyframe else head[1], after)
+        if keyframe:
+            row["before_snapshot"], row["after_snapshot"] = before, after
+        else:
+            row["before_snapshot"], row["after_snapshot"] = _diff(head[2], before), _diff(before, after)
+        row["entity_version"], row["is_keyframe"] = version, keyframe
+
+
+def _stored_heads(session: Session, keys: set[tuple]) -> dict[tuple, tuple]:
+    """
+    {(board_id, entity_type, entity_id): (version, keyframe version, full after_snapshot)}
+    of each entity's latest stored event, in one query: every chain is read from its
+    latest keyframe (or, without one, just its head) and replayed.
+    """
+    if not keys:
+        return {}
+    ce = ChangeEvent.__table__
+    k = ce.alias("k")
+    same = and_(k.c.board_id == ce.c.board_id, k.c.entity_type == ce.c.entity_type,
+                k.c.entity_id == ce.c.entity_id)
+    keyframe = select(func.max(k.c.entity_version)).where(same, k.c.is_keyframe.is_(True)).scalar_subquery()
+    latest = select(func.max(k.c.entity_version)).where(same).scalar_subquery()
+    rows = session.execute(
+        select(ce.c.id, ce.c.board_id, ce.c.entity_type, ce.c.entity_id, ce.c.entity_version,
+               ce.c.is_keyframe, ce.c.before_snapshot, ce.c.after_snapshot)
+        .where(
+            ce.c.board_id.in_({key[0] for key in keys}),
+            ce.c.entity_id.in_({key[2] for key in keys}),
+            ce.c.entity_version >= func.coalesce(keyframe, latest),
+        )
+        .order_by(ce.c.entity_version)
+    ).all()
+    chains: dict[tuple, list] = {}
+    for r in rows:
+        key = (str(r.board_id), r.entity_type, r.entity_id)
+        if key in keys:
+            chains.setdefault(key, []).append(r)
+    heads = {}
+    for key, chain in chains.items():
+        if not chain[0].is_keyframe:   # no keyframe stored: the head's full state is unknown
+            heads[key] = (chain[-1].entity_version, None, None)
+            continue
+        _, after = _replay(chain)[str(chain[-1].id)]
+        heads[key] = (chain[-1].entity_version, chain[0].entity_version, after)
+    return heads
+
+
+async def hydrate_snapshots(db: AsyncSession, events) -> None:
+    """
+    Replace delta-encoded snapshots on loaded events with full ones, in place.
+
+    All chains are fetched in one query (from each entity's keyframe at or before its
+    earliest requested version); values are set with set_committed_value so the
+    session never writes the decoded form back.
+    """
+    pending = [ev for ev in events if _is_delta(ev.before_snapshot) or _is_delta(ev.after_snapshot)]
+    if not pending:
+        return
+
+    spans: dict[tuple, list[int]] = {}
+    for ev in pending:
+        key = (str(ev.board_id), ev.entity_type, ev.entity_id)
+        lo_hi = spans.setdefault(key, [ev.entity_version, ev.entity_version])
+        lo_hi[0] = min(lo_hi[0], ev.entity_version)
+        lo_hi[1] = max(lo_hi[1], ev.entity_version)
+
+    conditions = []
+    for (board_id, entity_type, entity_id), (lo, hi) in spans.items():
+        same_entity = and_(
+            ChangeEvent.board_id == board_id,
+            ChangeEvent.entity_type == entity_type,
+            ChangeEvent.entity_id == entity_id,
+        )
+        keyframe = (
+            select(func.max(ChangeEvent.entity_version))
+            .where(same_entity, ChangeEvent.is_keyframe.is_(True), ChangeEvent.entity_version <= lo)
+            .scalar_subquery()
+        )
+        conditions.append(and_(
+            same_entity,
+            ChangeEvent.entity_version >= keyframe,
+            ChangeEvent.entity_version <= hi,
+        ))
+    rows = (await db.execute(
+        select(ChangeEvent)
+        .where(or_(*conditions))
+        .order_by(ChangeEvent.entity_type, ChangeEvent.entity_id, ChangeEvent.entity_version)
+    )).scalars().all()
+
+    chains: dict[tuple, list] = {}
+    for ev in rows:
+        chains.setdefault((str(ev.board_id), ev.entity_type, ev.entity_id), []).append(ev)
+    full: dict[str, tuple] = {}
+    for chain in chains.values():
+        full.update(_replay(chain))
+
+    for ev in pending:
+        before, after = full.get(str(ev.id), (None, None))
+        set_committed_value(ev, "before_snapshot", before)
+        set_committed_value(ev, "after_snapshot", after)
+
+
 # Fields from the element snapshot that are safe to apply back to the ORM model.
 # Excludes server-managed fields (id, board_id, created_at, updated_at).
 _SNAPSHOT_FIELDS = frozenset({
     "swimlane_id", "step_id", "type", "name", "notes", "owner", "status", "meta",
 })
+# Same for connector snapshots.
+_CONNECTOR_FIELDS = (
+    "source_step_id", "source_element_id", "target_step_id", "target_element_id",
+    "tier", "connector_type", "label", "notes", "waypoints",
+)
 
 
 async def restore_element(
@@ -150,6 +437,7 @@ async def restore_element(
             select(Element).where(Element.id == entity_id, Element.board_id == board_id)
         )
         el = existing_res.scalar_one_or_none()
+        before_snap = _element_snapshot(el) if el else None
         if el:
             for k, v in field_vals.items():
                 setattr(el, k, v)
@@ -172,26 +460,22 @@ async def restore_element(
                 "Element not found — it may have been deleted. "
                 "To bring it back, restore the delete event instead.",
             )
+        before_snap = _element_snapshot(el)
         for k, v in field_vals.items():
             setattr(el, k, v)
 
     el.updated_by_user_id = actor_user_id
     el.updated_by_actor = "restore"
 
-    await db.commit()
-    await db.refresh(el)
+    await db.flush()  # INSERT/UPDATE … RETURNING refreshes timestamps
 
     snap_name = snap.get("name", entity_id)
-    try:
-        after_snap = _element_snapshot(el)
-        await record_change_event(
-            db, board_id, actor_user_id, "restore",
-            "element", entity_id, "restore", None, after_snap,
-            commit_message=f"Restored element '{snap_name}'",
-        )
-        await db.commit()
-    except Exception as exc:
-        log.warning("history restore event failed for element %s: %s", entity_id, exc)
+    await record_change_event(
+        db, board_id, actor_user_id, "restore",
+        "element", entity_id, "restore", before_snap, _element_snapshot(el),
+        commit_message=f"Restored element '{snap_name}'",
+    )
+    await db.commit()
 
     return el, warnings
 
@@ -201,18 +485,16 @@ async def list_commits(
     board_id: str,
     limit: int = 50,
     offset: int = 0,
-) -> list[tuple]:
-    """Return (Commit, event_count) tuples in reverse chronological order."""
+) -> list[Commit]:
+    """Commits in reverse chronological order (ix_commits_board_created)."""
     result = await db.execute(
-        select(Commit, func.count(ChangeEvent.id).label("event_count"))
-        .outerjoin(ChangeEvent, ChangeEvent.commit_id == Commit.id)
+        select(Commit)
         .where(Commit.board_id == board_id)
-        .group_by(Commit.id)
         .order_by(Commit.created_at.desc())
         .limit(limit)
         .offset(offset)
     )
-    return result.all()
+    return result.scalars().all()
 
 
 async def group_events_into_commit(
@@ -224,7 +506,8 @@ async def group_events_into_commit(
 ) -> Commit:
     """Create a commit and link the given ungrouped events to it (e-5)."""
     c = await create_commit(db, board_id, actor_user_id, "user", message)
-    await db.execute(
+    await db.flush()  # the commit row must exist before events point at it
+    result = await db.execute(
         sql_update(ChangeEvent)
         .where(
             ChangeEvent.board_id == board_id,
@@ -233,4 +516,5 @@ async def group_events_into_commit(
         )
         .values(commit_id=str(c.id))
     )
+    c.event_count = result.rowcount
     return c
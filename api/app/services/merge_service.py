@@ -0,0 +1,442 @@
+"""
+Merge service — three-way merge of a copy-on-write branch back into main.
+
+  base   = main at the branch point (the branch's base checkpoint, else board_at(created_at))
+  ours   = main now
+  theirs = the branch: its element/connector overlay rows, and its state_snapshot for
+           swimlanes/steps
+
+A change made on one side only is taken. The same field changed to different values on
+both sides, or a delete on one side against an edit on the other, is a conflict.
+Conflicting rows stay on the branch. Everything else is applied to main with set-based
+statements in one transaction and one commit, and the applied overlay rows are dropped
+from the branch.
+
+After a merge the branch is rebased: its merge base becomes a checkpoint of main as
+merged, and its swimlanes/steps become main's, except for conflicting items, which keep
+the branch's version and (in Branch.conflict_base) their old base, so they are reported
+again until resolved while everything already merged is not.
+"""
+import logging
+from typing import Any, Optional
+from sqlalchemy import select, update, delete as sql_delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+
+from app.models import Board, BoardCheckpoint, Branch, Connector, Element
+from app.services.checkpoint_service import board_at, create_checkpoint
+from app.services.history_service import (
+    create_commit, record_change_event,
+    _CONNECTOR_FIELDS, _SNAPSHOT_FIELDS, _connector_snapshot, _element_snapshot,
+)
+
+log = logging.getLogger(__name__)
+
+_FIELDS = tuple(sorted(_SNAPSHOT_FIELDS))
+_STATE_KEYS = ("swimlanes", "steps")
+
+
+async def merge_branch(
+    db: AsyncSession,
+    board: Board,
+    branch_id: str,
+    user_id: Optional[str],
+    dry_run: bool = False,
+) -> dict[str, Any]:
+    """Merge plan (dry_run) or plan + applied commit. Commits unless dry_run."""
+    board_id = str(board.id)
+    branch = (await db.execute(
+        select(Branch).where(Branch.id == branch_id, Branch.board_id == board_id)
+    )).scalar_one_or_none()
+    if not branch:
+        raise HTTPException(404, "Branch not found")
+    if branch.is_default:
+        raise HTTPException(422, "Cannot merge the default branch into itself")
+    if not branch.copy_on_write:
+        raise HTTPException(422, "This branch predates copy-on-write branches and cannot be merged")
+
+    base_state, base_els, base_conns = await _merge_base(db, board, branch)
+    main_rows = {str(e.id): e for e in (await db.execute(
+        select(Element).where(Element.board_id == board_id, Element.branch_id.is_(None))
+    )).scalars().all()}
+    branch_rows = (await db.execute(
+        select(Element).where(Element.board_id == board_id, Element.branch_id == branch_id)
+    )).scalars().all()
+
+    conflicts: list[dict] = []
+    plan: dict[str, Any] = {"elements": {"add": [], "update": [], "delete": []}}
+    el_updates: dict[str, dict] = {}
+    el_deletes: list[str] = []
+    el_adds: list[Element] = []
+    consumed: list[str] = []   # overlay rows folded into main
+    consumed_conns: list[str] = []
+
+    for row in branch_rows:
+        if row.base_element_id is None:
+            if not row.is_tombstone:
+                el_adds.append(row)
+                plan["elements"]["add"].append({"id": str(row.id), "name": row.name})
+            continue
+
+        eid = str(row.base_element_id)
+        ours = main_rows.get(eid)
+        ours_f = _fields(ours) if ours else None
+        # An element created on main after the branch point has no base; main as it is
+        # now stands in for it.
+        base_f = {f: base_els[eid].get(f) for f in _FIELDS} if eid in base_els else ours_f
+
+        if row.is_tombstone:
+            if ours is None:
+                consumed.append(str(row.id))        # deleted on both sides
+            elif ours_f == base_f:
+                el_deletes.append(eid)
+                consumed.append(str(row.id))
+                plan["elements"]["delete"].append({"id": eid, "name": ours.name})
+            else:
+                conflicts.append(_conflict("elements", eid, ours.name, "deleted on branch, changed on main"))
+            continue
+
+        if ours is None:
+            conflicts.append(_conflict("elements", eid, row.name, "changed on branch, deleted on main"))
+            continue
+        theirs_f = _fields(row)
+        pending, clash = _three_way(base_f, ours_f, theirs_f)
+        if clash:
+            conflicts.append(_conflict("elements", eid, ours.name, "changed on both sides", clash))
+            continue
+        if pending:
+            el_updates[eid] = pending
+            plan["elements"]["update"].append({
+                "id": eid, "name": ours.name,
+                "fields": {f: {"from": ours_f[f], "to": v} for f, v in pending.items()},
+            })
+        consumed.append(str(row.id))
+
+    # Connectors: element endpoints hold main or branch-only ids, so a connector can land
+    # on main only if each of its elements still exists there once the above is applied.
+    landing = (set(main_rows) - set(el_deletes)) | {str(r.id) for r in el_adds}
+    main_conns = {str(c.id): c for c in (await db.execute(
+        select(Connector).where(Connector.board_id == board_id, Connector.branch_id.is_(None))
+    )).scalars().all()}
+    branch_conns = (await db.execute(
+        select(Connector).where(Connector.board_id == board_id, Connector.branch_id == branch_id)
+    )).scalars().all()
+    plan["connectors"] = {"add": [], "update": [], "delete": []}
+    conn_updates: dict[str, dict] = {}
+    conn_deletes: list[str] = []
+    conn_adds: list[Connector] = []
+
+    for row in branch_conns:
+        label = row.label or row.connector_type
+        if row.base_connector_id is None:
+            if row.is_tombstone:
+                continue
+            if any(e and e not in landing for e in (row.source_element_id, row.target_element_id)):
+                conflicts.append(_conflict("connectors", str(row.id), label, "endpoint element not on main"))
+                continue
+            conn_adds.append(row)
+            plan["connectors"]["add"].append({"id": str(row.id), "name": label})
+            continue
+
+        cid = str(row.base_connector_id)
+        ours = main_conns.get(cid)
+        if ours is not None and any(
+            e in el_deletes for e in (ours.source_element_id, ours.target_element_id)
+        ):
+            # The branch deleted an endpoint element; the connector goes with it.
+            consumed_conns.append(str(row.id))
+            continue
+        ours_f = _conn_fields(ours) if ours else None
+        base_f = {f: base_conns[cid].get(f) for f in _CONNECTOR_FIELDS} if cid in base_conns else ours_f
+
+        if row.is_tombstone:
+            if ours is None:
+                consumed_conns.append(str(row.id))
+            elif ours_f == base_f:
+                conn_deletes.append(cid)
+                consumed_conns.append(str(row.id))
+                plan["connectors"]["delete"].append({"id": cid, "name": label})
+            else:
+                conflicts.append(_conflict("connectors", cid, label, "deleted on branch, changed on main"))
+            continue
+
+        if ours is None:
+            conflicts.append(_conflict("connectors", cid, label, "changed on branch, deleted on main"))
+            continue
+        pending, clash = _three_way(base_f, ours_f, _conn_fields(row))
+        if clash:
+            conflicts.append(_conflict("connectors", cid, label, "changed on both sides", clash))
+            continue
+        if pending:
+            conn_updates[cid] = pending
+            plan["connectors"]["update"].append({
+                "id": cid, "name": label,
+                "fields": {f: {"from": ours_f[f], "to": v} for f, v in pending.items()},
+            })
+        consumed_conns.append(str(row.id))
+
+    theirs_state = branch.state_snapshot or {}
+    merged_state = dict(board.state or {})
+    for key in _STATE_KEYS:
+        base_items = base_state.get(key, [])
+        merged, changes, clashes = _merge_items(
+            key, base_items, merged_state.get(key, []), theirs_state.get(key, base_items),
+        )
+        merged_state[key] = merged
+        plan[key] = changes
+        conflicts.extend(clashes)
+    plan["conflicts"] = conflicts
+
+    state_changed = merged_state != (board.state or {})
+    if dry_run or not (
+        el_updates or el_deletes or el_adds or consumed or state_changed
+        or conn_updates or conn_deletes or conn_adds or consumed_conns
+    ):
+        return {"dry_run": dry_run, "commit_id": None, **plan}
+
+    commit = await create_commit(db, board_id, user_id, "user", f"Merge branch '{branch.name}'")
+    commit_id = str(commit.id)
+
+    if state_changed:
+        from app.services.board_service import _audit
+        _audit(db, board_id, user_id, "board.update", "board", board_id,
+               diff={"before": board.state, "after": merged_state})
+        board.state = merged_state
+        board.version += 1
+
+    before = {eid: _element_snapshot(main_rows[eid]) for eid in [*el_updates, *el_deletes]}
+    before.update({str(r.id): _element_snapshot(r) for r in el_adds})
+    conn_before = {cid: _connector_snapshot(main_conns[cid]) for cid in [*conn_updates, *conn_deletes]}
+    conn_before.update({str(c.id): _connector_snapshot(c) for c in conn_adds})
+
+    if consumed_conns:
+        await db.execute(sql_delete(Connector).where(Connector.id.in_(consumed_conns)))
+    if conn_deletes:
+        await db.execute(sql_delete(Connector).where(Connector.id.in_(conn_deletes)))
+    if consumed:
+        await db.execute(sql_delete(Element).where(Element.id.in_(consumed)))
+    if el_deletes:
+        from app.services.connector_service import delete_connectors_for_elements
+        await delete_connectors_for_elements(
+            db, board_id, el_deletes, actor_user_id=user_id, commit_id=commit_id,
+        )
+        await db.flush()
+        await db.execute(sql_delete(Element).where(Element.id.in_(el_deletes)))
+    if el_updates:
+        await db.execute(update(Element), [
+            {"id": eid, **vals, "updated_by_user_id": user_id, "updated_by_actor": "user"}
+            for eid, vals in el_updates.items()
+        ])
+    if el_adds:
+        await db.execute(
+            update(Element)
+            .where(Element.id.in_([str(r.id) for r in el_adds]))
+            .values(branch_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    if conn_updates:
+        await db.execute(update(Connector), [
+            {"id": cid, **vals, "updated_by_user_id": user_id, "updated_by_actor": "user"}
+            for cid, vals in conn_updates.items()
+        ])
+    if conn_adds:
+        await db.execute(
+            update(Connector)
+            .where(Connector.id.in_([str(c.id) for c in conn_adds]))
+            .values(branch_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    touched = [*el_updates, *(str(r.id) for r in el_adds)]
+    after: dict[str, Element] = {}
+    if touched:
+        rows = await db.execute(
+            select(Element).where(Element.id.in_(touched)).execution_options(populate_existing=True)
+        )
+        after = {str(e.id): e for e in rows.scalars().all()}
+
+    from app.services.element_service import _sync_capabilities_bulk
+    await _sync_capabilities_bulk(
+        db, board_id,
+        [el for el in after.values() if el.type == "ai_capability"],
+        {eid for eid in [*el_deletes, *after] if before[eid].get("type") == "ai_capability"
+         and (eid not in after or after[eid].type != "ai_capability")},
+    )
+
+    for eid, el in after.items():
+        await record_change_event(
+            db, board_id, user_id, "user", "element", eid, "update",
+            before[eid], _element_snapshot(el), commit_id=commit_id,
+        )
+    for eid in el_deletes:
+        await record_change_event(
+            db, board_id, user_id, "user", "element", eid, "delete",
+            before[eid], None, commit_id=commit_id,
+        )
+
+    conn_touched = [*conn_updates, *(str(c.id) for c in conn_adds)]
+    if conn_touched:
+        rows = await db.execute(
+            select(Connector).where(Connector.id.in_(conn_touched)).execution_options(populate_existing=True)
+        )
+        for c in rows.scalars().all():
+            await record_change_event(
+                db, board_id, user_id, "user", "connector", str(c.id), "update",
+                conn_before[str(c.id)], _connector_snapshot(c), commit_id=commit_id,
+            )
+    for cid in conn_deletes:
+        await record_change_event(
+            db, board_id, user_id, "user", "connector", cid, "delete",
+            conn_before[cid], None, commit_id=commit_id,
+        )
+
+    await _rebase_branch(db, board, branch, theirs_state, conflicts, base_state, base_els, base_conns)
+    await db.commit()
+    return {"dry_run": False, "commit_id": commit_id, **plan}
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+async def _merge_base(
+    db: AsyncSession, board: Board, branch: Branch,
+) -> tuple[dict, dict[str, dict], dict[str, dict]]:
+    """
+    (state, {element_id: snapshot}, {connector_id: snapshot}) of main at the branch
+    point or last merge, with the older base of still-conflicting items laid over it.
+    """
+    cp = await db.get(BoardCheckpoint, branch.base_checkpoint_id) if branch.base_checkpoint_id else None
+    if cp is not None:
+        state, elements, connectors = cp.state or {}, cp.elements or [], cp.connectors or []
+    else:
+        at = await board_at(db, board, ts=branch.created_at)
+        state, elements, connectors = at["state"], at["elements"], at["connectors"]
+    sections = {
+        "elements":   {e["id"]: e for e in elements},
+        "connectors": {c["id"]: c for c in connectors},
+        **{key: _by_id(state.get(key, [])) for key in _STATE_KEYS},
+    }
+    for section, items in (branch.conflict_base or {}).items():
+        for iid, snap in items.items():
+            if snap is None:
+                sections[section].pop(iid, None)
+            else:
+                sections[section][iid] = snap
+    state = {**state, **{key: list(sections[key].values()) for key in _STATE_KEYS}}
+    return state, sections["elements"], sections["connectors"]
+
+
+async def _rebase_branch(
+    db: AsyncSession,
+    board: Board,
+    branch: Branch,
+    theirs_state: dict,
+    conflicts: list[dict],
+    base_state: dict,
+    base_els: dict[str, dict],
+    base_conns: dict[str, dict],
+) -> None:
+    """Move the branch's merge base to main as merged; conflicting items stay as they were."""
+    await db.flush()
+    branch.base_checkpoint_id = str((await create_checkpoint(db, board)).id)
+
+    old_base = {
+        "elements": base_els, "connectors": base_conns,
+        **{key: _by_id(base_state.get(key, [])) for key in _STATE_KEYS},
+    }
+    kept: dict[str, dict] = {}
+    for c in conflicts:
+        kept.setdefault(c["section"], {})[c["id"]] = old_base[c["section"]].get(c["id"])
+    branch.conflict_base = kept or None
+
+    snapshot = dict(theirs_state)
+    for key in _STATE_KEYS:
+        theirs = _by_id(theirs_state.get(key, base_state.get(key, [])))
+        clashing = kept.get(key, {})
+        items = [
+            theirs.get(str(item["id"])) if str(item.get("id")) in clashing else item
+            for item in (board.state or {}).get(key, []) if isinstance(item, dict)
+        ]
+        main_ids = {str(i.get("id")) for i in items if i}
+        items += [t for iid, t in theirs.items() if iid in clashing and iid not in main_ids]
+        snapshot[key] = [i for i in items if i]
+    branch.state_snapshot = snapshot
+
+
+def _by_id(items: list) -> dict[str, dict]:
+    return {str(i["id"]): i for i in items if isinstance(i, dict) and "id" in i}
+
+
+def _fields(el: Element) -> dict[str, Any]:
+    return {f: getattr(el, f) for f in _FIELDS}
+
+
+def _conn_fields(c: Connector) -> dict[str, Any]:
+    return {f: getattr(c, f) for f in _CONNECTOR_FIELDS}
+
+
+def _three_way(base: dict, ours: dict, theirs: dict) -> tuple[dict, dict]:
+    """(fields to write to main, {field: base/main/branch} for fields changed on both sides)."""
+    changed = {f: v for f, v in theirs.items() if v != base[f]}
+    clash = {
+        f: {"base": base[f], "main": ours[f], "branch": theirs[f]}
+        for f in changed if ours[f] != base[f] and ours[f] != theirs[f]
+    }
+    return {f: v for f, v in changed.items() if ours[f] != v}, clash
+
+
+def _conflict(section: str, id_: str, name: Optional[str], reason: str, fields: Optional[dict] = None) -> dict:
+    return {"section": section, "id": id_, "name": name, "reason": reason, "fields": fields or {}}
+
+
+def _merge_items(
+    section: str, base: list, ours: list, theirs: list,
+) -> tuple[list, dict[str, list], list[dict]]:
+    """Three-way merge of a swimlane/step array by item id; main's order is kept."""
+    base_m, ours_m, theirs_m = _by_id(base), _by_id(ours), _by_id(theirs)
+    changes: dict[str, list] = {"add": [], "update": [], "delete": []}
+    conflicts: list[dict] = []
+    merged = []
+
+    for item in ours:
+        iid = str(item["id"]) if isinstance(item, dict) and "id" in item else None
+        b, t = base_m.get(iid), theirs_m.get(iid)
+        if iid is None or b is None or t == b or t == item:
+            merged.append(item)
+        elif t is None:
+            if item == b:
+                changes["delete"].append({"id": iid, "name": item.get("name")})
+            else:
+                conflicts.append(_conflict(section, iid, item.get("name"), "deleted on branch, changed on main"))
+                merged.append(item)
+        elif item == b:
+            merged.append(t)
+            changes["update"].append({"id": iid, "name": t.get("name")})
+        else:
+            keys = set(b) | set(item) | set(t)
+            clash = [k for k in keys if item.get(k) != b.get(k) != t.get(k) and item.get(k) != t.get(k)]
+            if clash:
+                conflicts.append(_conflict(
+                    section, iid, item.get("name"), "changed on both sides",
+                    {k: {"base": b.get(k), "main": item.get(k), "branch": t.get(k)} for k in clash},
+                ))
+                merged.append(item)
+            else:
+                combined = dict(item)
+                for k in keys:
+                    if t.get(k) != b.get(k):
+                        if k in t:
+                            combined[k] = t[k]
+                        else:
+                            combined.pop(k, None)
+                merged.append(combined)
+                changes["update"].append({"id": iid, "name": combined.get("name")})
+
+    for iid, t in theirs_m.items():
+        if iid in base_m:
+            if iid not in ours_m and t != base_m[iid]:
+                conflicts.append(_conflict(section, iid, t.get("name"), "changed on branch, deleted on main"))
+        elif iid not in ours_m:
+            merged.append(t)
+            changes["add"].append({"id": iid, "name": t.get("name")})
+    return merged, changes, conflicts
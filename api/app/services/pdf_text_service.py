@@ -0,0 +1,159 @@
+"""
+PDF text service — local text extraction for PDF chat attachments (optional).
+
+When pypdf is installed, attached PDFs reach the model as extracted text instead of as
+files the provider renders and bills page by page. Each page is extracted in layout
+mode, which keeps table columns apart, together with the document outline. Once a
+document is larger than settings.pdf_text_token_budget, only the pages most relevant to
+the user's message are sent, in page order, and the header lists which ones.
+
+Extractions are cached per upload id (per process). PDFs without a usable text layer
+(scans) yield None and are sent as files, as are all PDFs when pypdf is missing.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import re
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+try:
+    import pypdf
+except ImportError:  # optional dependency — PDFs are then sent to the model as files
+    pypdf = None  # type: ignore[assignment]
+
+from app.config import get_settings
+from app.services.text_stats import estimate_tokens, query_terms
+
+log = logging.getLogger(__name__)
+
+_CACHE_ENTRIES      = 64
+_MIN_CHARS_PER_PAGE = 40     # below this on average the PDF is treated as a scan
+_OUTLINE_LIMIT      = 200
+
+# upload id -> extraction (None: no text layer), least recently used first.
+_cache: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+
+
+def available() -> bool:
+    return pypdf is not None and get_settings().pdf_text_extraction
+
+
+def is_cached(upload_id: str) -> bool:
+    """Whether extract() would answer without fetching the PDF."""
+    return upload_id in _cache
+
+
+async def extract(upload_id: str, fetch: Callable[[], Awaitable[bytes]]) -> Optional[dict]:
+    """
+    {"pages": [text, ...], "outline": [{"title", "page", "depth"}]} for the upload, or
+    None when it has no text layer. `fetch` supplies the PDF bytes on a cache miss.
+    """
+    if upload_id in _cache:
+        _cache.move_to_end(upload_id)
+        return _cache[upload_id]
+    data = await fetch()
+    try:
+        doc = await asyncio.to_thread(_read_pdf, data)
+    except Exception as exc:
+        log.info("PDF text extraction failed for upload %s: %s", upload_id, exc)
+        doc = None
+    _cache[upload_id] = doc
+    while len(_cache) > _CACHE_ENTRIES:
+        _cache.popitem(last=False)
+    return doc
+
+
+def render(doc: dict, filename: str, query: str, token_budget: int) -> str:
+    """The document as prompt text: outline, then the pages that fit `token_budget`."""
+    pages = doc["pages"]
+    costs = [estimate_tokens(p) for p in pages]
+    chosen = list(range(len(pages)))
+    if sum(costs) > token_budget:
+        terms = query_terms(query)
+        titles: dict[int, str] = {}
+        for o in doc["outline"]:
+            if o["page"]:
+                titles[o["page"] - 1] = titles.get(o["page"] - 1, "") + " " + o["title"]
+        score = [
+            len(terms & query_terms(p)) + 2 * len(terms & query_terms(titles.get(i, "")))
+            for i, p in enumerate(pages)
+        ]
+        used, picked = 0, []
+        for i in sorted(range(len(pages)), key=lambda i: (-score[i], i)):
+            if used + costs[i] <= token_budget:
+                picked.append(i)
+                used += costs[i]
+        chosen = sorted(picked)
+
+    header = f"[Attached PDF: {filename} — {len(pages)} pages, text extracted locally"
+    if len(chosen) < len(pages):
+        header += f"; showing pages {_page_ranges(chosen) or 'none'} (most relevant to the question)"
+    lines = [header + "]"]
+    if doc["outline"]:
+        lines.append("Outline:")
+        lines += [
+            f"{'  ' * o['depth']}- {o['title']}" + (f" (p. {o['page']})" if o["page"] else "")
+            for o in doc["outline"]
+        ]
+    for i in chosen:
+        lines.append(f"\n--- Page {i + 1} ---\n{pages[i]}")
+    return "\n".join(lines)
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _read_pdf(data: bytes) -> Optional[dict]:
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text(extraction_mode="layout")
+        except TypeError:   # pypdf < 3.17 has no layout mode
+            text = page.extract_text()
+        pages.append(_squeeze(text or ""))
+    if not pages or sum(len(p) for p in pages) < _MIN_CHARS_PER_PAGE * len(pages):
+        return None
+    return {"pages": pages, "outline": _outline(reader)}
+
+
+def _squeeze(text: str) -> str:
+    """Layout mode pads with spaces: keep column breaks (two spaces), drop the padding."""
+    lines = [re.sub(r" {2,}", "  ", line).rstrip() for line in text.splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _outline(reader) -> list[dict]:
+    out: list[dict] = []
+
+    def walk(items, depth: int) -> None:
+        for item in items:
+            if len(out) >= _OUTLINE_LIMIT:
+                return
+            if isinstance(item, list):
+                walk(item, depth + 1)
+                continue
+            try:
+                page: Optional[int] = reader.get_destination_page_number(item) + 1
+            except Exception:
+                page = None
+            out.append({"title": str(item.title), "page": page, "depth": depth})
+
+    try:
+        walk(reader.outline, 0)
+    except Exception as exc:
+        log.debug("PDF outline unreadable: %s", exc)
+    return out
+
+
+def _page_ranges(pages: list[int]) -> str:
+    """[0, 1, 2, 6] -> "1-3, 7" (1-based)."""
+    spans: list[list[int]] = []
+    for p in pages:
+        if spans and p == spans[-1][1] + 1:
+            spans[-1][1] = p
+        else:
+            spans.append([p, p])
+    return ", ".join(f"{a + 1}-{b + 1}" if a != b else f"{a + 1}" for a, b in spans)
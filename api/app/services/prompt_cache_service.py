@@ -0,0 +1,82 @@
+"""
+Prompt cache service — provider-side caching of the agent's system prompt.
+
+The system prompt (static instructions + board context) is the same for every turn on
+a board until the board changes, so it is registered once as Gemini cached content and
+later turns — from any user — reference it by name instead of resending it.
+
+Entries are keyed by prompt variant — board, plus branch and agent role when set — and a
+digest of the prompt text. Any board mutation changes the digest: the next turn registers
+a fresh cache and deletes the variant's previous one.
+When the model or key does not support caching, or the prompt is below the provider's
+minimum cacheable size, the caller sends the prompt inline and that digest is not tried
+again until it changes.
+
+The registry is per process (on serverless, per warm instance); expired or evicted
+caches are recreated on demand.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Optional
+
+from app.config import get_settings
+
+log = logging.getLogger(__name__)
+
+# variant key -> (prompt digest, cache name or None when caching failed, monotonic expiry);
+# a failed attempt is not retried for the same prompt until the entry expires.
+_registry: dict[str, tuple[str, Optional[str], float]] = {}
+_locks: dict[str, asyncio.Lock] = {}
+_EXPIRY_MARGIN = 60   # stop handing out a cache this many seconds before the provider drops it
+
+
+async def cached_prompt(client, types, key: str, system: str) -> Optional[str]:
+    """
+    Name of the cached content holding `system` for prompt variant `key`, creating it if
+    needed; None means send the prompt inline. Never raises.
+    """
+    ttl = get_settings().gemini_prompt_cache_ttl_seconds
+    if ttl <= 0:
+        return None
+    digest = hashlib.blake2b(system.encode(), digest_size=16).hexdigest()
+
+    async with _locks.setdefault(key, asyncio.Lock()):
+        entry = _registry.get(key)
+        if entry and entry[0] == digest and entry[2] > time.monotonic():
+            return entry[1]
+
+        stale = entry[1] if entry and entry[0] != digest else None
+        name: Optional[str] = None
+        try:
+            cache = await client.aio.caches.create(
+                model=get_settings().gemini_model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system,
+                    display_name=f"bp-{key}-{digest[:12]}"[:128],
+                    ttl=f"{ttl}s",
+                ),
+            )
+            name = cache.name
+        except Exception as exc:
+            log.info("prompt cache unavailable (%s): %s", key, exc)
+        _registry[key] = (digest, name, time.monotonic() + ttl - _EXPIRY_MARGIN)
+
+    if stale:
+        await _delete(client, stale)
+    return name
+
+
+async def drop(client, key: str) -> None:
+    """Forget (and delete) a variant's cache, e.g. after the provider rejected it."""
+    entry = _registry.pop(key, None)
+    if entry and entry[1]:
+        await _delete(client, entry[1])
+
+
+async def _delete(client, name: str) -> None:
+    try:
+        await client.aio.caches.delete(name=name)
+    except Exception as exc:
+        log.debug("prompt cache delete skipped (%s): %s", name, exc)
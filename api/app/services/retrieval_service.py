@@ -0,0 +1,185 @@
+"""
+Retrieval service — an offline similarity index over board content for the agent.
+
+Elements, connectors, governance decisions and chunks of uploaded PDFs are embedded with
+feature hashing (words and word pairs into _DIM buckets, sublinear tf, L2-normalised)
+and queries are weighted by the board's inverse document frequencies, so no model,
+network call or vocabulary is needed.
+
+Vectors are sparse dicts scored in pure Python rather than a NumPy matrix. A row's text
+hashes to a few dozen non-zero buckets, so scoring a query against a few thousand rows
+is tens of thousands of multiply-adds: milliseconds, next to a model call of seconds.
+That keeps the API free of a NumPy dependency (and its wheel size on serverless) it
+would need only here, and leaves one scoring path that the tests cover.
+
+Indexes live per process, one per board view (main or a branch). They are synced at
+search time rather than from element, connector and upload writes: a write lands in
+one process (or serverless instance) while the next question may be answered by
+another, so write hooks would leave the other indexes stale. Each search passes the
+rows the agent context has already loaded; comparing them with the index is a dict
+lookup and string compare per row, and only rows that are new or whose text changed
+are re-embedded.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Upload
+
+log = logging.getLogger(__name__)
+
+_DIM            = 512
+_MAX_INDEXES    = 16     # board views kept in memory (least recently used dropped)
+_MIN_SCORE      = 0.05
+_CHUNK_WORDS    = 160
+_UPLOAD_LIMIT   = 20     # most recent PDFs per board that are chunked
+_EXTRACT_LIMIT  = 1      # PDFs not yet extracted in this process that one search may parse
+_WORD_RE        = re.compile(r"[a-z0-9]+")
+
+# index key -> {"docs": {doc key: (text, sparse vector, payload)},
+#               "df": per-bucket document frequency}
+_indexes: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+
+
+def search(
+    index_key: str, docs: list[tuple[str, str, dict]], query: str, k: int = 12,
+) -> list[dict]:
+    """
+    Sync index `index_key` to `docs` — (doc key, text, payload) — and return the top `k`
+    payloads for `query` as {"key", "score", "payload"}, best first.
+    """
+    index = _sync(index_key, docs)
+    q = _query_vector(index, query)
+    if not q or not index["docs"]:
+        return []
+
+    ranked = heapq.nlargest(k, (
+        (sum(v * vec.get(i, 0.0) for i, v in q.items()), key)
+        for key, (_, vec, _) in index["docs"].items()
+    ))
+    return [
+        {"key": key, "score": round(score, 4), "payload": index["docs"][key][2]}
+        for score, key in ranked if score >= _MIN_SCORE
+    ]
+
+
+async def upload_docs(db: AsyncSession, board_id: str) -> list[tuple[str, str, dict]]:
+    """
+    Chunks of the board's recent PDF uploads as search docs. Needs pdf_text_service
+    (pypdf). Only PDFs already extracted in this process (attached to a chat, or
+    indexed by an earlier search) are used, plus at most _EXTRACT_LIMIT new ones, so a
+    cold instance does not fetch and parse every upload before answering.
+    """
+    from app.services import pdf_text_service
+    from app.services.upload_service import download_bytes
+
+    if not pdf_text_service.available():
+        return []
+    uploads = (await db.execute(
+        select(Upload)
+        .where(Upload.board_id == board_id, Upload.content_type == "application/pdf")
+        .order_by(Upload.created_at.desc())
+        .limit(_UPLOAD_LIMIT)
+    )).scalars().all()
+
+    fresh = [up for up in uploads if not pdf_text_service.is_cached(str(up.id))][:_EXTRACT_LIMIT]
+    uploads = [up for up in uploads if pdf_text_service.is_cached(str(up.id))] + fresh
+
+    async def load(up: Upload) -> Optional[dict]:
+        return await pdf_text_service.extract(str(up.id), lambda: download_bytes(up.storage_path))
+
+    extracted = await asyncio.gather(*(load(up) for up in uploads), return_exceptions=True)
+    docs = []
+    for up, doc in zip(uploads, extracted):
+        if isinstance(doc, BaseException) or not doc:
+            continue
+        for page_no, page in enumerate(doc["pages"], start=1):
+            for n, chunk in enumerate(_chunks(page)):
+                docs.append((f"upload:{up.id}:{page_no}:{n}", f"{up.filename} {chunk}", {
+                    "kind":      "document",
+                    "upload_id": str(up.id),
+                    "filename":  up.filename,
+                    "page":      page_no,
+                    "text":      chunk,
+                }))
+    return docs
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+def _sync(index_key: str, docs: list[tuple[str, str, dict]]) -> dict[str, Any]:
+    index = _indexes.get(index_key)
+    if index is None:
+        index = {"docs": {}, "df": [0] * _DIM}
+        _indexes[index_key] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    _indexes.move_to_end(index_key)
+
+    current = {key: (text, payload) for key, text, payload in docs}
+    for key in [k for k in index["docs"] if k not in current]:
+        _remove(index, key)
+    for key, (text, payload) in current.items():
+        entry = index["docs"].get(key)
+        if entry and entry[0] == text:
+            index["docs"][key] = (entry[0], entry[1], payload)
+            continue
+        if entry:
+            _remove(index, key)
+        _add(index, key, text, payload)
+    return index
+
+
+def _add(index: dict[str, Any], key: str, text: str, payload: dict) -> None:
+    vec = _embed(text)
+    for i in vec:
+        index["df"][i] += 1
+    index["docs"][key] = (text, vec, payload)
+
+
+def _remove(index: dict[str, Any], key: str) -> None:
+    _, vec, _ = index["docs"].pop(key)
+    for i in vec:
+        index["df"][i] -= 1
+
+
+def _features(text: str) -> dict[int, float]:
+    words = [w.rstrip("s") if len(w) > 3 else w for w in _WORD_RE.findall(text.lower())]
+    counts: dict[int, float] = {}
+    for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+        i, sign = h % _DIM, (1.0 if (h >> 40) & 1 else -1.0)
+        counts[i] = counts.get(i, 0.0) + sign
+    return {i: math.copysign(math.log1p(abs(v)), v) for i, v in counts.items() if v}
+
+
+def _normalise(vec: dict[int, float]) -> dict[int, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {i: v / norm for i, v in vec.items()} if norm else {}
+
+
+def _embed(text: str) -> dict[int, float]:
+    return _normalise(_features(text))
+
+
+def _query_vector(index: dict[str, Any], query: str) -> dict[int, float]:
+    n = len(index["docs"])
+    return _normalise({
+        i: v * math.log((1 + n) / (1 + index["df"][i]))
+        for i, v in _features(query).items()
+    })
+
+
+def _chunks(text: str) -> list[str]:
+    words = text.split()
+    return [" ".join(words[i:i + _CHUNK_WORDS]) for i in range(0, len(words), _CHUNK_WORDS)]
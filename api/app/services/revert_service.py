@@ -0,0 +1,274 @@
+"""
+Revert service — undo one commit, or roll the board back to a commit, as a single new commit.
+
+Both operations reduce the change log to one target snapshot per affected entity
+(None = the entity must not exist) and apply the whole set with bulk statements in one
+transaction, instead of one restore_element round-trip per event.
+"""
+import logging
+from typing import Any, Optional
+from sqlalchemy import select, func, and_, or_, insert, update, delete as sql_delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+
+from app.models import Board, ChangeEvent, Commit, Connector, Element
+from app.services.history_service import (
+    create_commit, record_change_event, _CONNECTOR_FIELDS, _SNAPSHOT_FIELDS,
+    _connector_snapshot, _element_snapshot,
+)
+from app.services.checkpoint_service import _edge_events, _edge_state_change
+
+log = logging.getLogger(__name__)
+
+
+async def revert_commit(
+    db: AsyncSession, board: Board, commit_id: str, user_id: Optional[str],
+) -> dict:
+    """Put every element/connector the commit touched back to its state before the commit."""
+    board_id = str(board.id)
+    commit = await _get_commit(db, board_id, commit_id)
+    events = await _edge_events(db, board_id, after=None, upto=None, last=False, commit_id=commit_id)
+    if not events:
+        raise HTTPException(422, "Commit has no element or connector changes to revert")
+
+    targets = {(ev.entity_type, ev.entity_id): ev.before_snapshot for ev in events}
+    warnings = []
+    ids_by_type: dict[str, list[str]] = {}
+    for entity_type, entity_id in targets:
+        ids_by_type.setdefault(entity_type, []).append(entity_id)
+    later = (await db.execute(
+        select(func.count(ChangeEvent.id)).where(
+            ChangeEvent.board_id == board_id,
+            or_(*(
+                and_(ChangeEvent.entity_type == entity_type, ChangeEvent.entity_id.in_(ids))
+                for entity_type, ids in ids_by_type.items()
+            )),
+            ChangeEvent.created_at > commit.created_at,
+        )
+    )).scalar_one()
+    if later:
+        warnings.append("modified_after_commit")
+
+    return await _apply_targets(
+        db, board, targets, board.state or {}, f'Revert "{commit.message}"', user_id, warnings,
+    )
+
+
+async def rollback_to_commit(
+    db: AsyncSession, board: Board, commit_id: str, user_id: Optional[str],
+) -> dict:
+    """Return the board (state, elements, connectors) to how it was right after the commit."""
+    board_id = str(board.id)
+    commit = await _get_commit(db, board_id, commit_id)
+    events = await _edge_events(db, board_id, after=commit.created_at, upto=None, last=False)
+    state_log = await _edge_state_change(db, board_id, after=commit.created_at, upto=None, last=False)
+    if not events and state_log is None:
+        raise HTTPException(422, "Board has not changed since this commit")
+
+    state = board.state or {}
+    if state_log is not None and "before" in (state_log.diff or {}):
+        from app.services.board_service import _audit
+        state = state_log.diff["before"]
+        _audit(db, board_id, user_id, "board.update", "board", board_id,
+               diff={"before": board.state, "after": state})
+        board.state = state
+        board.version += 1
+
+    targets = {(ev.entity_type, ev.entity_id): ev.before_snapshot for ev in events}
+    return await _apply_targets(
+        db, board, targets, state, f'Roll back to "{commit.message}"', user_id, [],
+    )
+
+
+# ── Internal ──────────────────────────────────────────────────────────────────
+
+async def _get_commit(db: AsyncSession, board_id: str, commit_id: str) -> Commit:
+    commit = (await db.execute(
+        select(Commit).where(Commit.id == commit_id, Commit.board_id == board_id)
+    )).scalar_one_or_none()
+    if not commit:
+        raise HTTPException(404, "Commit not found")
+    return commit
+
+
+async def _apply_targets(
+    db: AsyncSession,
+    board: Board,
+    targets: dict[tuple, Optional[dict[str, Any]]],
+    state: dict,
+    message: str,
+    user_id: Optional[str],
+    warnings: list[str],
+) -> dict:
+    board_id = str(board.id)
+    el_targets   = {eid: snap for (kind, eid), snap in targets.items() if kind == "element"}
+    conn_targets = {cid: snap for (kind, cid), snap in targets.items() if kind == "connector"}
+
+    current_els: dict[str, Element] = {}
+    if el_targets:
+        rows = await db.execute(
+            select(Element).where(Element.board_id == board_id, Element.id.in_(el_targets))
+        )
+        current_els = {str(e.id): e for e in rows.scalars().all()}
+    current_conns: dict[str, Connector] = {}
+    if conn_targets:
+        rows = await db.execute(
+            select(Connector).where(Connector.board_id == board_id, Connector.id.in_(conn_targets))
+        )
+        current_conns = {str(c.id): c for c in rows.scalars().all()}
+
+    commit = await create_commit(db, board_id, user_id, "user", message)
+    commit_id = str(commit.id)
+
+    # ── Plan element writes
+    lane_ids = {str(sl["id"]) for sl in state.get("swimlanes", []) if isinstance(sl, dict) and "id" in sl}
+    el_before = {eid: _element_snapshot(el) for eid, el in current_els.items()}
+    el_inserts, el_updates, el_deletes = [], [], []
+    for eid, snap in el_targets.items():
+        if snap is None:
+            if eid in current_els:
+                el_deletes.append(eid)
+            continue
+        vals = {k: snap.get(k) for k in _SNAPSHOT_FIELDS if k in snap}
+        if vals.get("swimlane_id") and vals["swimlane_id"] not in lane_ids:
+            vals["swimlane_id"] = None
+            if "swimlane_not_found" not in warnings:
+                warnings.append("swimlane_not_found")
+        vals.update(updated_by_user_id=user_id, updated_by_actor="restore")
+        if eid in current_els:
+            el_updates.append({"id": eid, **vals})
+        else:
+            el_inserts.append({
+                "id": eid,
+                "board_id": board_id,
+                "branch_id": snap.get("branch_id"),
+                "base_element_id": snap.get("base_element_id"),
+                "created_by_actor": snap.get("created_by_actor") or "user",
+                **vals,
+            })
+
+    # ── Plan connector writes; every endpoint must exist once the element writes land
+    live_el_ids = set(current_els) - set(el_deletes) | {r["id"] for r in el_inserts}
+    referenced = {
+        snap[k] for snap in conn_targets.values() if snap
+        for k in ("source_element_id", "target_element_id") if snap.get(k)
+    } - set(el_targets)
+    if referenced:
+        rows = await db.execute(
+            select(Element.id).where(Element.board_id == board_id, Element.id.in_(referenced))
+        )
+        live_el_ids |= {str(i) for i in rows.scalars().all()}
+
+    conn_before = {cid: _connector_snapshot(c) for cid, c in current_conns.items()}
+    conn_inserts, conn_updates, conn_deletes = [], [], []
+    for cid, snap in conn_targets.items():
+        if snap is not None and not all(k in snap for k in ("tier", "connector_type")):
+            # Connector events written before full snapshots cannot be replayed.
+            if "connector_snapshot_incomplete" not in warnings:
+                warnings.append("connector_snapshot_incomplete")
+            continue
+        if snap is not None and any(
+            snap.get(k) and snap[k] not in live_el_ids for k in ("source_element_id", "target_element_id")
+        ):
+            if "connector_endpoint_missing" not in warnings:
+                warnings.append("connector_endpoint_missing")
+            snap = None
+        if snap is None:
+            if cid in current_conns:
+                conn_deletes.append(cid)
+            continue
+        vals = {k: snap.get(k) for k in _CONNECTOR_FIELDS}
+        vals.update(updated_by_user_id=user_id, updated_by_actor="restore")
+        if cid in current_conns:
+            conn_updates.append({"id": cid, **vals})
+        else:
+            conn_inserts.append({
+                "id": cid,
+                "board_id": board_id,
+                "branch_id": snap.get("branch_id"),
+                "base_connector_id": snap.get("base_connector_id"),
+                "created_by_actor": snap.get("created_by_actor") or "user",
+                **vals,
+            })
+
+    # ── Apply: connectors out, elements, connectors in
+    if conn_deletes:
+        await db.execute(sql_delete(Connector).where(Connector.id.in_(conn_deletes)))
+    if el_deletes:
+        from app.services.connector_service import delete_connectors_for_elements
+        await delete_connectors_for_elements(
+            db, board_id, el_deletes, actor_user_id=user_id, commit_id=commit_id,
+        )
+        await db.flush()
+        await db.execute(sql_delete(Element).where(Element.id.in_(el_deletes)))
+    if el_inserts:
+        await db.execute(insert(Element).values(el_inserts))
+    if el_updates:
+        await db.execute(update(Element), el_updates)
+    if conn_inserts:
+        await db.execute(insert(Connector).values(conn_inserts))
+    if conn_updates:
+        await db.execute(update(Connector), conn_updates)
+
+    restored_els = [r["id"] for r in el_inserts + el_updates]
+    restored_conns = [r["id"] for r in conn_inserts + conn_updates]
+    after_els = {}
+    if restored_els:
+        rows = await db.execute(
+            select(Element).where(Element.id.in_(restored_els)).execution_options(populate_existing=True)
+        )
+        after_els = {str(e.id): e for e in rows.scalars().all()}
+    after_conns = {}
+    if restored_conns:
+        rows = await db.execute(
+            select(Connector).where(Connector.id.in_(restored_conns)).execution_options(populate_existing=True)
+        )
+        after_conns = {str(c.id): c for c in rows.scalars().all()}
+
+    from app.services.element_service import _sync_capabilities_bulk
+    await _sync_capabilities_bulk(
+        db, board_id,
+        [el for el in after_els.values() if el.type == "ai_capability"],
+        {eid for eid in el_deletes if el_before[eid].get("type") == "ai_capability"}
+        | {eid for eid, el in after_els.items()
+           if el.type != "ai_capability" and el_before.get(eid, {}).get("type") == "ai_capability"},
+    )
+
+    for eid, el in after_els.items():
+        await record_change_event(
+            db, board_id, user_id, "restore", "element", eid, "restore",
+            el_before.get(eid), _element_snapshot(el), commit_id=commit_id,
+        )
+    for eid in el_deletes:
+        await record_change_event(
+            db, board_id, user_id, "restore", "element", eid, "delete",
+            el_before[eid], None, commit_id=commit_id,
+        )
+    for cid, c in after_conns.items():
+        await record_change_event(
+            db, board_id, user_id, "restore", "connector", cid, "restore",
+            conn_before.get(cid), _connector_snapshot(c), commit_id=commit_id,
+        )
+    for cid in conn_deletes:
+        await record_change_event(
+            db, board_id, user_id, "restore", "connector", cid, "delete",
+            conn_before[cid], None, commit_id=commit_id,
+        )
+
+    await db.commit()
+
+    if restored_conns or conn_deletes:
+        from app.services.connector_service import _send_broadcast
+        await _send_broadcast(board_id, {
+            "operation": "batch",
+            "created":   [r["id"] for r in conn_inserts],
+            "updated":   [r["id"] for r in conn_updates],
+            "deleted":   conn_deletes,
+        })
+
+    return {
+        "commit_id": commit_id,
+        "restored":  restored_els + restored_conns,
+        "deleted":   el_deletes + conn_deletes,
+        "warnings":  warnings,
+    }
@@ -0,0 +1,25 @@
+"""
+Text stats — local token estimates and query terms, shared by the prompt builders
+(board context in agent_service, PDF page selection in pdf_text_service).
+"""
+import re
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_TERM_RE  = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "the and for with this that what which how are was were has have can could should would "
+    "our your their there from into about board please show tell give list all any more".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate: one per punctuation mark, one per ~4 characters of a word."""
+    return sum((len(t) + 3) // 4 for t in _TOKEN_RE.findall(text))
+
+
+def query_terms(text: str) -> set[str]:
+    """Lower-cased content words (stopwords and words under three letters dropped, plural s stripped)."""
+    return {
+        w.rstrip("s") for w in _TERM_RE.findall((text or "").lower())
+        if len(w) > 2 and w not in _STOPWORDS
+    }
@@ -5,10 +5,12 @@ Uses the Supabase Storage REST API directly via httpx (no supabase-py dep needed
 Flow:
   1. sign_upload   → create DB row + return a signed PUT URL for the browser
   2. get_download_url → generate a short-lived signed download URL
-  3. download_bytes   → fetch raw bytes (called by agent_service before Anthropic)
+  3. download_bytes   → fetch raw bytes (called by agent_service for chat attachments);
+                        kept in a bounded in-process LRU cache keyed by storage_path
   4. delete_upload    → remove from storage + DB
 """
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 
 import httpx
@@ -27,6 +29,11 @@ DAILY_LIMIT   = 50
 MAX_SIZE      = 10 * 1024 * 1024   # 10 MB
 ALLOWED_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/webp"}
 
+# storage_path -> bytes, least recently used first. Paths embed the upload id and objects
+# are never rewritten, so entries only leave by eviction or delete_upload.
+_byte_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_byte_cache_size = 0
+
 
 def _svc_headers() -> dict[str, str]:
     return {
@@ -138,6 +145,10 @@ async def get_download_url(
 
 
 async def download_bytes(storage_path: str) -> bytes:
+    cached = _byte_cache.get(storage_path)
+    if cached is not None:
+        _byte_cache.move_to_end(storage_path)
+        return cached
     _require_storage()
     async with httpx.AsyncClient(timeout=60) as client:
         resp = await client.get(
@@ -146,7 +157,28 @@ async def download_bytes(storage_path: str) -> bytes:
         )
         if resp.status_code != 200:
             raise HTTPException(502, "Failed to fetch attached file from storage.")
-        return resp.content
+    _cache_put(storage_path, resp.content)
+    return resp.content
+
+
+def _cache_put(storage_path: str, data: bytes) -> None:
+    global _byte_cache_size
+    limit = settings.attachment_cache_max_bytes
+    if len(data) > limit:
+        return
+    _cache_evict(storage_path)
+    _byte_cache[storage_path] = data
+    _byte_cache_size += len(data)
+    while _byte_cache_size > limit:
+        _, old = _byte_cache.popitem(last=False)
+        _byte_cache_size -= len(old)
+
+
+def _cache_evict(storage_path: str) -> None:
+    global _byte_cache_size
+    old = _byte_cache.pop(storage_path, None)
+    if old is not None:
+        _byte_cache_size -= len(old)
 
 
 async def delete_upload(
@@ -175,5 +207,6 @@ async def delete_upload(
                 json={"prefixes": [upload.storage_path]},
             )
 
+    _cache_evict(upload.storage_path)
     await db.delete(upload)
     await db.flush()
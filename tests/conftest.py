@@ -58,6 +58,25 @@ async def client(db):
     app.dependency_overrides.clear()
 
 
+@pytest_asyncio.fixture
+async def foreign_keys(db):
+    """Enforce SQLite foreign keys (as Postgres does) on every connection for one test."""
+    from sqlalchemy import event
+
+    def enforce(dbapi_conn, *_):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.close()
+
+    await db.commit()
+    engine = db.bind.sync_engine
+    event.listen(engine, "checkout", enforce)
+    yield
+    await db.close()
+    event.remove(engine, "checkout", enforce)
+    await db.bind.dispose()  # drop the connections that enforce foreign keys
+
+
 @pytest.fixture
 def user_payload():
     return {
@@ -385,4 +385,525 @@ async def test_history_invalid_offset_rejected(client, auth_headers, board):
     r = await client.get(
         f"/api/agent/boards/{board['id']}/history?offset=-1", headers=auth_headers
     )
-    assert r.status_code == 400
\ No newline at end of file
+    assert r.status_code == 400
+
+# -- Streaming (SSE) -------------------------------------------------------------
+
+def _make_stream_client(pieces: list[str], fail_after: int | None = None):
+    async def chunks():
+        for i, piece in enumerate(pieces):
+            if fail_after is not None and i == fail_after:
+                raise _make_server_error(503)
+            chunk = MagicMock()
+            chunk.text = piece
+            chunk.candidates = []
+            chunk.usage_metadata = MagicMock(total_token_count=10 + i)
+            yield chunk
+
+    client = MagicMock()
+    client.aio.models.generate_content_stream = AsyncMock(side_effect=lambda **kw: chunks())
+    return client
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    import json
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_emits_message_deltas_then_done(client, auth_headers, board):
+    pieces = ['```json\n{"message": "Two', ' orphaned\\n', 'elements", "actions": [',
+              '{"type": "delete_element", "payload": {"id": "x"}}]}\n```']
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=_make_stream_client(pieces)):
+        r = await client.post(
+            "/api/agent/chat/stream",
+            json={"board_id": board["id"], "message": "review", "history": []},
+            headers=auth_headers,
+        )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(r.text)
+    assert "".join(d["text"] for e, d in events if e == "delta") == "Two orphaned\nelements"
+    kind, done = events[-1]
+    assert kind == "done"
+    assert done["response"] == "Two orphaned\nelements" and done["token_count"] == 13
+    assert [a["type"] for a in done["actions"]] == ["delete_element"]
+
+    history = (await client.get(f"/api/agent/boards/{board['id']}/history", headers=auth_headers)).json()
+    assert sorted(m["role"] for m in history) == ["assistant", "user"]
+    assert next(m for m in history if m["role"] == "assistant")["id"] == done["message_id"]
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_failure_mid_reply_keeps_partial_turn(client, auth_headers, board):
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client",
+               return_value=_make_stream_client(["Looking at", " the board", "..."], fail_after=2)):
+        r = await client.post(
+            "/api/agent/chat/stream",
+            json={"board_id": board["id"], "message": "review", "history": []},
+            headers=auth_headers,
+        )
+    events = _sse_events(r.text)
+    assert [e for e, _ in events][-1] == "error"
+    assert events[-1][1]["error"]["code"] == "service_unavailable"
+
+    history = (await client.get(f"/api/agent/boards/{board['id']}/history", headers=auth_headers)).json()
+    reply = next(m for m in history if m["role"] == "assistant")
+    assert reply["content"].startswith("Looking at the board")
+    assert reply["content"].endswith("*Response interrupted.*")
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_cached_until_board_changes(client, auth_headers, board):
+    from app.services import prompt_cache_service
+
+    llm = _make_client_mock("ok")
+    names = iter(["cachedContents/one", "cachedContents/two"])
+    llm.aio.caches.create = AsyncMock(side_effect=lambda **kw: _named(next(names)))
+    llm.aio.caches.delete = AsyncMock()
+    body = {"board_id": board["id"], "message": "hi", "history": []}
+
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm), \
+         patch.dict(prompt_cache_service._registry, clear=True):
+        await client.post("/api/agent/chat", json=body, headers=auth_headers)
+        await client.post("/api/agent/chat", json=body, headers=auth_headers)
+        assert llm.aio.caches.create.await_count == 1
+        configs = [c.kwargs["config"] for c in llm.aio.models.generate_content.await_args_list]
+        assert [cfg.cached_content for cfg in configs] == ["cachedContents/one"] * 2
+
+        # A board edit changes the prompt: a new cache replaces the old one.
+        await client.post(f"/api/boards/{board['id']}/elements",
+                          json={"type": "touchpoint", "name": "New"}, headers=auth_headers)
+        await client.post("/api/agent/chat", json=body, headers=auth_headers)
+        assert llm.aio.caches.create.await_count == 2
+        llm.aio.caches.delete.assert_awaited_once_with(name="cachedContents/one")
+        cfg = llm.aio.models.generate_content.await_args.kwargs["config"]
+        assert cfg.cached_content == "cachedContents/two"
+
+
+@pytest.mark.asyncio
+async def test_trimmed_board_context_is_not_cached(client, auth_headers, board):
+    from app.services import agent_service, prompt_cache_service
+
+    for i in range(40):
+        await client.post(f"/api/boards/{board['id']}/elements",
+                          json={"type": "touchpoint", "name": f"Element {i}"}, headers=auth_headers)
+    llm = _make_client_mock("ok")
+    llm.aio.caches.create = AsyncMock(return_value=_named("cachedContents/one"))
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm), \
+         patch.object(agent_service.settings, "agent_context_token_budget", 1200), \
+         patch.dict(prompt_cache_service._registry, clear=True):
+        for question in ("Where is element 3?", "What about element 30?"):
+            await client.post("/api/agent/chat", headers=auth_headers,
+                              json={"board_id": board["id"], "message": question})
+    llm.aio.caches.create.assert_not_awaited()
+    cfg = llm.aio.models.generate_content.await_args.kwargs["config"]
+    assert "cached_content" not in cfg.__dict__ and cfg.system_instruction.startswith("You are")
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_stable_across_questions_with_excerpts(board, db):
+    import uuid
+    from app.models import Element, Upload
+    from app.services import pdf_text_service, retrieval_service
+    from app.services.agent_service import build_board_context, build_system_prompt
+
+    db.add(Element(board_id=board["id"], type="system", name="Case desk"))
+    up = Upload(board_id=board["id"], user_id=str(uuid.uuid4()), filename="policy.pdf",
+                content_type="application/pdf", size_bytes=4, storage_path="boards/x/policy.pdf")
+    db.add(up)
+    await db.commit()
+
+    doc = {"pages": ["Refunds over 500 EUR go to finance.",
+                     "Chargeback disputes must be answered within ten days by the case desk."],
+           "outline": []}
+    prompts = []
+    with patch.dict(retrieval_service._indexes, clear=True), \
+         patch.object(pdf_text_service, "available", return_value=True), \
+         patch.dict(pdf_text_service._cache, {str(up.id): doc}):
+        for question in ("Who answers chargeback disputes?", "Where do refunds go?"):
+            ctx = await build_board_context(db, board["id"], message=question)
+            assert ctx["document_excerpts"]
+            prompts.append(build_system_prompt(ctx))
+    assert prompts[0] == prompts[1]
+
+
+@pytest.mark.asyncio
+async def test_system_prompt_sent_inline_when_caching_unsupported(client, auth_headers, board):
+    from app.services import prompt_cache_service
+
+    llm = _make_client_mock("ok")
+    llm.aio.caches.create = AsyncMock(side_effect=_make_client_error(400, "INVALID_ARGUMENT"))
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm), \
+         patch.dict(prompt_cache_service._registry, clear=True):
+        for _ in range(2):
+            r = await client.post("/api/agent/chat",
+                json={"board_id": board["id"], "message": "hi", "history": []}, headers=auth_headers)
+            assert r.json()["response"] == "ok"
+    assert llm.aio.caches.create.await_count == 1   # not retried for the same prompt
+    cfg = llm.aio.models.generate_content.await_args.kwargs["config"]
+    assert cfg.system_instruction and "cached_content" not in cfg.__dict__
+
+
+def _named(name: str):
+    obj = MagicMock()
+    obj.name = name
+    return obj
+
+
+@pytest.mark.asyncio
+async def test_board_context_fits_token_budget_by_relevance(client, auth_headers, board, db):
+    from app.services.agent_service import build_board_context, build_system_prompt
+
+    for i in range(40):
+        await client.post(f"/api/boards/{board['id']}/elements",
+                          json={"type": "touchpoint", "name": f"Intake form {i}"}, headers=auth_headers)
+    await client.post(f"/api/boards/{board['id']}/elements",
+                      json={"type": "system", "name": "Refund portal"}, headers=auth_headers)
+
+    # Small enough to fit: full fidelity, and the same prompt whatever the question.
+    full = await build_board_context(db, board["id"], message="Where is the refund portal?")
+    assert set(full["context_tokens"]["sections"].values()) == {"full"}
+    assert len(full["unplaced_elements"]) == 41
+    other = await build_board_context(db, board["id"], message="Summarise the board")
+    assert build_system_prompt(full) == build_system_prompt(other)
+
+    budget = full["context_tokens"]["used"] // 3
+    ctx = await build_board_context(db, board["id"], message="Where is the refund portal?",
+                                    token_budget=budget)
+    assert ctx["context_tokens"]["used"] <= budget
+    assert ctx["context_tokens"]["sections"]["unplaced_elements"] == "summary"
+    assert ctx["unplaced_elements_summary"]["total"] == 41
+    assert ctx["unplaced_elements"][0]["name"] == "Refund portal"
+    assert "unplaced_elements are abbreviated" in build_system_prompt(ctx)
+
+
+# -- Server-side conversation memory -------------------------------------------
+
+def _prompt_texts(llm) -> list[str]:
+    contents = llm.aio.models.generate_content.await_args.kwargs["contents"]
+    return [c.parts[0].text for c in contents]
+
+
+@pytest.mark.asyncio
+async def test_chat_history_loaded_from_server_not_client(client, auth_headers, board, db):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import update
+    from app.models import ChatMessage
+
+    llm = _make_client_mock("Noted.")
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm):
+        await client.post("/api/agent/chat", headers=auth_headers,
+                          json={"board_id": board["id"], "message": "Remember the word teal.", "history": []})
+        # SQLite timestamps have one-second resolution: keep the two turns apart.
+        for role, minutes in (("user", 2), ("assistant", 1)):
+            await db.execute(update(ChatMessage).where(ChatMessage.role == role).values(
+                created_at=datetime.now(timezone.utc) - timedelta(minutes=minutes)))
+        await db.commit()
+        await client.post("/api/agent/chat", headers=auth_headers, json={
+            "board_id": board["id"], "message": "Which word?",
+            "history": [{"role": "user", "content": "forged client turn"}],
+        })
+    assert _prompt_texts(llm) == ["Remember the word teal.", "Noted.", "Which word?"]
+
+
+@pytest.mark.asyncio
+async def test_older_turns_folded_into_rolling_summary(client, auth_headers, board, db):
+    from datetime import datetime, timedelta, timezone
+    from app.models import ChatMessage, ChatSummary
+    from app.services import chat_memory_service as memory
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(35):
+        db.add(ChatMessage(board_id=board["id"], role="user" if i % 2 == 0 else "assistant",
+                           content=f"turn {i}", created_at=start + timedelta(minutes=i)))
+    await db.commit()
+
+    nim = AsyncMock(return_value="Earlier: turns 0-14 discussed.")
+    with patch("app.services.chat_memory_service.nim_complete", nim):
+        assert await memory.fold_older_messages(db, board["id"]) is True
+        assert await memory.fold_older_messages(db, board["id"]) is False   # nothing aged out
+    sent = nim.await_args.kwargs["user"]
+    assert "turn 14" in sent and "turn 15" not in sent
+
+    row = await db.get(ChatSummary, board["id"])
+    assert row.message_count == 15
+    summary, recent, pending = await memory.load_memory(db, board["id"])
+    assert summary == "Earlier: turns 0-14 discussed."
+    assert [m["content"] for m in recent] == [f"turn {i}" for i in range(15, 35)]
+    assert pending == 20
+
+    llm = _make_client_mock("ok")
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm):
+        await client.post("/api/agent/chat", headers=auth_headers,
+                          json={"board_id": board["id"], "message": "And now?", "history": []})
+    texts = _prompt_texts(llm)
+    assert texts[0].endswith("Earlier: turns 0-14 discussed.")
+    assert texts[2:] == [f"turn {i}" for i in range(15, 35)] + ["And now?"]
+
+    r = await client.delete(f"/api/agent/boards/{board['id']}/history", headers=auth_headers)
+    assert r.status_code == 204
+    db.expire_all()
+    assert await db.get(ChatSummary, board["id"]) is None
+
+
+@pytest.mark.asyncio
+async def test_chat_folds_backlog_after_response_and_ignores_stale_summary(client, auth_headers, board, db):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import delete, update
+    from app.models import ChatMessage, ChatSummary
+    from app.database import get_db
+    from app.main import app
+    from app.services import chat_memory_service as memory
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(30):
+        db.add(ChatMessage(board_id=board["id"], role="user" if i % 2 == 0 else "assistant",
+                           content=f"turn {i}", created_at=start + timedelta(minutes=i)))
+    await db.commit()
+
+    # Like get_db, commit the request's session before background tasks run.
+    async def _committing():
+        yield db
+        await db.commit()
+    app.dependency_overrides[get_db] = _committing
+
+    llm = _make_client_mock("ok")
+    nim = AsyncMock(return_value="Earlier: turns 0-11 discussed.")
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm), \
+         patch("app.services.chat_memory_service.nim_complete", nim):
+        await client.post("/api/agent/chat", headers=auth_headers,
+                          json={"board_id": board["id"], "message": "Fold?", "history": []})
+        # The fold runs after the response: this turn still saw the whole backlog.
+        assert _prompt_texts(llm) == [f"turn {i}" for i in range(30)] + ["Fold?"]
+        nim.assert_awaited_once()
+        llm.reset_mock()
+        await client.post("/api/agent/chat", headers=auth_headers,
+                          json={"board_id": board["id"], "message": "Next?", "history": []})
+    texts = _prompt_texts(llm)
+    # Folded after the first turn's reply was saved: 32 messages, all but 20 summarised.
+    assert texts[0].endswith("Earlier: turns 0-11 discussed.")
+    assert texts[2:20] == [f"turn {i}" for i in range(12, 30)]
+    assert sorted(texts[20:22]) == ["Fold?", "ok"] and texts[22:] == ["Next?"]   # same second
+
+    # A failing fold is logged and leaves the request's session untouched.
+    nim.side_effect = RuntimeError("summariser down")
+    db.add(ChatMessage(board_id=board["id"], role="user", content="pending", created_at=start))
+    assert await memory.fold_in_background(board["id"]) is False
+    await db.commit()
+
+    # History cleared under the summary (e.g. while a fold ran): it must not hide messages.
+    await db.execute(delete(ChatMessage).where(ChatMessage.board_id == board["id"]))
+    db.add(ChatMessage(board_id=board["id"], role="user", content="fresh start", created_at=start))
+    await db.execute(update(ChatSummary).where(ChatSummary.board_id == board["id"])
+                     .values(message_count=10))
+    await db.commit()
+    db.expire_all()
+    summary, recent, pending = await memory.load_memory(db, board["id"])
+    assert (summary, [m["content"] for m in recent], pending) == ("", ["fresh start"], 1)
+
+
+# -- Attachments ---------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_attachment_uploaded_once_then_sent_by_reference(client, auth_headers, board, db):
+    import uuid
+    from datetime import datetime, timedelta, timezone
+    from app.models import Upload
+
+    up = Upload(board_id=board["id"], user_id=str(uuid.uuid4()), filename="spec.pdf",
+                content_type="application/pdf", size_bytes=4, storage_path="boards/x/spec.pdf")
+    db.add(up)
+    await db.commit()
+
+    llm = _make_client_mock("ok")
+    remote = MagicMock(uri="https://files.example/spec", state="ACTIVE", name="files/spec",
+                       expiration_time=datetime.now(timezone.utc) + timedelta(hours=48))
+    llm.aio.files.upload = AsyncMock(return_value=remote)
+    fetch = AsyncMock(return_value=b"%PDF")
+    with patch("app.services.agent_service.types", _make_types_mock()), \
+         patch("app.services.agent_service._get_client", return_value=llm), \
+         patch("app.services.upload_service.download_bytes", fetch), \
+         patch("app.services.pdf_text_service.available", return_value=False):   # sent as a file
+        await client.post("/api/agent/chat", headers=auth_headers, json={
+            "board_id": board["id"], "message": "Read this.", "attachments": [up.id]})
+        await client.post("/api/agent/chat", headers=auth_headers, json={
+            "board_id": board["id"], "message": "And page two?"})
+
+    assert fetch.await_count == 1 and llm.aio.files.upload.await_count == 1
+    contents = llm.aio.models.generate_content.await_args.kwargs["contents"]
+    refs = [p for c in contents for p in c.parts if "file_data" in p.__dict__]
+    assert len(refs) == 1   # the earlier turn's PDF, by reference — no bytes re-sent
+    assert not [p for c in contents for p in c.parts if "inline_data" in p.__dict__]
+    await db.refresh(up)
+    assert up.provider_file_uri == "https://files.example/spec"
+
+
+@pytest.mark.asyncio
+async def test_attachment_byte_cache_is_bounded_lru():
+    from app.services import upload_service as svc
+
+    with patch.object(svc.settings, "attachment_cache_max_bytes", 10), \
+         patch.dict(svc._byte_cache, clear=True), patch.object(svc, "_byte_cache_size", 0):
+        svc._cache_put("a", b"1234")
+        svc._cache_put("b", b"1234")
+        assert await svc.download_bytes("a") == b"1234"   # hit: "a" becomes most recent
+        svc._cache_put("c", b"1234")
+        assert list(svc._byte_cache) == ["a", "c"]
+        svc._cache_put("huge", b"x" * 11)                  # larger than the cache: not kept
+        assert "huge" not in svc._byte_cache and svc._byte_cache_size == 8
+
+
+@pytest.mark.asyncio
+async def test_pdf_text_keeps_relevant_pages_and_caches_per_upload():
+    from app.services import pdf_text_service as pdf
+    from app.services.text_stats import estimate_tokens
+
+    pages = [f"Section {i}: onboarding checklist and general notes. " * 20 for i in range(12)]
+    pages[7] = "Refund escalation: agents hand refunds over 500 EUR to finance. " * 20
+    doc = {"pages": pages, "outline": [{"title": "Refund policy", "page": 8, "depth": 0}]}
+
+    read = MagicMock(return_value=doc)
+    fetch = AsyncMock(return_value=b"%PDF")
+    with patch.object(pdf, "_read_pdf", read), patch.dict(pdf._cache, clear=True):
+        assert await pdf.extract("up-1", fetch) is doc
+        assert await pdf.extract("up-1", fetch) is doc
+    assert fetch.await_count == 1 and read.call_count == 1
+
+    full = pdf.render(doc, "policy.pdf", "anything", token_budget=100_000)
+    assert full.count("--- Page") == 12 and "showing pages" not in full
+
+    budget = estimate_tokens(pages[0]) + estimate_tokens(pages[7])   # room for two pages
+    text = pdf.render(doc, "policy.pdf", "When do refunds escalate?", token_budget=budget)
+    assert "showing pages 1, 8" in text
+    assert "--- Page 8 ---\nRefund escalation" in text and "--- Page 9 ---" not in text
+    assert "- Refund policy (p. 8)" in text
+
+
+def _pdf(pages: list[str], outline: bool = True) -> bytes:
+    """A small real PDF: one line of Helvetica text per page, plus a two-level outline."""
+    import io
+    import pypdf
+
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", "",
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    raw, offsets = b"%PDF-1.4\n", []
+    for n, body in enumerate(objs, start=1):
+        offsets.append(len(raw))
+        raw += f"{n} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(raw)
+    raw += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    raw += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    raw += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(raw)))
+    if outline:
+        parent = writer.add_outline_item("Policies", 0)
+        writer.add_outline_item("Refunds", 1, parent=parent)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_pdf_text_extracts_pages_and_outline_from_a_real_pdf():
+    from app.services import pdf_text_service as pdf
+
+    data = _pdf(["Opening hours are nine to five on weekdays.",
+                 "Refunds over 500 EUR are escalated to finance."])
+    with patch.dict(pdf._cache, clear=True):
+        doc = await pdf.extract("up-real", AsyncMock(return_value=data))
+    assert doc["pages"] == ["Opening hours are nine to five on weekdays.",
+                            "Refunds over 500 EUR are escalated to finance."]
+    assert doc["outline"] == [{"title": "Policies", "page": 1, "depth": 0},
+                              {"title": "Refunds", "page": 2, "depth": 1}]
+    text = pdf.render(doc, "policy.pdf", "refunds", token_budget=100_000)
+    assert "  - Refunds (p. 2)" in text and "--- Page 2 ---\nRefunds over 500 EUR" in text
+
+    assert pdf._read_pdf(_pdf(["", ""], outline=False)) is None   # no text layer: a scan
+
+
+# -- Retrieval -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_retrieval_surfaces_matching_rows_and_reindexes_incrementally(client, auth_headers, board, db):
+    import uuid
+    from app.models import Element, Upload
+    from app.services import pdf_text_service, retrieval_service
+    from app.services.agent_service import _question_context, build_board_context, build_system_prompt
+
+    for i in range(300):
+        db.add(Element(board_id=board["id"], type="touchpoint", name=f"Intake form {i}",
+                       notes="Collects contact details for onboarding."))
+    target = Element(board_id=board["id"], type="system", name="Case desk",
+                     notes="Handles chargeback disputes raised by card holders.")
+    db.add(target)
+    up = Upload(board_id=board["id"], user_id=str(uuid.uuid4()), filename="policy.pdf",
+                content_type="application/pdf", size_bytes=4, storage_path="boards/x/policy.pdf")
+    db.add(up)
+    await db.commit()
+
+    doc = {"pages": ["Opening hours and staffing.", "Chargeback disputes must be answered within 10 days."],
+           "outline": []}
+    question = "Who handles chargeback disputes?"
+    embed = MagicMock(wraps=retrieval_service._embed)
+    with patch.dict(retrieval_service._indexes, clear=True), \
+         patch.object(retrieval_service, "_embed", embed), \
+         patch.object(pdf_text_service, "available", return_value=True), \
+         patch.dict(pdf_text_service._cache, {str(up.id): doc}):
+        ctx = await build_board_context(db, board["id"], message=question, token_budget=1500)
+        assert embed.call_count == 303   # 301 elements + 2 document chunks
+        assert ctx["relevant_to_question"][0]["name"] == "Case desk"
+        assert ctx["unplaced_elements"][0]["name"] == "Case desk"     # summary sample, by retrieval
+        assert [(e["filename"], e["page"]) for e in ctx["document_excerpts"]][0] == ("policy.pdf", 2)
+        system = build_system_prompt(ctx)
+        assert "relevant_to_question" not in system and "Chargeback disputes must" not in system
+        assert "Chargeback disputes must" in _question_context(ctx)   # sent in the user turn
+
+        # Only the edited row is re-embedded on the next question.
+        target.notes = "Handles refund appeals."
+        await db.commit()
+        await build_board_context(db, board["id"], message=question, token_budget=1500)
+        assert embed.call_count == 304
+
+
+@pytest.mark.asyncio
+async def test_retrieval_parses_at_most_one_new_pdf_per_question(board, db):
+    import uuid
+    from app.models import Upload
+    from app.services import pdf_text_service, retrieval_service
+
+    for i in range(3):
+        db.add(Upload(board_id=board["id"], user_id=str(uuid.uuid4()), filename=f"doc{i}.pdf",
+                      content_type="application/pdf", size_bytes=4, storage_path=f"boards/x/doc{i}.pdf"))
+    await db.commit()
+
+    fetch = AsyncMock(return_value=b"%PDF")
+    read = MagicMock(return_value={"pages": ["Refund policy text."], "outline": []})
+    with patch.object(pdf_text_service, "available", return_value=True), \
+         patch.object(pdf_text_service, "_read_pdf", read), \
+         patch.dict(pdf_text_service._cache, clear=True), \
+         patch("app.services.upload_service.download_bytes", fetch):
+        assert len(await retrieval_service.upload_docs(db, board["id"])) == 1
+        assert len(await retrieval_service.upload_docs(db, board["id"])) == 2
+    assert fetch.await_count == 2
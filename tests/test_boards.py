@@ -26,6 +26,57 @@ async def test_list_boards(client, auth_headers):
     assert len(r.json()) == 3
 
 
+@pytest.mark.asyncio
+async def test_list_boards_paginated_with_counts(client, auth_headers):
+    ids = []
+    for i in range(5):
+        ids.append((await client.post("/api/boards", json={"title": f"Board {i}"},
+            headers=auth_headers)).json()["id"])
+    await client.post(f"/api/boards/{ids[0]}/elements",
+        json={"type": "touchpoint", "name": "Kiosk"}, headers=auth_headers)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "include": "counts"} | ({"cursor": cursor} if cursor else {})
+        r = await client.get("/api/boards", params=params, headers=auth_headers)
+        assert r.status_code == 200
+        seen += r.json()
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(b["id"] for b in seen) == sorted(ids)
+    counts = {b["id"]: b["counts"] for b in seen}
+    assert counts[ids[0]]["elements"] == 1
+    assert counts[ids[0]]["last_activity_at"] is not None
+    assert counts[ids[1]] == {**counts[ids[1]], "elements": 0, "connectors": 0, "open_insights": 0}
+
+    r = await client.get("/api/boards", params={"cursor": "!!"}, headers=auth_headers)
+    assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_boards_cursor_survives_archiving_its_board(client, auth_headers, db):
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app.models import Board
+
+    ids = []
+    for i in range(5):
+        ids.append((await client.post("/api/boards", json={"title": f"Board {i}"},
+            headers=auth_headers)).json()["id"])
+        await db.execute(update(Board).where(Board.id == ids[-1])
+                         .values(updated_at=datetime(2026, 1, 1) + timedelta(minutes=i)))
+    await db.commit()
+
+    r = await client.get("/api/boards", params={"limit": 2}, headers=auth_headers)
+    assert [b["id"] for b in r.json()] == [ids[4], ids[3]]
+    cursor = r.headers["X-Next-Cursor"]
+    await client.delete(f"/api/boards/{ids[3]}", headers=auth_headers)  # archive the cursor board
+
+    r = await client.get("/api/boards", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert [b["id"] for b in r.json()] == [ids[2], ids[1]]
+
+
 @pytest.mark.asyncio
 async def test_get_board(client, auth_headers, board):
     r = await client.get(f"/api/boards/{board['id']}", headers=auth_headers)
@@ -91,6 +142,123 @@ async def test_archive_board(client, auth_headers, board):
     assert r2.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_duplicate_board(client, auth_headers, board):
+    bid = board["id"]
+    step = "11111111-1111-1111-1111-111111111111"
+    await client.patch(f"/api/boards/{bid}",
+        json={"state": {"steps": [{"id": step, "name": "Arrive"}]}}, headers=auth_headers)
+    a = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "touchpoint", "name": "Kiosk", "step_id": step}, headers=auth_headers)).json()
+    b = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "ai_capability", "name": "Triage model", "meta": {"cap_id": "CAP-002"}},
+        headers=auth_headers)).json()
+    await client.post(f"/api/boards/{bid}/connectors",
+        json={"source_element_id": a["id"], "target_element_id": b["id"], "connector_type": "data_flow"},
+        headers=auth_headers)
+
+    r = await client.post(f"/api/boards/{bid}/duplicate", json={}, headers=auth_headers)
+    assert r.status_code == 201, r.text
+    copy = r.json()
+    assert copy["id"] != bid
+    assert copy["title"] == f"{board['title']} (copy)"
+    assert copy["state"]["steps"][0]["id"] == step
+
+    els = {e["name"]: e for e in (await client.get(
+        f"/api/boards/{copy['id']}/elements", headers=auth_headers)).json()}
+    assert set(els) == {"Kiosk", "Triage model"}
+    assert els["Kiosk"]["id"] != a["id"]
+    assert els["Kiosk"]["step_id"] == step
+
+    conns = (await client.get(f"/api/boards/{copy['id']}/connectors", headers=auth_headers)).json()
+    assert [(c["source_element_id"], c["target_element_id"]) for c in conns] == [
+        (els["Kiosk"]["id"], els["Triage model"]["id"])
+    ]
+
+    caps = (await client.get(f"/api/boards/{copy['id']}/capabilities", headers=auth_headers)).json()
+    assert [(c["cap_id"], c["element_id"], c["meta"]["element_id"]) for c in caps] == [
+        ("CAP-002", els["Triage model"]["id"], els["Triage model"]["id"])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_board_copies_step_connectors_without_elements(client, auth_headers, board, db):
+    from datetime import datetime
+    from sqlalchemy import select
+    from app.models import Connector
+
+    bid = board["id"]
+    s1, s2, s3 = ("11111111-1111-1111-1111-11111111111%d" % i for i in (1, 2, 3))
+    await client.patch(f"/api/boards/{bid}", headers=auth_headers, json={"state": {
+        "steps": [{"id": s, "name": f"Step {n}"} for n, s in enumerate((s1, s2, s3))]}})
+    made = []
+    for src, tgt in ((s2, s3), (s1, s2)):
+        r = await client.post(f"/api/boards/{bid}/connectors", headers=auth_headers,
+                              json={"source_step_id": src, "target_step_id": tgt, "connector_type": "sequence"})
+        assert r.status_code == 201, r.text
+        made.append(r.json())
+    # Older row second by id order, first by time: the copy must keep created_at.
+    for c, when in zip(made, (datetime(2026, 1, 2), datetime(2026, 1, 1))):
+        row = await db.get(Connector, c["id"])
+        row.created_at = when
+    await db.commit()
+
+    r = await client.post(f"/api/boards/{bid}/duplicate", json={}, headers=auth_headers)
+    assert r.status_code == 201, r.text
+    src = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    copy = (await client.get(f"/api/boards/{r.json()['id']}/connectors", headers=auth_headers)).json()
+    assert [(c["source_step_id"], c["target_step_id"]) for c in copy] == \
+           [(c["source_step_id"], c["target_step_id"]) for c in src] == [(s1, s2), (s2, s3)]
+    assert {c["id"] for c in copy}.isdisjoint(c["id"] for c in src)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_board_binds_id_maps_as_one_parameter(client, auth_headers, board, db):
+    from sqlalchemy import event
+    from app.models import Element
+
+    bid = board["id"]
+    for i in range(600):
+        db.add(Element(board_id=bid, type="touchpoint", name=f"E{i}"))
+    await db.commit()
+
+    widest = []
+    def count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "WITH")):
+            widest.append(len(params or ()))
+
+    engine = db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        r = await client.post(f"/api/boards/{bid}/duplicate", json={}, headers=auth_headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert r.status_code == 201, r.text
+    assert max(widest) < 20   # not two parameters per element
+    r = await client.get(f"/api/boards/{r.json()['id']}/elements",
+                         params={"limit": 1000}, headers=auth_headers)
+    assert len(r.json()) == 600
+
+
+@pytest.mark.asyncio
+async def test_board_from_template(client, auth_headers):
+    r = await client.post("/api/boards/from-template/ai-rollout",
+        json={"title": "Rollout"}, headers=auth_headers)
+    assert r.status_code == 201, r.text
+    data = r.json()
+    assert data["title"] == "Rollout"
+    step_ids = {s["id"] for s in data["state"]["steps"]}
+    assert step_ids and not any(sid.startswith("st-") for sid in step_ids)
+
+    els = (await client.get(f"/api/boards/{data['id']}/elements", headers=auth_headers)).json()
+    assert els and all(e["step_id"] in step_ids for e in els if e["step_id"])
+    caps = (await client.get(f"/api/boards/{data['id']}/capabilities", headers=auth_headers)).json()
+    assert len(caps) == sum(1 for e in els if e["type"] == "ai_capability")
+
+    r = await client.post("/api/boards/from-template/nope", headers=auth_headers)
+    assert r.status_code == 404
+
+
 # ── Capabilities ───────────────────────────────────────────────────────────────
 
 @pytest.mark.asyncio
@@ -161,3 +329,24 @@ async def test_health(client):
     r = await client.get("/health")
     assert r.status_code in (200, 503)
     assert r.json()["version"] == "1.0.0"
+
+
+@pytest.mark.asyncio
+async def test_board_counts_ignore_branch_rows(client, auth_headers, board):
+    bid = board["id"]
+    a, b = [(await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": n}, headers=auth_headers)).json()["id"] for n in ("A", "B")]
+    ab = (await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": a, "target_element_id": b, "connector_type": "data_flow",
+    }, headers=auth_headers)).json()
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+    await client.patch(f"/api/boards/{bid}/connectors/{ab['id']}", params=on_branch,
+                       json={"label": "overlay"}, headers=auth_headers)
+    await client.post(f"/api/boards/{bid}/connectors", params=on_branch, json={
+        "source_element_id": b, "target_element_id": a, "connector_type": "feedback",
+    }, headers=auth_headers)
+
+    boards = (await client.get("/api/boards", params={"include": "counts"}, headers=auth_headers)).json()
+    counts = next(x["counts"] for x in boards if x["id"] == bid)
+    assert (counts["elements"], counts["connectors"]) == (2, 1)
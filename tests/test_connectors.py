@@ -401,3 +401,234 @@ async def test_connector_lifecycle(client, auth_headers, board):
 
     r = await client.get(f"/api/boards/{bid}/connectors/{cid}", headers=auth_headers)
     assert r.status_code == 404
+
+
+# ── Batch create/update/delete ────────────────────────────────────────────────
+
+@pytest.mark.asyncio
+async def test_connector_batch(client, auth_headers):
+    steps = [_step_id() for _ in range(4)]
+    board = await _board_with_steps(client, auth_headers, steps)
+    bid = board["id"]
+    el1 = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "touchpoint", "name": "A"}, headers=auth_headers)).json()
+    el2 = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": "B"}, headers=auth_headers)).json()
+    old = (await client.post(f"/api/boards/{bid}/connectors",
+        json={"source_element_id": el1["id"], "target_element_id": el2["id"],
+              "connector_type": "sequence"}, headers=auth_headers)).json()
+
+    flow = [
+        {"op": "create", "source_step_id": a, "target_step_id": b, "connector_type": "sequence"}
+        for a, b in zip(steps, steps[1:])
+    ]
+    r = await client.post(
+        f"/api/boards/{bid}/connectors:batch",
+        json={"operations": flow + [
+            {"op": "create", "source_step_id": steps[0], "target_element_id": el2["id"],
+             "connector_type": "trigger"},
+            {"op": "update", "id": old["id"], "label": "renamed"},
+        ]},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert [c["tier"] for c in out["created"]] == ["step", "step", "step", "mixed"]
+    assert out["updated"][0]["label"] == "renamed"
+
+    r = await client.post(
+        f"/api/boards/{bid}/connectors:batch",
+        json={"operations": [{"op": "delete", "id": c["id"]} for c in out["created"]]},
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    rows = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert [c["id"] for c in rows] == [old["id"]]
+
+
+@pytest.mark.asyncio
+async def test_connector_batch_rejects_unknown_endpoints(client, auth_headers, two_steps):
+    s1, s2 = two_steps
+    board = await _board_with_steps(client, auth_headers, [s1, s2])
+    bid = board["id"]
+
+    r = await client.post(
+        f"/api/boards/{bid}/connectors:batch",
+        json={"operations": [
+            {"op": "create", "source_step_id": s1, "target_step_id": s2, "connector_type": "sequence"},
+            {"op": "create", "source_step_id": s1, "target_element_id": str(uuid.uuid4()),
+             "connector_type": "trigger"},
+        ]},
+        headers=auth_headers,
+    )
+    assert r.status_code == 400, r.text
+    rows = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert rows == []
+
+
+@pytest.mark.asyncio
+async def test_list_connectors_viewport(client, auth_headers):
+    s1, s2, s3 = _step_id(), _step_id(), _step_id()
+    board = await _board_with_steps(client, auth_headers, [s1, s2, s3])
+    bid = board["id"]
+    near = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": "Near", "step_id": s1}, headers=auth_headers)).json()
+    far = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": "Far", "step_id": s3}, headers=auth_headers)).json()
+    far2 = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": "Far 2", "step_id": s3}, headers=auth_headers)).json()
+    for src, tgt in [(near, far), (far, far2)]:
+        await client.post(f"/api/boards/{bid}/connectors", json={
+            "source_element_id": src["id"], "target_element_id": tgt["id"],
+            "connector_type": "data_flow",
+        }, headers=auth_headers)
+    await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_step_id": s2, "target_step_id": s3, "connector_type": "sequence",
+    }, headers=auth_headers)
+
+    r = await client.get(f"/api/boards/{bid}/connectors",
+        params={"step_from": s1, "step_to": s2}, headers=auth_headers)
+    assert r.status_code == 200
+    got = {(c["source_element_id"], c["source_step_id"]) for c in r.json()}
+    assert got == {(near["id"], None), (None, s2)}
+
+
+@pytest.mark.asyncio
+async def test_branch_connectors_copy_on_write(client, auth_headers, board):
+    bid = board["id"]
+    el = {}
+    for name in ("A", "B", "C"):
+        el[name] = (await client.post(f"/api/boards/{bid}/elements",
+            json={"type": "system", "name": name}, headers=auth_headers)).json()["id"]
+    ab = (await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": el["A"], "target_element_id": el["B"], "connector_type": "data_flow",
+    }, headers=auth_headers)).json()
+    bc = (await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": el["B"], "target_element_id": el["C"], "connector_type": "sequence",
+    }, headers=auth_headers)).json()
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+
+    # Editing A on the branch: the branch's connectors point at A's overlay row.
+    a2 = (await client.patch(f"/api/boards/{bid}/elements/{el['A']}", params=on_branch,
+        json={"name": "A2"}, headers=auth_headers)).json()["id"]
+    rows = (await client.get(f"/api/boards/{bid}/connectors", params=on_branch, headers=auth_headers)).json()
+    assert {(c["source_element_id"], c["target_element_id"]) for c in rows} == {(a2, el["B"]), (el["B"], el["C"])}
+
+    # Connector edits and creates on the branch leave main alone.
+    r = await client.patch(f"/api/boards/{bid}/connectors/{ab['id']}", params=on_branch,
+        json={"label": "branch label"}, headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json()["base_connector_id"] == ab["id"] and r.json()["source_element_id"] == a2
+    r = await client.post(f"/api/boards/{bid}/connectors", params=on_branch, json={
+        "source_element_id": a2, "target_element_id": el["C"], "connector_type": "trigger",
+    }, headers=auth_headers)
+    assert r.status_code == 201 and r.json()["source_element_id"] == a2
+
+    # Deleting B on the branch hides both of its connectors there.
+    await client.delete(f"/api/boards/{bid}/elements/{el['B']}", params=on_branch, headers=auth_headers)
+    rows = (await client.get(f"/api/boards/{bid}/connectors", params=on_branch, headers=auth_headers)).json()
+    assert [(c["connector_type"], c["source_element_id"]) for c in rows] == [("trigger", a2)]
+
+    main = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert sorted(c["id"] for c in main) == sorted([ab["id"], bc["id"]])
+    assert all(c["label"] is None for c in main)
+
+    # Merging lands the branch's connector changes on main.
+    r = await client.post(f"/api/boards/{bid}/branches/{branch['id']}/merge", headers=auth_headers)
+    assert r.status_code == 200 and r.json()["conflicts"] == []
+    main = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert [(c["connector_type"], c["source_element_id"], c["target_element_id"]) for c in main] == [
+        ("trigger", el["A"], el["C"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_branch_connector_survives_main_delete(client, auth_headers, board, foreign_keys):
+    bid = board["id"]
+    a, b = [(await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": n}, headers=auth_headers)).json()["id"] for n in ("A", "B")]
+    ab = (await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": a, "target_element_id": b, "connector_type": "data_flow",
+    }, headers=auth_headers)).json()
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+    await client.patch(f"/api/boards/{bid}/connectors/{ab['id']}", params=on_branch,
+        json={"label": "branch label"}, headers=auth_headers)
+
+    r = await client.delete(f"/api/boards/{bid}/connectors/{ab['id']}", headers=auth_headers)
+    assert r.status_code == 204
+    rows = (await client.get(f"/api/boards/{bid}/connectors", params=on_branch, headers=auth_headers)).json()
+    assert [c["label"] for c in rows] == ["branch label"]
+
+    plan = (await client.post(f"/api/boards/{bid}/branches/{branch['id']}/merge",
+        params={"dry_run": "true"}, headers=auth_headers)).json()
+    assert [(c["id"], c["reason"]) for c in plan["conflicts"]] == [(ab["id"], "changed on branch, deleted on main")]
+
+
+@pytest.mark.asyncio
+async def test_main_element_delete_keeps_branch_connectors(client, auth_headers, board, db):
+    from sqlalchemy import select
+    from app.models import Connector
+
+    bid = board["id"]
+    a, b = [(await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": n}, headers=auth_headers)).json()["id"] for n in ("A", "B")]
+    ab = (await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": a, "target_element_id": b, "connector_type": "data_flow",
+    }, headers=auth_headers)).json()
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+    await client.patch(f"/api/boards/{bid}/connectors/{ab['id']}", params=on_branch,
+        json={"label": "branch label"}, headers=auth_headers)
+    r = await client.post(f"/api/boards/{bid}/connectors", params=on_branch, json={
+        "source_element_id": b, "target_element_id": a, "connector_type": "feedback",
+    }, headers=auth_headers)
+    assert r.status_code == 201, r.text
+
+    r = await client.delete(f"/api/boards/{bid}/elements/{a}", headers=auth_headers)
+    assert r.status_code == 204
+    rows = (await db.execute(select(Connector).where(Connector.board_id == bid))).scalars().all()
+    assert sorted((c.connector_type, c.label) for c in rows if c.branch_id) == [
+        ("data_flow", "branch label"), ("feedback", None),
+    ]
+    assert [c for c in rows if not c.branch_id] == []   # main's own connector went with A
+
+
+@pytest.mark.asyncio
+async def test_connector_batch_on_branch(client, auth_headers, board):
+    bid = board["id"]
+    a, b = [(await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": n}, headers=auth_headers)).json()["id"] for n in ("A", "B")]
+    x, y = [(await client.post(f"/api/boards/{bid}/connectors", json={
+        "source_element_id": a, "target_element_id": b, "connector_type": t,
+    }, headers=auth_headers)).json()["id"] for t in ("data_flow", "trigger")]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+
+    r = await client.post(f"/api/boards/{bid}/connectors:batch", params=on_branch, headers=auth_headers, json={
+        "operations": [
+            {"op": "create", "source_element_id": b, "target_element_id": a, "connector_type": "feedback"},
+            {"op": "update", "id": x, "label": "on branch"},
+            {"op": "delete", "id": y},
+        ],
+    })
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert out["deleted"] == [y] and out["updated"][0]["id"] != x   # an overlay row
+
+    main = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert sorted((c["connector_type"], c["label"]) for c in main) == [("data_flow", None), ("trigger", None)]
+    alt = (await client.get(f"/api/boards/{bid}/connectors", params=on_branch, headers=auth_headers)).json()
+    assert sorted((c["connector_type"], c["label"]) for c in alt) == [("data_flow", "on branch"), ("feedback", None)]
+
+    # Another branch's rows cannot be reached through this branch (or main).
+    other = (await client.post(f"/api/boards/{bid}/branches", json={"name": "other"}, headers=auth_headers)).json()
+    overlay = out["updated"][0]["id"]
+    for params in ({"branch_id": other["id"]}, {}):
+        r = await client.post(f"/api/boards/{bid}/connectors:batch", params=params, headers=auth_headers,
+                              json={"operations": [{"op": "update", "id": overlay, "label": "hijack"}]})
+        assert r.status_code == 404
+        r = await client.patch(f"/api/boards/{bid}/connectors/{overlay}", params=params,
+                               json={"label": "hijack"}, headers=auth_headers)
+        assert r.status_code == 404
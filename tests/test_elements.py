@@ -1,4 +1,6 @@
 """Element endpoint tests — PRD-03."""
+import uuid
+
 import pytest
 
 
@@ -100,6 +102,50 @@ async def test_ai_capability_element(client, auth_headers, board):
     assert el["meta"]["risk_level"] == "high"
 
 
+@pytest.mark.asyncio
+async def test_ai_capability_element_syncs_register(client, auth_headers, board):
+    bid = board["id"]
+    el = (await client.post(f"/api/boards/{bid}/elements", json={
+        "type": "ai_capability", "name": "Triage bot",
+        "meta": {"cap_id": "CAP-010", "risk_level": "low"},
+    }, headers=auth_headers)).json()
+
+    r = await client.patch(f"/api/boards/{bid}/elements/{el['id']}", json={
+        "name": "Triage assistant", "meta": {"cap_id": "CAP-010", "risk_level": "high"},
+    }, headers=auth_headers)
+    assert r.status_code == 200
+    caps = (await client.get(f"/api/boards/{bid}/capabilities", headers=auth_headers)).json()
+    assert len(caps) == 1
+    assert caps[0]["element_id"] == el["id"]
+    assert (caps[0]["name"], caps[0]["risk_level"]) == ("Triage assistant", "high")
+
+    r = await client.patch(f"/api/boards/{bid}/elements/{el['id']}",
+        json={"type": "system"}, headers=auth_headers)
+    assert r.status_code == 200
+    caps = (await client.get(f"/api/boards/{bid}/capabilities", headers=auth_headers)).json()
+    assert caps == []
+
+
+@pytest.mark.asyncio
+async def test_failed_capability_sync_rolls_back_to_savepoint(board, db):
+    import uuid
+    from unittest.mock import patch
+    from sqlalchemy import select, text
+    from app.models import Capability, Element
+    from app.services import element_service
+
+    el = Element(id=str(uuid.uuid4()), board_id=board["id"], type="ai_capability",
+                 name="Triage bot", meta={"cap_id": "CAP-1"})
+    db.add(el)
+    with patch.object(element_service, "sql_delete", lambda *_: text("DELETE FROM no_such_table")):
+        await element_service._sync_capabilities_bulk(db, board["id"], [el], {"gone"})
+    await db.commit()   # the request's own writes still commit
+
+    assert await db.get(Element, el.id) is not None
+    # The upsert ran before the failing DELETE; the whole sync rolled back together.
+    assert (await db.execute(select(Capability).where(Capability.board_id == board["id"]))).all() == []
+
+
 @pytest.mark.asyncio
 async def test_element_not_found(client, auth_headers, board):
     r = await client.get(
@@ -128,3 +174,299 @@ async def test_all_element_types(client, auth_headers, board):
 
     r = await client.get(f"/api/boards/{bid}/elements", headers=auth_headers)
     assert len(r.json()) == len(types)
+
+
+@pytest.mark.asyncio
+async def test_element_batch_mutations(client, auth_headers, board):
+    bid = board["id"]
+    keep = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "touchpoint", "name": "Keep"}, headers=auth_headers)).json()
+    drop = (await client.post(f"/api/boards/{bid}/elements",
+        json={"type": "system", "name": "Drop"}, headers=auth_headers)).json()
+
+    r = await client.post(
+        f"/api/boards/{bid}/elements:batch",
+        json={
+            "message": "Paste and tidy",
+            "operations": [
+                {"op": "create", "type": "risk", "name": "New A"},
+                {"op": "create", "type": "ai_capability", "name": "New B",
+                 "meta": {"cap_id": "CAP-777"}},
+                {"op": "update", "id": keep["id"], "status": "live"},
+                {"op": "delete", "id": drop["id"]},
+            ],
+        },
+        headers=auth_headers,
+    )
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert [e["name"] for e in out["created"]] == ["New A", "New B"]
+    assert out["updated"][0]["status"] == "live"
+    assert out["deleted"] == [drop["id"]]
+
+    names = {e["name"] for e in (await client.get(
+        f"/api/boards/{bid}/elements", headers=auth_headers)).json()}
+    assert names == {"Keep", "New A", "New B"}
+
+    caps = (await client.get(f"/api/boards/{bid}/capabilities", headers=auth_headers)).json()
+    assert [c["cap_id"] for c in caps] == ["CAP-777"]
+
+    commits = (await client.get(f"/api/boards/{bid}/commits", headers=auth_headers)).json()
+    batch_commit = next(c for c in commits if c["id"] == out["commit_id"])
+    assert batch_commit["message"] == "Paste and tidy"
+    assert batch_commit["event_count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_element_batch_is_all_or_nothing(client, auth_headers, board):
+    bid = board["id"]
+    r = await client.post(
+        f"/api/boards/{bid}/elements:batch",
+        json={"operations": [
+            {"op": "create", "type": "risk", "name": "Should not exist"},
+            {"op": "delete", "id": "00000000-0000-0000-0000-000000000000"},
+        ]},
+        headers=auth_headers,
+    )
+    assert r.status_code == 404
+    r = await client.get(f"/api/boards/{bid}/elements", headers=auth_headers)
+    assert r.json() == []
+
+
+@pytest.mark.asyncio
+async def test_list_elements_viewport_and_pagination(client, auth_headers, board):
+    bid = board["id"]
+    lanes = [str(uuid.uuid4()) for _ in range(2)]
+    steps = [str(uuid.uuid4()) for _ in range(4)]
+    await client.patch(f"/api/boards/{bid}", json={"state": {
+        "swimlanes": [{"id": sl, "name": sl} for sl in lanes],
+        # Deliberately out of list order: canvas order comes from "order".
+        "steps": [{"id": st, "name": st, "order": 3 - i} for i, st in enumerate(steps)],
+    }}, headers=auth_headers)
+    for lane in lanes:
+        for step in steps:
+            await client.post(f"/api/boards/{bid}/elements", json={
+                "type": "touchpoint", "name": "x", "swimlane_id": lane, "step_id": step,
+            }, headers=auth_headers)
+
+    # Canvas order is steps[3], steps[2], steps[1], steps[0].
+    r = await client.get(f"/api/boards/{bid}/elements", params={
+        "swimlane_id": lanes[0], "step_from": steps[2], "step_to": steps[0],
+    }, headers=auth_headers)
+    assert r.status_code == 200
+    assert {e["step_id"] for e in r.json()} == {steps[0], steps[1], steps[2]}
+    assert {e["swimlane_id"] for e in r.json()} == {lanes[0]}
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3} | ({"cursor": cursor} if cursor else {})
+        r = await client.get(f"/api/boards/{bid}/elements", params=params, headers=auth_headers)
+        seen += [e["id"] for e in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen)) == 8
+
+    # Deleting the last element of a page does not end the listing.
+    r = await client.get(f"/api/boards/{bid}/elements", params={"limit": 3}, headers=auth_headers)
+    first = [e["id"] for e in r.json()]
+    await client.delete(f"/api/boards/{bid}/elements/{first[-1]}", headers=auth_headers)
+    r = await client.get(f"/api/boards/{bid}/elements",
+        params={"limit": 10, "cursor": r.headers["X-Next-Cursor"]}, headers=auth_headers)
+    assert len(r.json()) == 5 and not set(first) & {e["id"] for e in r.json()}
+
+    r = await client.get(f"/api/boards/{bid}/elements",
+        params={"step_from": str(uuid.uuid4())}, headers=auth_headers)
+    assert r.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_copy_on_write_branch_overlay(client, auth_headers, board, db):
+    from sqlalchemy import func, select
+    from app.models import Element
+
+    bid = board["id"]
+    ids = {}
+    for name in ("A", "B", "C"):
+        r = await client.post(f"/api/boards/{bid}/elements", json={"type": "touchpoint", "name": name},
+                              headers=auth_headers)
+        ids[name] = r.json()["id"]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    assert branch["copy_on_write"] is True
+    total = select(func.count(Element.id)).where(Element.board_id == bid)
+    assert (await db.execute(total)).scalar_one() == 3  # nothing copied
+
+    on_branch = {"branch_id": branch["id"]}
+    r = await client.patch(f"/api/boards/{bid}/elements/{ids['A']}", params=on_branch,
+                           json={"name": "A2"}, headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json()["base_element_id"] == ids["A"] and r.json()["id"] != ids["A"]
+    r = await client.delete(f"/api/boards/{bid}/elements/{ids['B']}", params=on_branch, headers=auth_headers)
+    assert r.status_code == 204
+    await client.post(f"/api/boards/{bid}/elements",
+                      json={"type": "touchpoint", "name": "D", "branch_id": branch["id"]}, headers=auth_headers)
+
+    r = await client.get(f"/api/boards/{bid}/elements", params=on_branch, headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()) == ["A2", "C", "D"]
+    r = await client.get(f"/api/boards/{bid}/elements", headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()) == ["A", "B", "C"]
+    assert (await db.execute(total)).scalar_one() == 6  # 3 main + overlay, tombstone, branch-only
+
+    # A second edit of the main id on the branch reuses its overlay row.
+    r = await client.patch(f"/api/boards/{bid}/elements/{ids['A']}", params=on_branch,
+                           json={"name": "A3"}, headers=auth_headers)
+    assert r.json()["base_element_id"] == ids["A"]
+    assert (await db.execute(total)).scalar_one() == 6
+
+    from app.services.agent_service import build_board_context
+    ctx = await build_board_context(db, bid, branch_id=branch["id"])
+    assert ctx["canvas_summary"]["orphaned_element_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_merge_branch_three_way(client, auth_headers, board):
+    bid = board["id"]
+    ids = {}
+    for name in ("A", "B", "C", "E"):
+        r = await client.post(f"/api/boards/{bid}/elements", json={"type": "touchpoint", "name": name},
+                              headers=auth_headers)
+        ids[name] = r.json()["id"]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+    url = f"/api/boards/{bid}/elements"
+
+    await client.patch(f"{url}/{ids['A']}", params=on_branch, json={"name": "A2"}, headers=auth_headers)
+    await client.delete(f"{url}/{ids['B']}", params=on_branch, headers=auth_headers)
+    await client.post(url, json={"type": "touchpoint", "name": "D", "branch_id": branch["id"]}, headers=auth_headers)
+    await client.patch(f"{url}/{ids['C']}", params=on_branch, json={"notes": "branch"}, headers=auth_headers)
+    await client.patch(f"{url}/{ids['C']}", json={"notes": "main"}, headers=auth_headers)
+    await client.patch(f"{url}/{ids['E']}", params=on_branch, json={"name": "E2"}, headers=auth_headers)
+    await client.patch(f"{url}/{ids['E']}", json={"notes": "main"}, headers=auth_headers)
+    await client.patch(f"/api/boards/{bid}/branches/{branch['id']}/state",
+                       json={"steps": [{"id": "s1", "name": "Discover"}]}, headers=auth_headers)
+
+    merge = f"/api/boards/{bid}/branches/{branch['id']}/merge"
+    plan = (await client.post(merge, params={"dry_run": "true"}, headers=auth_headers)).json()
+    assert plan["dry_run"] is True and plan["commit_id"] is None
+    assert sorted(u["name"] for u in plan["elements"]["update"]) == ["A", "E"]
+    assert [d["id"] for d in plan["elements"]["delete"]] == [ids["B"]]
+    assert [a["name"] for a in plan["elements"]["add"]] == ["D"]
+    assert plan["steps"]["add"] == [{"id": "s1", "name": "Discover"}]
+    assert [(c["id"], sorted(c["fields"])) for c in plan["conflicts"]] == [(ids["C"], ["notes"])]
+    r = await client.get(url, headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()) == ["A", "B", "C", "E"]  # dry run wrote nothing
+
+    r = await client.post(merge, headers=auth_headers)
+    assert r.status_code == 200 and r.json()["commit_id"]
+    main = {e["name"]: e for e in (await client.get(url, headers=auth_headers)).json()}
+    assert sorted(main) == ["A2", "C", "D", "E2"]
+    assert main["E2"]["notes"] == "main" and main["C"]["notes"] == "main"
+    board_now = (await client.get(f"/api/boards/{bid}", headers=auth_headers)).json()
+    assert board_now["state"]["steps"] == [{"id": "s1", "name": "Discover"}]
+
+    # Only the conflicting overlay is left on the branch; merging again is a no-op.
+    r = await client.get(url, params=on_branch, headers=auth_headers)
+    assert {e["name"]: e["notes"] for e in r.json()}["C"] == "branch"
+    again = (await client.post(merge, headers=auth_headers)).json()
+    assert again["commit_id"] is None and len(again["conflicts"]) == 1
+
+    commits = (await client.get(f"/api/boards/{bid}/commits", headers=auth_headers)).json()
+    assert commits[0]["message"] == "Merge branch 'alt'"
+
+
+@pytest.mark.asyncio
+async def test_merge_rebases_branch(client, auth_headers, board):
+    bid = board["id"]
+    url = f"/api/boards/{bid}/elements"
+    await client.patch(f"/api/boards/{bid}", json={"state": {"steps": [{"id": "s1", "name": "A"}]}},
+                       headers=auth_headers)
+    eid = (await client.post(url, json={"type": "touchpoint", "name": "X"}, headers=auth_headers)).json()["id"]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    merge = f"/api/boards/{bid}/branches/{branch['id']}/merge"
+    await client.patch(f"/api/boards/{bid}/branches/{branch['id']}/state",
+                       json={"steps": [{"id": "s1", "name": "B"}]}, headers=auth_headers)
+    await client.patch(f"{url}/{eid}", params={"branch_id": branch["id"]}, json={"notes": "branch"},
+                       headers=auth_headers)
+    await client.patch(f"{url}/{eid}", json={"notes": "main"}, headers=auth_headers)
+    r = await client.post(merge, headers=auth_headers)
+    assert [c["id"] for c in r.json()["conflicts"]] == [eid]
+
+    # The merged step is the new base, so main renaming it again is not a conflict; the
+    # element conflict is still reported against its original base.
+    await client.patch(f"/api/boards/{bid}", json={"state": {"steps": [{"id": "s1", "name": "C"}]}},
+                       headers=auth_headers)
+    plan = (await client.post(merge, params={"dry_run": "true"}, headers=auth_headers)).json()
+    assert [c["id"] for c in plan["conflicts"]] == [eid]
+    assert plan["steps"] == {"add": [], "update": [], "delete": []}
+    r = await client.get(f"/api/boards/{bid}/branches", headers=auth_headers)
+    alt = next(b for b in r.json() if b["id"] == branch["id"])
+    assert alt["state_snapshot"]["steps"] == [{"id": "s1", "name": "B"}]
+
+
+@pytest.mark.asyncio
+async def test_overlay_survives_main_delete_with_foreign_keys(client, auth_headers, board, foreign_keys):
+    bid = board["id"]
+    url = f"/api/boards/{bid}/elements"
+    eid = (await client.post(url, json={"type": "touchpoint", "name": "A"}, headers=auth_headers)).json()["id"]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+    await client.patch(f"{url}/{eid}", params=on_branch, json={"name": "A2"}, headers=auth_headers)
+
+    r = await client.delete(f"{url}/{eid}", headers=auth_headers)
+    assert r.status_code == 204
+    r = await client.get(url, params=on_branch, headers=auth_headers)
+    assert [e["name"] for e in r.json()] == ["A2"]  # the branch edit is kept
+
+    merge = f"/api/boards/{bid}/branches/{branch['id']}/merge"
+    plan = (await client.post(merge, params={"dry_run": "true"}, headers=auth_headers)).json()
+    assert [(c["id"], c["reason"]) for c in plan["conflicts"]] == [(eid, "changed on branch, deleted on main")]
+
+
+@pytest.mark.asyncio
+async def test_element_batch_on_branch(client, auth_headers, board):
+    bid = board["id"]
+    url = f"/api/boards/{bid}/elements"
+    ids = {}
+    for name in ("A", "B"):
+        ids[name] = (await client.post(url, json={"type": "touchpoint", "name": name}, headers=auth_headers)).json()["id"]
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    on_branch = {"branch_id": branch["id"]}
+
+    r = await client.post(f"{url}:batch", params=on_branch, headers=auth_headers, json={"operations": [
+        {"op": "create", "type": "touchpoint", "name": "C"},
+        {"op": "update", "id": ids["A"], "name": "A2"},
+        {"op": "delete", "id": ids["B"]},
+    ]})
+    assert r.status_code == 200
+    out = r.json()
+    assert out["updated"][0]["base_element_id"] == ids["A"]
+    assert out["deleted"] == [ids["B"]]
+
+    r = await client.get(url, params=on_branch, headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()) == ["A2", "C"]
+    r = await client.get(url, headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()) == ["A", "B"]  # main untouched
+
+
+@pytest.mark.asyncio
+async def test_branch_cannot_touch_another_branchs_rows(client, auth_headers, board):
+    bid = board["id"]
+    url = f"/api/boards/{bid}/elements"
+    alt, other = [
+        (await client.post(f"/api/boards/{bid}/branches", json={"name": n}, headers=auth_headers)).json()["id"]
+        for n in ("alt", "other")
+    ]
+    mine = (await client.post(url, json={"type": "touchpoint", "name": "Mine", "branch_id": alt},
+                              headers=auth_headers)).json()["id"]
+
+    wrong = {"branch_id": other}
+    r = await client.patch(f"{url}/{mine}", params=wrong, json={"name": "Theirs"}, headers=auth_headers)
+    assert r.status_code == 404
+    r = await client.delete(f"{url}/{mine}", params=wrong, headers=auth_headers)
+    assert r.status_code == 404
+    r = await client.post(f"{url}:batch", params=wrong, headers=auth_headers,
+                          json={"operations": [{"op": "update", "id": mine, "name": "Theirs"}]})
+    assert r.status_code == 404
+
+    r = await client.get(url, params={"branch_id": alt}, headers=auth_headers)
+    assert [e["name"] for e in r.json()] == ["Mine"]
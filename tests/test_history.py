@@ -0,0 +1,437 @@
+"""History endpoint tests — PRD-17a/17c/17e."""
+import pytest
+
+
+async def _element(client, auth_headers, bid, **body):
+    body = {"type": "touchpoint", "name": "El", **body}
+    r = await client.post(f"/api/boards/{bid}/elements", json=body, headers=auth_headers)
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+@pytest.mark.asyncio
+async def test_element_write_records_event_with_snapshot(client, auth_headers, board):
+    bid = board["id"]
+    el = await _element(client, auth_headers, bid, name="Intake form")
+    await client.patch(f"/api/boards/{bid}/elements/{el['id']}",
+                       json={"name": "Intake form v2"}, headers=auth_headers)
+
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    by_op = {e["operation"]: e for e in events}
+    assert by_op["create"]["after_snapshot"]["name"] == "Intake form"
+    assert by_op["create"]["after_snapshot"]["created_at"]
+    assert by_op["update"]["before_snapshot"]["name"] == "Intake form"
+    assert by_op["update"]["after_snapshot"]["name"] == "Intake form v2"
+    assert all(e["commit_id"] for e in events)
+
+
+@pytest.mark.asyncio
+async def test_element_delete_groups_connector_cascade(client, auth_headers, board):
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="A")
+    b = await _element(client, auth_headers, bid, name="B")
+    await client.post(f"/api/boards/{bid}/connectors",
+        json={"source_element_id": a["id"], "target_element_id": b["id"],
+              "connector_type": "sequence"}, headers=auth_headers)
+
+    r = await client.delete(f"/api/boards/{bid}/elements/{a['id']}", headers=auth_headers)
+    assert r.status_code == 204
+
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    el_delete = next(e for e in events if e["operation"] == "delete" and e["entity_type"] == "element")
+    conn_delete = next(e for e in events if e["operation"] == "delete" and e["entity_type"] == "connector")
+    assert el_delete["commit_id"] == conn_delete["commit_id"]
+
+
+@pytest.mark.asyncio
+async def test_snapshots_are_delta_encoded_between_keyframes(client, auth_headers, board, db, monkeypatch):
+    from sqlalchemy import select
+    from app.config import get_settings
+    from app.models import ChangeEvent
+
+    monkeypatch.setattr(get_settings(), "history_keyframe_interval", 3)
+    bid = board["id"]
+    el = await _element(client, auth_headers, bid, name="v1", notes="long notes " * 50)
+    for n in range(2, 6):
+        await client.patch(f"/api/boards/{bid}/elements/{el['id']}",
+                           json={"name": f"v{n}"}, headers=auth_headers)
+
+    stored = (await db.execute(
+        select(ChangeEvent.entity_version, ChangeEvent.is_keyframe, ChangeEvent.after_snapshot)
+        .where(ChangeEvent.entity_id == el["id"])
+        .order_by(ChangeEvent.entity_version)
+    )).all()
+    assert [(v, k) for v, k, _ in stored] == [(1, True), (2, False), (3, False), (4, True), (5, False)]
+    assert "notes" not in stored[1].after_snapshot["__delta__"]["set"]
+    assert stored[1].after_snapshot["__delta__"]["set"]["name"] == "v2"
+
+    db.expunge_all()  # read back from storage, not from the identity map
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    by_name = {e["after_snapshot"]["name"]: e for e in events}
+    assert set(by_name) == {"v1", "v2", "v3", "v4", "v5"}
+    assert by_name["v3"]["before_snapshot"]["name"] == "v2"
+    assert by_name["v3"]["after_snapshot"]["notes"] == el["notes"]
+
+    r = await client.post(f"/api/boards/{bid}/history/{by_name['v3']['id']}/restore",
+                          headers=auth_headers)
+    assert r.status_code == 200
+    assert r.json()["restored"]["name"] == "v3"
+
+
+@pytest.mark.asyncio
+async def test_board_time_travel(client, auth_headers, board, db, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import select, update
+    from app.config import get_settings
+    from app.models import BoardCheckpoint, ChangeEvent, Commit
+    from app.services.compaction_service import run_compaction
+
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="v1")
+    await client.patch(f"/api/boards/{bid}/elements/{a['id']}",
+                       json={"name": "v2"}, headers=auth_headers)
+    b = await _element(client, auth_headers, bid, name="B")
+    await client.delete(f"/api/boards/{bid}/elements/{a['id']}", headers=auth_headers)
+
+    # SQLite timestamps have one-second resolution; spread the four writes a minute apart.
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    order = [(a["id"], 1), (a["id"], 2), (b["id"], 1), (a["id"], 3)]
+    commits = []
+    for i, (entity_id, version) in enumerate(order):
+        ev = (await db.execute(select(ChangeEvent).where(
+            ChangeEvent.entity_id == entity_id, ChangeEvent.entity_version == version))).scalar_one()
+        when = t0 + timedelta(minutes=i)
+        await db.execute(update(ChangeEvent).where(ChangeEvent.id == ev.id).values(created_at=when))
+        await db.execute(update(Commit).where(Commit.id == ev.commit_id).values(created_at=when))
+        commits.append(str(ev.commit_id))
+    await db.commit()
+
+    r = await client.get(f"/api/boards/{bid}/at", params={"commit": commits[1]}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert [e["name"] for e in r.json()["elements"]] == ["v2"]
+    assert r.json()["checkpoint_id"] is None
+
+    # Reads never write a checkpoint, however much they replay; the compaction job does.
+    monkeypatch.setattr(get_settings(), "history_checkpoint_interval", 0)
+    at = (t0 + timedelta(seconds=30)).isoformat()
+    r = await client.get(f"/api/boards/{bid}/at", params={"ts": at}, headers=auth_headers)
+    assert [e["name"] for e in r.json()["elements"]] == ["v1"]
+    assert (await db.execute(select(BoardCheckpoint))).scalars().all() == []
+
+    r = await client.get(f"/api/boards/{bid}/at", params={"commit": commits[2]}, headers=auth_headers)
+    assert sorted(e["name"] for e in r.json()["elements"]) == ["B", "v2"]
+
+    r = await client.get(f"/api/boards/{bid}/at", params={"commit": commits[3]}, headers=auth_headers)
+    assert [e["name"] for e in r.json()["elements"]] == ["B"]
+
+    totals = await run_compaction(db)
+    assert totals["checkpoints"] == 1
+    assert (await run_compaction(db))["checkpoints"] == 0    # nothing recorded since
+    now = (datetime.utcnow() + timedelta(minutes=1)).isoformat()
+    r = await client.get(f"/api/boards/{bid}/at", params={"ts": now}, headers=auth_headers)
+    assert r.json()["checkpoint_id"] is not None
+    assert (r.json()["replayed_events"], [e["name"] for e in r.json()["elements"]]) == (0, ["B"])
+
+    r = await client.get(f"/api/boards/{bid}/at", headers=auth_headers)
+    assert r.status_code == 422
+
+
+async def _spread(db, commit_ids):
+    """Give each commit (and its events) its own minute; SQLite only stores whole seconds."""
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from app.models import ChangeEvent, Commit
+
+    t0 = datetime(2026, 1, 1, 12, 0, 0)
+    for i, cid in enumerate(commit_ids):
+        when = t0 + timedelta(minutes=i)
+        await db.execute(update(ChangeEvent).where(ChangeEvent.commit_id == cid).values(created_at=when))
+        await db.execute(update(Commit).where(Commit.id == cid).values(created_at=when))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_revert_batch_commit(client, auth_headers, board):
+    bid = board["id"]
+    keep = await _element(client, auth_headers, bid, name="Keep")
+    drop = await _element(client, auth_headers, bid, name="Drop")
+    await client.post(f"/api/boards/{bid}/connectors",
+        json={"source_element_id": keep["id"], "target_element_id": drop["id"],
+              "connector_type": "sequence"}, headers=auth_headers)
+
+    out = (await client.post(f"/api/boards/{bid}/elements:batch", json={"operations": [
+        {"op": "create", "type": "risk", "name": "New"},
+        {"op": "update", "id": keep["id"], "name": "Renamed"},
+        {"op": "delete", "id": drop["id"]},
+    ]}, headers=auth_headers)).json()
+
+    r = await client.post(f"/api/boards/{bid}/commits/{out['commit_id']}/revert", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    res = r.json()
+    assert res["deleted"] == [out["created"][0]["id"]]
+    assert res["warnings"] == []
+
+    els = (await client.get(f"/api/boards/{bid}/elements", headers=auth_headers)).json()
+    assert sorted(e["name"] for e in els) == ["Drop", "Keep"]
+    conns = (await client.get(f"/api/boards/{bid}/connectors", headers=auth_headers)).json()
+    assert [(c["source_element_id"], c["target_element_id"]) for c in conns] == [(keep["id"], drop["id"])]
+
+    commits = (await client.get(f"/api/boards/{bid}/commits", headers=auth_headers)).json()
+    revert = next(c for c in commits if c["id"] == res["commit_id"])
+    assert revert["message"].startswith('Revert "Batch edit')
+    assert revert["event_count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_revert_warns_only_on_later_changes_to_same_entity(client, auth_headers, board, db):
+    from app.services.history_service import record_change_event
+
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="A")
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    created = events[0]["commit_id"]
+    # A later event for another entity type that happens to share the id.
+    await record_change_event(db, bid, None, "user", "connector", a["id"], "create",
+                              None, {"id": a["id"]}, commit_message="other")
+    await db.commit()
+    later = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()[0]["commit_id"]
+    await _spread(db, [created, later])
+
+    r = await client.post(f"/api/boards/{bid}/commits/{created}/revert", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["warnings"] == []
+
+
+@pytest.mark.asyncio
+async def test_rollback_to_commit(client, auth_headers, board, db):
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="A")
+    await client.patch(f"/api/boards/{bid}/elements/{a['id']}", json={"name": "A2"}, headers=auth_headers)
+    b = await _element(client, auth_headers, bid, name="B")
+
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    commit_of = {(e["entity_id"], e["operation"]): e["commit_id"] for e in events}
+    first = commit_of[(a["id"], "create")]
+    await _spread(db, [first, commit_of[(a["id"], "update")], commit_of[(b["id"], "create")]])
+
+    r = await client.post(f"/api/boards/{bid}/commits/{first}/rollback", headers=auth_headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["deleted"] == [b["id"]]
+    els = (await client.get(f"/api/boards/{bid}/elements", headers=auth_headers)).json()
+    assert [e["name"] for e in els] == ["A"]
+
+    r = await client.post(f"/api/boards/{bid}/commits/{r.json()['commit_id']}/rollback", headers=auth_headers)
+    assert r.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_compaction_squashes_old_history(client, auth_headers, board, db, monkeypatch):
+    from datetime import datetime, timedelta
+    from sqlalchemy import select
+    from app.config import get_settings
+    from app.models import Board, ChangeEvent, Commit
+    from app.services.checkpoint_service import create_checkpoint
+    from app.services.compaction_service import compact_board
+
+    monkeypatch.setattr(get_settings(), "history_keyframe_interval", 3)
+    bid = board["id"]
+    el = await _element(client, auth_headers, bid, name="v1")
+    for n in range(2, 6):
+        await client.patch(f"/api/boards/{bid}/elements/{el['id']}", json={"name": f"v{n}"}, headers=auth_headers)
+    old = (await db.execute(
+        select(ChangeEvent.commit_id).where(ChangeEvent.entity_id == el["id"]).order_by(ChangeEvent.entity_version)
+    )).scalars().all()
+    await _spread(db, old)
+    await client.patch(f"/api/boards/{bid}/elements/{el['id']}", json={"name": "v6"}, headers=auth_headers)
+
+    cutoff = datetime(2026, 1, 1, 13, 0, 0)
+    stats = await compact_board(db, bid, cutoff, "day")
+    await db.commit()
+    assert stats["events_deleted"] == 2 and stats["commits_deleted"] == 5
+
+    # The compaction checkpoint holds the board as of the cutoff, not as of now.
+    cp = await create_checkpoint(db, await db.get(Board, bid), as_of=cutoff)
+    await db.commit()
+    assert [e["name"] for e in cp.elements] == ["v5"]
+    r = await client.get(f"/api/boards/{bid}/at", params={"ts": "2026-01-01T14:00:00"}, headers=auth_headers)
+    assert r.json()["checkpoint_id"] == str(cp.id)
+    assert [e["name"] for e in r.json()["elements"]] == ["v5"]
+
+    rows = (await db.execute(
+        select(ChangeEvent.entity_version, ChangeEvent.is_keyframe).where(ChangeEvent.entity_id == el["id"])
+        .order_by(ChangeEvent.entity_version)
+    )).all()
+    assert [tuple(r) for r in rows] == [(1, True), (4, True), (5, True), (6, False)]
+    commits = (await db.execute(
+        select(Commit.message, Commit.event_count)
+        .where(Commit.board_id == bid, Commit.created_at < datetime(2026, 1, 2))
+    )).all()
+    assert [tuple(c) for c in commits] == [("Compacted 3 commits (2026-01-01)", 3)]
+
+    db.expunge_all()
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    latest = next(e for e in events if e["after_snapshot"]["name"] == "v6")
+    assert latest["before_snapshot"]["name"] == "v5"
+
+
+@pytest.mark.asyncio
+async def test_change_events_buffered_until_commit(board, db):
+    from sqlalchemy import func, select
+    from app.models import ChangeEvent
+    from app.services.history_service import record_change_event
+
+    bid = board["id"]
+    count = select(func.count(ChangeEvent.id)).where(ChangeEvent.entity_id == "x1")
+    snaps = [None, {"id": "x1", "name": "a"}, {"id": "x1", "name": "b"}, {"id": "x1", "name": "c"}]
+    for before, after in zip(snaps, snaps[1:]):
+        await record_change_event(db, bid, None, "user", "element", "x1", "update", before, after,
+                                  commit_message="edit")
+    assert (await db.execute(count)).scalar_one() == 0
+    await db.commit()
+
+    rows = (await db.execute(
+        select(ChangeEvent.entity_version, ChangeEvent.after_snapshot)
+        .where(ChangeEvent.entity_id == "x1").order_by(ChangeEvent.entity_version)
+    )).all()
+    assert [v for v, _ in rows] == [1, 2, 3]
+    assert rows[2].after_snapshot == {"__delta__": {"set": {"name": "c"}, "unset": []}}
+
+    await record_change_event(db, bid, None, "user", "element", "x1", "update", snaps[3], None)
+    await db.rollback()
+    await db.commit()
+    assert (await db.execute(count)).scalar_one() == 3
+
+    # A SAVEPOINT rolling back keeps the events of the enclosing transaction.
+    await record_change_event(db, bid, None, "user", "element", "x1", "update", snaps[3], None)
+    savepoint = await db.begin_nested()
+    await savepoint.rollback()
+    await db.commit()
+    assert (await db.execute(count)).scalar_one() == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_version_conflict_renumbers_and_retries(board, db):
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal
+    from app.models import ChangeEvent
+    from app.services.history_service import hydrate_snapshots, record_change_event
+
+    bid = board["id"]
+    await record_change_event(db, bid, None, "user", "element", "x2", "create",
+                              None, {"id": "x2", "name": "mine"})
+    # Another request writes version 1 of the same entity first.
+    async with AsyncSessionLocal() as other:
+        await record_change_event(other, bid, None, "user", "element", "x2", "create",
+                                  None, {"id": "x2", "name": "theirs"})
+        await other.commit()
+    await db.commit()
+
+    events = (await db.execute(
+        select(ChangeEvent).where(ChangeEvent.entity_id == "x2").order_by(ChangeEvent.entity_version)
+    )).scalars().all()
+    await hydrate_snapshots(db, events)
+    assert [(e.entity_version, e.after_snapshot["name"]) for e in events] == [(1, "theirs"), (2, "mine")]
+    assert events[1].before_snapshot is None and events[1].is_keyframe is False
+
+
+@pytest.mark.asyncio
+async def test_entity_history_and_filters(client, auth_headers, board):
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="A")
+    b = await _element(client, auth_headers, bid, name="B")
+    await client.patch(f"/api/boards/{bid}/elements/{a['id']}", json={"name": "A2"}, headers=auth_headers)
+    conn = (await client.post(f"/api/boards/{bid}/connectors",
+        json={"source_element_id": a["id"], "target_element_id": b["id"],
+              "connector_type": "sequence"}, headers=auth_headers)).json()
+
+    r = await client.get(f"/api/boards/{bid}/elements/{a['id']}/history", headers=auth_headers)
+    assert r.status_code == 200
+    assert sorted(e["operation"] for e in r.json()) == ["create", "update"]
+    assert all(e["entity_id"] == a["id"] for e in r.json())
+
+    r = await client.get(f"/api/boards/{bid}/connectors/{conn['id']}/history", headers=auth_headers)
+    assert [e["operation"] for e in r.json()] == ["create"]
+
+    r = await client.get(f"/api/boards/{bid}/history", params={"entity_type": "element", "operation": "create"},
+                         headers=auth_headers)
+    assert sorted(e["after_snapshot"]["name"] for e in r.json()) == ["A", "B"]
+    r = await client.get(f"/api/boards/{bid}/history", params={"actor_type": "agent"}, headers=auth_headers)
+    assert r.json() == []
+    r = await client.get(f"/api/boards/{bid}/history", params={"until": "2000-01-01T00:00:00"}, headers=auth_headers)
+    assert r.json() == []
+
+
+@pytest.mark.asyncio
+async def test_board_diff_commits_and_branches(client, auth_headers, board, db):
+    import json
+    bid = board["id"]
+    a = await _element(client, auth_headers, bid, name="A")
+    b = await _element(client, auth_headers, bid, name="B")
+    events = (await client.get(f"/api/boards/{bid}/history", headers=auth_headers)).json()
+    commit_of = {e["entity_id"]: e["commit_id"] for e in events}
+    await _spread(db, [commit_of[a["id"]], commit_of[b["id"]]])
+
+    branch = (await client.post(f"/api/boards/{bid}/branches", json={"name": "alt"}, headers=auth_headers)).json()
+    await client.patch(f"/api/boards/{bid}/elements/{a['id']}", json={"notes": "new"}, headers=auth_headers)
+    c = await _element(client, auth_headers, bid, name="C")
+
+    r = await client.get(f"/api/boards/{bid}/diff", params={"from": commit_of[a["id"]]}, headers=auth_headers)
+    assert r.status_code == 200, r.text
+    d = r.json()
+    assert d["from"]["kind"] == "commit" and d["to"]["kind"] == "main"
+    assert sorted(e["name"] for e in d["elements"]["added"]) == ["B", "C"]
+    assert d["elements"]["changed"][0]["fields"] == {"notes": {"from": None, "to": "new"}}
+    assert d["summary"]["elements"]["unchanged"] == 0
+
+    # A copy-on-write branch sees main; only its overlay rows differ.
+    overlay = (await client.patch(f"/api/boards/{bid}/elements/{b['id']}", params={"branch_id": branch["id"]},
+                                  json={"name": "B2"}, headers=auth_headers)).json()
+    r = await client.get(f"/api/boards/{bid}/diff", params={"from": "main", "to": branch["id"]}, headers=auth_headers)
+    d = r.json()
+    assert d["elements"]["added"] == [] and d["elements"]["removed"] == []
+    assert [(ch["from_id"], ch["id"]) for ch in d["elements"]["changed"]] == [(b["id"], overlay["id"])]
+    assert d["summary"]["elements"]["unchanged"] == 2
+
+    r = await client.get(f"/api/boards/{bid}/diff", params={"from": branch["id"], "format": "ndjson"},
+                         headers=auth_headers)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(x) for x in r.text.splitlines()]
+    assert lines[0]["type"] == "header" and lines[-1]["type"] == "summary"
+    assert [(x["type"], x["fields"]) for x in lines[1:-1]] == [("changed", {"name": {"from": "B2", "to": "B"}})]
+
+    r = await client.get(f"/api/boards/{bid}/diff", params={"from": "yesterday"}, headers=auth_headers)
+    assert r.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_commit_reads_entity_heads_in_one_query(board, db):
+    from sqlalchemy import event, func, select
+    from app.models import ChangeEvent
+    from app.services.history_service import record_change_event
+
+    bid = board["id"]
+    ids = [f"h{i}" for i in range(20)]
+    for eid in ids:
+        await record_change_event(db, bid, None, "user", "element", eid, "create", None, {"id": eid, "v": 0})
+    await db.commit()
+
+    statements = []
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        for eid in ids:
+            await record_change_event(db, bid, None, "user", "element", eid, "update",
+                                      {"id": eid, "v": 0}, {"id": eid, "v": 1})
+        await db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    reads = [s for s in statements if s.lstrip().upper().startswith("SELECT") and "change_events" in s]
+    assert len(reads) == 1
+    versions = (await db.execute(
+        select(func.min(ChangeEvent.entity_version), func.max(ChangeEvent.entity_version))
+        .where(ChangeEvent.entity_id.in_(ids), ChangeEvent.operation == "update")
+    )).one()
+    assert tuple(versions) == (2, 2)